@@ -1,3 +1,5 @@
+from collections import Counter
+
 from django.contrib import admin
 from .models import (
     Supplier,
@@ -6,7 +8,12 @@ from .models import (
     PurchaseItem,
     RequestDocument
 )
-from django.utils.translation import gettext_lazy as _
+from django.contrib import messages
+from .amounts import recalculate_amounts
+from .search import search_suppliers
+from .transitions import (
+    ALLOWED_TRANSITIONS, APPLIED, CONFLICT, MAX_TRANSITION_BATCH, NOT_ALLOWED, Expected, transition_requests,
+)
 
 
 # --------------------
@@ -18,6 +25,15 @@ class SupplierAdmin(admin.ModelAdmin):
     search_fields = ("name", "bin_iin")
     list_filter = ("name",)
 
+    ADMIN_SEARCH_LIMIT = 200
+
+    def get_search_results(self, request, queryset, search_term):
+        # индексный поиск (триграммы / FTS5) вместо icontains по всей таблице
+        if not search_term:
+            return queryset, False
+        found = search_suppliers(search_term, limit=self.ADMIN_SEARCH_LIMIT)
+        return queryset.filter(pk__in=[s.pk for s in found]), False
+
 
 # --------------------
 # CUSTOMER / DEPARTMENT
@@ -44,8 +60,8 @@ class PurchaseItemInline(admin.TabularInline):
 class RequestDocumentInline(admin.TabularInline):
     model = RequestDocument
     extra = 1
-    fields = ("file", "type", "uploaded_by", "uploaded_at")
-    readonly_fields = ("uploaded_at",)
+    fields = ("file", "filename", "type", "uploaded_by", "uploaded_at")
+    readonly_fields = ("filename", "uploaded_at")
 
 
 # --------------------
@@ -105,16 +121,56 @@ class PurchaseRequestAdmin(admin.ModelAdmin):
         }),
     )
 
-    actions = ["mark_as_paid"]
+    actions = ["mark_as_paid", "mark_as_cancelled", "recalc_amounts"]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # суммы, введённые вручную, не трогаем; если менялись позиции (или НДС) — выравниваем
+        # по позициям и сообщаем, что сумма в форме заменена
+        items_changed = any(formset.model is PurchaseItem and formset.has_changed() for formset in formsets)
+        if not items_changed and "vat_percent" not in form.changed_data:
+            return
+        for batch in recalculate_amounts(PurchaseRequest.objects.filter(pk=form.instance.pk)):
+            for row in batch:
+                self.message_user(
+                    request,
+                    f"Суммы пересчитаны по позициям: без НДС {row.amount_without_vat} → {row.expected_without_vat}, "
+                    f"с НДС {row.amount_with_vat} → {row.expected_with_vat}",
+                    messages.WARNING,
+                )
 
     # --------------------
     # ADMIN ACTIONS
     # --------------------
+    # тот же условный UPDATE, что и у API (main.transitions), без проверки версии
 
     @admin.action(description="💰 Отметить как оплачено")
     def mark_as_paid(self, request, queryset):
-        queryset.update(status=PurchaseRequest.Status.PAID)
+        self.set_status(request, queryset, PurchaseRequest.Status.PAID)
 
     @admin.action(description="❌ Отменить заказ")
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(status=PurchaseRequest.Status.CANCELLED)
+        self.set_status(request, queryset, PurchaseRequest.Status.CANCELLED)
+
+    def set_status(self, request, queryset, status):
+        pks = list(queryset.values_list("pk", flat=True))
+        counts = Counter()
+        for start in range(0, len(pks), MAX_TRANSITION_BATCH):
+            batch = {pk: Expected() for pk in pks[start:start + MAX_TRANSITION_BATCH]}
+            counts.update(result.result for result in transition_requests(batch, status, request.user))
+
+        self.message_user(request, f"Статус изменён: {counts[APPLIED]} из {len(pks)}",
+                          messages.SUCCESS if counts[APPLIED] == len(pks) else messages.WARNING)
+        # раньше перезаписывался любой статус; теперь переходы — по ALLOWED_TRANSITIONS
+        if counts[NOT_ALLOWED]:
+            allowed = ", ".join(str(PurchaseRequest.Status(s).label) for s in ALLOWED_TRANSITIONS[status])
+            self.message_user(request, f"Не изменено {counts[NOT_ALLOWED]}: перевести можно только из «{allowed}»",
+                              messages.ERROR)
+        if counts[CONFLICT]:
+            self.message_user(request, f"Не изменено {counts[CONFLICT]}: заявки изменили параллельно",
+                              messages.ERROR)
+
+    @admin.action(description="🧮 Пересчитать суммы по позициям")
+    def recalc_amounts(self, request, queryset):
+        changed = sum(len(batch) for batch in recalculate_amounts(queryset))
+        self.message_user(request, f"Суммы пересчитаны: изменено {changed}", messages.SUCCESS)
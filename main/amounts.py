@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import PurchaseItem, PurchaseRequest, SpendSummary
+
+
+# --------------------
+# AMOUNT RECALCULATION
+# --------------------
+# Суммы заявки — производные от позиций: amount_without_vat = SUM(total),
+# amount_with_vat = ROUND(amount_without_vat * (100 + vat_percent) / 100, 2).
+# Пересчёт — без загрузки заявок в Python, пачками по диапазону id:
+#
+#     UPDATE purchaserequest SET ... FROM (SELECT request_id, SUM(total) ... GROUP BY request_id) t
+#     WHERE id = t.id AND (суммы или НДС отличаются)
+#
+# Изменённые строки получают version + 1 и updated_at (как QuerySet.update), сводка
+# расходов правится на разницу. Заявки без позиций не трогаются: суммы у них введены вручную.
+
+RECALC_BATCH_SIZE = 10000
+
+CENT = Decimal('0.01')
+
+
+@dataclass(frozen=True)
+class AmountMismatch:
+    id: int
+    ro_number: str
+    amount_without_vat: Decimal
+    amount_with_vat: Decimal
+    vat_percent: Decimal
+    expected_without_vat: Decimal
+    expected_with_vat: Decimal
+    expected_vat_percent: Decimal
+
+
+def _decimal(value):
+    # SQLite отдаёт float/int
+    return Decimal(str(value)).quantize(CENT)
+
+
+def recalculate_amounts(queryset=None, vat=None, dry_run=False, batch_size=RECALC_BATCH_SIZE, using=DEFAULT_DB_ALIAS):
+    """
+    Пересчитывает суммы заявок queryset (по умолчанию — всех); vat — новая ставка НДС
+    вместо vat_percent заявок. Отдаёт по пачке [AmountMismatch] — что было и что стало
+    (с dry_run — что изменилось бы)
+    """
+    if queryset is None:
+        queryset = PurchaseRequest.objects.all()
+    queryset = queryset.using(using)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    request_table = qn(PurchaseRequest._meta.db_table)
+    item_table = qn(PurchaseItem._meta.db_table)
+
+    vat_sql, vat_params = ('pr.vat_percent', []) if vat is None else ('CAST(%s AS NUMERIC)', [str(vat)])
+    with_vat_sql = f'ROUND(t.without_vat * (100 + {vat_sql}) / 100, 2)'
+    mismatch_sql = (
+        f'(pr.amount_without_vat <> t.without_vat OR pr.amount_with_vat <> {with_vat_sql} '
+        f'OR pr.vat_percent <> {vat_sql})'
+    )
+    lock_sql = ' FOR UPDATE OF pr' if not dry_run and connection.features.has_select_for_update_of else ''
+    mismatch_params = vat_params * 2
+
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return
+    for low in range(bounds['low'], bounds['high'] + 1, batch_size):
+        high = low + batch_size
+        filter_sql, filter_params = '', []
+        if queryset.query.has_filters():
+            # подзапрос фильтра — в границах той же пачки, а не весь queryset на каждую пачку
+            subquery, filter_params = (
+                queryset.filter(pk__gte=low, pk__lt=high).order_by().values('pk').query.sql_with_params()
+            )
+            filter_sql = f' AND i.request_id IN ({subquery})'
+
+        target_sql = (
+            f'SELECT i.request_id AS id, ROUND(SUM(i.total), 2) AS without_vat FROM {item_table} i '
+            f'WHERE i.request_id >= %s AND i.request_id < %s{filter_sql} GROUP BY i.request_id'
+        )
+        select_sql = (
+            f'SELECT pr.id, pr.ro_number, pr.amount_without_vat, pr.amount_with_vat, pr.vat_percent, '
+            f't.without_vat, {with_vat_sql}, {vat_sql} '
+            f'FROM {request_table} pr JOIN ({target_sql}) t ON t.id = pr.id '
+            f'WHERE {mismatch_sql} ORDER BY pr.id{lock_sql}'
+        )
+        update_sql = (
+            f'UPDATE {request_table} AS pr SET amount_without_vat = t.without_vat, '
+            f'amount_with_vat = {with_vat_sql}, vat_percent = {vat_sql}, '
+            f'version = pr.version + 1, updated_at = %s '
+            f'FROM ({target_sql}) t WHERE pr.id = t.id AND {mismatch_sql}'
+        )
+        target_params = [low, high, *filter_params]
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(select_sql, [*vat_params * 2, *target_params, *mismatch_params])
+                mismatches = [
+                    AmountMismatch(
+                        id=pk, ro_number=ro_number,
+                        amount_without_vat=_decimal(without_vat), amount_with_vat=_decimal(with_vat),
+                        vat_percent=_decimal(vat_percent), expected_without_vat=_decimal(new_without_vat),
+                        expected_with_vat=_decimal(new_with_vat), expected_vat_percent=_decimal(new_vat),
+                    )
+                    for pk, ro_number, without_vat, with_vat, vat_percent, new_without_vat, new_with_vat, new_vat
+                    in cursor.fetchall()
+                ]
+                if mismatches and not dry_run:
+                    updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+                    cursor.execute(
+                        update_sql, [*vat_params * 2, updated_at, *target_params, *mismatch_params]
+                    )
+                    _apply_spend_deltas(mismatches, using)
+        yield mismatches
+
+
+def _apply_spend_deltas(mismatches, using):
+    # ключ сводки у заявки не меняется — в неё идёт только разница сумм (count 0)
+    keys = {
+        pk: SpendSummary.objects.make_key(created_at, supplier_id, customer_id, status)
+        for pk, created_at, supplier_id, customer_id, status in PurchaseRequest.objects.using(using).filter(
+            pk__in=[row.id for row in mismatches]
+        ).values_list('pk', 'created_at', 'supplier_id', 'customer_id', 'status')
+    }
+    SpendSummary.objects.apply(
+        (
+            keys[row.id],
+            row.expected_with_vat - row.amount_with_vat,
+            row.expected_without_vat - row.amount_without_vat,
+            0,
+        )
+        for row in mismatches
+    )
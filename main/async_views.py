@@ -0,0 +1,134 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from rest_framework.renderers import JSONRenderer
+
+from osc_erp.db_router import read_from_replica
+from user.decorators import admin_or_accountant_required, aget_user
+
+from .cache import customer_directory, is_not_modified, supplier_directory
+from .models import Customer, RequestCounter, Supplier
+from .pagination import InvalidCursor, apaginate_keyset
+from .search import MAX_SEARCH_LIMIT, SEARCH_LIMIT, search_suppliers
+from .serializers import CustomerSerializer, SupplierSerializer
+from .views import (
+    MY_REQUESTS_ORDERING,
+    MY_REQUESTS_PAGE_SIZE,
+    REQUESTS_LIST_ORDERING,
+    REQUESTS_PAGE_SIZE,
+    my_requests_context,
+    my_requests_queryset,
+    requests_list_context,
+    requests_list_queryset,
+)
+
+
+# --------------------
+# ASYNC (ASGI) READ VIEWS
+# --------------------
+# Подключаются вместо синхронных в main/urls.py при DJANGO_ASYNC=1 (uvicorn).
+# ORM — через async-API (async for / aiterator / acount), пока ждём БД, воркер
+# обслуживает другие соединения. Шаблоны рендерятся в sync_to_async: context
+# processors (messages, сессия) и ленивые атрибуты в шаблоне синхронные.
+
+
+async def _arender(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@login_required
+@admin_or_accountant_required
+@read_from_replica
+async def requests_list_view(request):
+    selected_status = request.GET.get("status", "")
+    requests_qs = requests_list_queryset(selected_status)
+
+    try:
+        page = await apaginate_keyset(
+            requests_qs,
+            REQUESTS_LIST_ORDERING,
+            cursor=request.GET.get("cursor"),
+            page_size=REQUESTS_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        raise Http404
+
+    return await _arender(request, "request/requests_list.html", requests_list_context(page, selected_status))
+
+
+@login_required
+@read_from_replica
+async def my_requests_view(request):
+    user = await aget_user(request)
+    try:
+        page = await apaginate_keyset(
+            my_requests_queryset(user),
+            MY_REQUESTS_ORDERING,
+            cursor=request.GET.get("cursor"),
+            page_size=MY_REQUESTS_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        raise Http404
+
+    counts = {
+        status: count
+        async for status, count in RequestCounter.objects.filter(creator_key=user.pk).values_list("status", "count")
+    }
+    return await _arender(request, "request/my_requests.html", my_requests_context(page, counts))
+
+
+# --------------------
+# DIRECTORIES (/api/suppliers/, /api/customers/)
+# --------------------
+# Тот же version-keyed кеш и ETag, что у CachedDirectoryMixin; справочники
+# открыты (AllowAny), поэтому DRF-аутентификация здесь не нужна.
+
+def _json_response(data, status=200, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data), status=status, headers=headers, content_type="application/json"
+    )
+
+
+def _directory_view(directory_cache, model, serializer_class, fallback):
+    async def view(request):
+        # запросы с параметрами (фильтры DRF) — в синхронный viewset
+        if request.GET:
+            return await sync_to_async(fallback)(request)
+
+        version, last_modified = await directory_cache.aget_version()
+        headers = directory_cache.conditional_headers(version, last_modified)
+
+        if is_not_modified(request, headers["ETag"], last_modified):
+            return HttpResponse(status=304, headers=headers)
+
+        async def abuild():
+            rows = [obj async for obj in model.objects.all()]
+            return list(serializer_class(rows, many=True).data)
+
+        data = await directory_cache.aget_or_build(version, abuild)
+        return _json_response(data, headers=headers)
+
+    return view
+
+
+def supplier_list_view(fallback):
+    return _directory_view(supplier_directory, Supplier, SupplierSerializer, fallback)
+
+
+def customer_list_view(fallback):
+    return _directory_view(customer_directory, Customer, CustomerSerializer, fallback)
+
+
+async def supplier_search_view(request):
+    """
+    GET /api/suppliers/search/?q=...&limit=10 — как SupplierViewSet.search
+    """
+    try:
+        limit = min(int(request.GET.get("limit", SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+    except ValueError:
+        limit = SEARCH_LIMIT
+
+    # сырой SQL (FTS5 / pg_trgm) — в потоке
+    suppliers = await sync_to_async(search_suppliers)(request.GET.get("q", ""), limit=max(limit, 1))
+    return _json_response(SupplierSerializer(suppliers, many=True).data)
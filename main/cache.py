@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+# --------------------
+# VERSION-KEYED DIRECTORY CACHE
+# --------------------
+# Версия справочника лежит в Django cache и меняется сигналами post_save/post_delete.
+# Данные кешируются под ключом версии: сначала в LRU процесса, затем в Django cache.
+# Старые версии не удаляются — они просто перестают запрашиваться и вытесняются.
+#
+# В общем бэкенде (Redis/Memcached) версия хранится без срока: ETag меняется только
+# при изменении справочника. С LocMemCache у каждого процесса своя версия, и сигнал
+# видит только один из них — там у версии TTL, устаревание ограничено VERSION_TIMEOUT.
+# С DummyCache версия не сохраняется, и каждый запрос получает новую.
+
+VERSION_TIMEOUT = 300
+DATA_TIMEOUT = 60 * 60 * 24
+
+
+class LRUCache:
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DirectoryCache:
+    def __init__(self, name, maxsize=8):
+        self.name = name
+        self.local = LRUCache(maxsize)
+
+    @property
+    def version_key(self):
+        return f"directory:{self.name}:version"
+
+    def data_key(self, version):
+        return f"directory:{self.name}:data:{version}"
+
+    @staticmethod
+    def version_timeout():
+        return VERSION_TIMEOUT if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache) else None
+
+    def get_version(self):
+        """
+        (version, last_modified) — version совпадает с временем изменения в мс
+        """
+        version = cache.get(self.version_key)
+        if version is None:
+            created = int(time.time() * 1000)
+            cache.add(self.version_key, created, self.version_timeout())
+            # None — бэкенд ничего не хранит (DummyCache)
+            version = cache.get(self.version_key, created)
+        return version, version // 1000
+
+    async def aget_version(self):
+        version = await cache.aget(self.version_key)
+        if version is None:
+            created = int(time.time() * 1000)
+            await cache.aadd(self.version_key, created, self.version_timeout())
+            version = await cache.aget(self.version_key, created)
+        return version, version // 1000
+
+    def bump(self):
+        version = int(time.time() * 1000)
+        current = cache.get(self.version_key)
+        if current is not None and current >= version:
+            version = current + 1
+        cache.set(self.version_key, version, self.version_timeout())
+
+    def get_or_build(self, version, build):
+        key = self.data_key(version)
+
+        data = self.local.get(key)
+        if data is not None:
+            return data
+
+        data = cache.get(key)
+        if data is None:
+            data = build()
+            cache.set(key, data, DATA_TIMEOUT)
+
+        self.local.set(key, data)
+        return data
+
+    async def aget_or_build(self, version, abuild):
+        key = self.data_key(version)
+
+        data = self.local.get(key)
+        if data is not None:
+            return data
+
+        data = await cache.aget(key)
+        if data is None:
+            data = await abuild()
+            await cache.aset(key, data, DATA_TIMEOUT)
+
+        self.local.set(key, data)
+        return data
+
+    def conditional_headers(self, version, last_modified):
+        return {
+            "ETag": f'"{self.name}-{version}"',
+            "Last-Modified": http_date(last_modified),
+            "Cache-Control": "no-cache",
+        }
+
+
+def is_not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return "*" in etags or etag in etags
+
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+supplier_directory = DirectoryCache("supplier")
+customer_directory = DirectoryCache("customer")
+
+
+class CachedDirectoryMixin:
+    """
+    list() справочника из кеша, с ETag/Last-Modified; 304 отдаётся без обращения к БД.
+    Запросы с параметрами (поиск, фильтры) идут мимо кеша.
+    """
+
+    directory_cache = None
+
+    def list(self, request, *args, **kwargs):
+        if self.directory_cache is None or request.query_params:
+            return super().list(request, *args, **kwargs)
+
+        version, last_modified = self.directory_cache.get_version()
+        headers = self.directory_cache.conditional_headers(version, last_modified)
+
+        if is_not_modified(request, headers["ETag"], last_modified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = self.directory_cache.get_or_build(version, self.build_directory)
+        return Response(data, headers=headers)
+
+    def build_directory(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        return list(self.get_serializer(queryset, many=True).data)
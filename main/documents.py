@@ -0,0 +1,139 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import DocumentBlob, DocumentUploadChunk, RequestDocument
+
+
+# --------------------
+# CONTENT-ADDRESSED DOCUMENTS
+# --------------------
+# Файл режется на куски по DOCUMENT_CHUNK_SIZE, каждый хешируется SHA-256 по мере
+# чтения. Адрес содержимого (content_key) — SHA-256 от склеенных дайджестов кусков:
+# его можно собрать из кусков, пришедших в разных запросах и в любом порядке,
+# не перечитывая файл. Размер куска — часть алгоритма, менять его нельзя.
+
+DOCUMENT_CHUNK_SIZE = 4 * 1024 * 1024
+
+BLOB_PREFIX = "purchase_requests/blobs"
+
+STREAM_READ_SIZE = 64 * 1024
+
+
+class IncompleteUpload(Exception):
+    def __init__(self, missing):
+        super().__init__(f"Missing chunks: {missing}")
+        self.missing = missing
+
+
+def content_key(digests):
+    return hashlib.sha256(b"".join(digests)).hexdigest()
+
+
+def blob_name(checksum):
+    return f"{BLOB_PREFIX}/{checksum[:2]}/{checksum[2:4]}/{checksum}"
+
+
+def chunk_count(size):
+    return (size + DOCUMENT_CHUNK_SIZE - 1) // DOCUMENT_CHUNK_SIZE
+
+
+def chunk_length(size, index):
+    return min(DOCUMENT_CHUNK_SIZE, size - index * DOCUMENT_CHUNK_SIZE)
+
+
+def upload_temp_path(upload):
+    return os.path.join(settings.DOCUMENT_UPLOAD_TEMP_DIR, f"{upload.pk}.part")
+
+
+def missing_chunks(upload):
+    received = set(upload.chunks.values_list("index", flat=True))
+    return [index for index in range(chunk_count(upload.size)) if index not in received]
+
+
+def write_chunk(upload, index, stream, expected_checksum=None):
+    """
+    Пишет кусок index из stream по его смещению во временном файле, хешируя на лету.
+    Повторная отправка того же куска (докачка) просто перезаписывает его.
+    """
+    if index >= chunk_count(upload.size):
+        raise ValidationError({"index": f"Chunk index out of range (0..{chunk_count(upload.size) - 1})."})
+
+    expected = chunk_length(upload.size, index)
+    hasher = hashlib.sha256()
+    received = 0
+
+    os.makedirs(settings.DOCUMENT_UPLOAD_TEMP_DIR, exist_ok=True)
+    fd = os.open(upload_temp_path(upload), os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        offset = index * DOCUMENT_CHUNK_SIZE
+        while received <= expected:
+            data = stream.read(STREAM_READ_SIZE)
+            if not data:
+                break
+            hasher.update(data)
+            received += len(data)
+            if received > expected:
+                break
+            os.pwrite(fd, data, offset)
+            offset += len(data)
+    finally:
+        os.close(fd)
+
+    checksum = hasher.hexdigest()
+    error = None
+    if received != expected:
+        error = f"Chunk {index} must be exactly {expected} bytes, got {received}."
+    elif expected_checksum and expected_checksum.lower() != checksum:
+        error = f"Chunk {index} checksum mismatch."
+    if error:
+        # байты по этому смещению уже могли быть перезаписаны — кусок нужно прислать заново
+        DocumentUploadChunk.objects.filter(upload=upload, index=index).delete()
+        raise ValidationError({"chunk": error})
+
+    DocumentUploadChunk.objects.update_or_create(upload=upload, index=index, defaults={"checksum": checksum})
+    upload.save(update_fields=["updated_at"])
+    return checksum
+
+
+def complete_upload(upload):
+    """
+    Собирает загрузку в RequestDocument. Если blob с таким содержимым уже есть,
+    временный файл удаляется и ничего не пишется в хранилище.
+    """
+    with transaction.atomic():
+        upload = type(upload).objects.select_for_update().get(pk=upload.pk)
+        if upload.document_id:
+            return upload.document
+
+        chunks = dict(upload.chunks.values_list("index", "checksum"))
+        missing = [index for index in range(chunk_count(upload.size)) if index not in chunks]
+        if missing:
+            raise IncompleteUpload(missing)
+
+        checksum = content_key(bytes.fromhex(chunks[index]) for index in range(len(chunks)))
+        blob = DocumentBlob.objects.store_path(checksum, upload_temp_path(upload), upload.size)
+
+        document = RequestDocument.objects.create(
+            request=upload.request,
+            type=upload.type,
+            uploaded_by=upload.uploaded_by,
+            file=blob.file.name,
+            blob=blob,
+            filename=upload.filename,
+        )
+        upload.document = document
+        upload.save(update_fields=["document", "updated_at"])
+
+        transaction.on_commit(lambda: discard_temp_file(upload))
+    return document
+
+
+def discard_temp_file(upload):
+    try:
+        os.remove(upload_temp_path(upload))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,252 @@
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import PurchaseRequest
+
+
+# --------------------
+# EXPORT OF REQUESTS + ITEMS
+# --------------------
+# Строки идут через QuerySet.iterator(chunk_size=...) (server-side cursor на Postgres),
+# а файл отдаётся генератором — память не растёт с числом заявок.
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    "ro_number",
+    "status",
+    "created_at",
+    "payment_date",
+    "ddl",
+    "creator",
+    "supplier",
+    "supplier_bin_iin",
+    "customer",
+    "vat_percent",
+    "amount_without_vat",
+    "amount_with_vat",
+    "item_name",
+    "item_quantity",
+    "item_price",
+    "item_total",
+]
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+
+def filter_export_queryset(params):
+    """
+    Фильтры выгрузки: status, date_from, date_to (по дате создания), supplier, customer
+    """
+    qs = PurchaseRequest.objects.all()
+
+    status = params.get("status")
+    if status in PurchaseRequest.Status.values:
+        qs = qs.filter(status=status)
+
+    date_from = parse_date(params.get("date_from") or "")
+    if date_from:
+        qs = qs.filter(created_at__date__gte=date_from)
+
+    date_to = parse_date(params.get("date_to") or "")
+    if date_to:
+        qs = qs.filter(created_at__date__lte=date_to)
+
+    supplier = params.get("supplier")
+    if supplier and str(supplier).isdigit():
+        qs = qs.filter(supplier_id=supplier)
+
+    customer = params.get("customer")
+    if customer and str(customer).isdigit():
+        qs = qs.filter(customer_id=customer)
+
+    return qs
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Одна строка на позицию; заявка без позиций — одна строка с пустыми колонками позиции
+    """
+    queryset = (
+        queryset
+        .select_related("creator", "supplier", "customer")
+        .prefetch_related("items")
+        .order_by("id")
+    )
+
+    for pr in queryset.iterator(chunk_size=chunk_size):
+        head = [
+            pr.ro_number,
+            pr.status,
+            timezone.localtime(pr.created_at) if pr.created_at else None,
+            pr.payment_date,
+            pr.ddl,
+            pr.creator.username if pr.creator else None,
+            pr.supplier.name if pr.supplier else None,
+            pr.supplier.bin_iin if pr.supplier else None,
+            pr.customer.name if pr.customer else None,
+            pr.vat_percent,
+            pr.amount_without_vat,
+            pr.amount_with_vat,
+        ]
+
+        items = pr.items.all()
+        if not items:
+            yield head + [None, None, None, None]
+        for item in items:
+            yield head + [item.name, item.quantity, item.price, item.total]
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+# --------------------
+# CSV
+# --------------------
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write() просто возвращает строку"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows, header=EXPORT_COLUMNS):
+    writer = csv.writer(_Echo())
+    # BOM — чтобы Excel открыл UTF-8 с кириллицей
+    yield "\ufeff" + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_text(v) for v in row])
+
+
+# --------------------
+# XLSX
+# --------------------
+# Минимальная книга из одного листа, которая пишется в zip потоково:
+# zipfile на не-seekable выходе пишет data descriptors, размер заранее не нужен.
+
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Requests" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+class _StreamBuffer:
+    """Куда zipfile пишет байты; генератор забирает их после каждой пачки строк"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, Decimal, float)) and not isinstance(value, bool):
+        return f'<c t="n"><v>{value}</v></c>'
+    text = _ILLEGAL_XML_CHARS.sub("", _text(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return "<row>" + "".join(_xlsx_cell(v) for v in row) + "</row>"
+
+
+def stream_xlsx(rows, header=EXPORT_COLUMNS, flush_every=500):
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_SHEET_HEAD + _xlsx_row(header)).encode())
+            yield buffer.pop()
+
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= flush_every:
+                    sheet.write("".join(pending).encode())
+                    pending.clear()
+                    yield buffer.pop()
+
+            sheet.write(("".join(pending) + _SHEET_TAIL).encode())
+
+    yield buffer.pop()
+
+
+def stream_export(queryset, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    rows = export_rows(queryset, chunk_size=chunk_size)
+    if fmt == "xlsx":
+        return stream_xlsx(rows)
+    return stream_csv(rows)
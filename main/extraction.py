@@ -0,0 +1,220 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+from xml.etree import ElementTree
+
+from django.core.files.storage import default_storage
+
+try:
+    from PIL import Image
+except ImportError:  # превью картинок — только с Pillow
+    Image = None
+
+try:
+    import pypdf
+except ImportError:  # текст PDF — pdftotext (poppler-utils) или pypdf
+    pypdf = None
+
+
+# --------------------
+# DOCUMENT TEXT / PREVIEW EXTRACTION
+# --------------------
+# Выполняется в процессах пула process_documents, никогда в запросе.
+# Функции получают имя файла в хранилище и возвращают простые данные (pickle в родителя),
+# в БД пишет только родительский процесс.
+#
+# PDF: pdftotext/pdftoppm из poppler-utils, если есть в PATH (текст — иначе pypdf).
+# DOCX/XLSX: стандартная библиотека. Картинки: превью через Pillow, текст — tesseract, если установлен.
+
+PREVIEW_SIZE = 800
+MAX_TEXT_LENGTH = 1_000_000
+TOOL_TIMEOUT = 60
+
+
+def process_blob(name):
+    """
+    {"kind", "text", "preview"} для файла name; preview — PNG-байты или None
+    """
+    with default_storage.open(name, "rb") as fh:
+        head = fh.read(8)
+
+    with local_copy(name) as path:
+        kind = sniff(head, path)
+        text = extract_text(path, kind)
+        preview = render_preview(path, kind)
+
+    return {"kind": kind, "text": text[:MAX_TEXT_LENGTH], "preview": preview}
+
+
+@contextmanager
+def local_copy(name):
+    # внешним утилитам нужен путь на диске; у удалённых хранилищ его нет
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+
+    if path is not None:
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        with default_storage.open(name, "rb") as fh:
+            shutil.copyfileobj(fh, tmp)
+        tmp.flush()
+        yield tmp.name
+
+
+def sniff(head, path):
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"\x89PNG"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = set(archive.namelist())
+        except zipfile.BadZipFile:
+            return "binary"
+        if "word/document.xml" in names:
+            return "docx"
+        if "xl/workbook.xml" in names:
+            return "xlsx"
+        return "zip"
+
+    with open(path, "rb") as fh:
+        sample = fh.read(4096)
+    if b"\x00" in sample:
+        return "binary"
+    return "text"
+
+
+def extract_text(path, kind):
+    if kind == "pdf":
+        return _pdf_text(path)
+    if kind == "docx":
+        return _docx_text(path)
+    if kind == "xlsx":
+        return _xlsx_text(path)
+    if kind in ("png", "jpeg"):
+        return _ocr_text(path)
+    if kind == "text":
+        with open(path, "rb") as fh:
+            data = fh.read(MAX_TEXT_LENGTH * 2)
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return data.decode("cp1251", errors="replace")
+    return ""
+
+
+def render_preview(path, kind):
+    if kind == "pdf" and shutil.which("pdftoppm"):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = os.path.join(tmp, "page")
+            subprocess.run(
+                ["pdftoppm", "-png", "-singlefile", "-f", "1", "-l", "1",
+                 "-scale-to", str(PREVIEW_SIZE), path, root],
+                check=True, capture_output=True, timeout=TOOL_TIMEOUT,
+            )
+            with open(root + ".png", "rb") as fh:
+                return fh.read()
+
+    if kind in ("png", "jpeg") and Image is not None:
+        with Image.open(path) as image:
+            image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+            buffer = BytesIO()
+            image.convert("RGB").save(buffer, "PNG", optimize=True)
+            return buffer.getvalue()
+
+    return None
+
+
+def _pdf_text(path):
+    if shutil.which("pdftotext"):
+        result = subprocess.run(
+            ["pdftotext", "-layout", "-q", path, "-"],
+            check=True, capture_output=True, timeout=TOOL_TIMEOUT,
+        )
+        return result.stdout.decode("utf-8", errors="replace")
+
+    if pypdf is not None:
+        reader = pypdf.PdfReader(path)
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+    return ""
+
+
+def _ocr_text(path):
+    if not shutil.which("tesseract"):
+        return ""
+    result = subprocess.run(
+        ["tesseract", path, "-", "-l", "rus+eng"],
+        check=True, capture_output=True, timeout=TOOL_TIMEOUT,
+    )
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _docx_text(path):
+    paragraphs = []
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as fh:
+        current = []
+        for event, element in ElementTree.iterparse(fh, events=("end",)):
+            tag = _local(element.tag)
+            if tag == "t" and element.text:
+                current.append(element.text)
+            elif tag == "tab":
+                current.append("\t")
+            elif tag == "p":
+                paragraphs.append("".join(current))
+                current = []
+                element.clear()
+    return "\n".join(p for p in paragraphs if p)
+
+
+def _xlsx_text(path):
+    lines = []
+    with zipfile.ZipFile(path) as archive:
+        shared = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            with archive.open("xl/sharedStrings.xml") as fh:
+                for event, element in ElementTree.iterparse(fh, events=("end",)):
+                    if _local(element.tag) == "si":
+                        shared.append("".join(t.text or "" for t in element.iter() if _local(t.tag) == "t"))
+                        element.clear()
+
+        sheets = sorted(n for n in archive.namelist() if re.match(r"xl/worksheets/sheet\d+\.xml$", n))
+        for sheet in sheets:
+            with archive.open(sheet) as fh:
+                row = []
+                for event, element in ElementTree.iterparse(fh, events=("end",)):
+                    tag = _local(element.tag)
+                    if tag == "c":
+                        row.append(_xlsx_cell(element, shared))
+                    elif tag == "row":
+                        if any(row):
+                            lines.append("\t".join(row))
+                        row = []
+                        element.clear()
+    return "\n".join(lines)
+
+
+def _xlsx_cell(element, shared):
+    cell_type = element.get("t")
+    if cell_type == "inlineStr":
+        return "".join(t.text or "" for t in element.iter() if _local(t.tag) == "t")
+    value = next((v.text for v in element if _local(v.tag) == "v"), None) or ""
+    if cell_type == "s" and value:
+        return shared[int(value)]
+    return value
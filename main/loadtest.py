@@ -0,0 +1,249 @@
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+
+# --------------------
+# HTTP LOAD-TEST SCENARIOS
+# --------------------
+# Виртуальные пользователи ходят по настоящим маршрутам запущенного сервера
+# (allauth-логин, форма заявки, API, списки, смена статуса) в заданных пропорциях.
+# Статистика — по маршруту (шаблону URL), а не по конкретному адресу.
+# Запуск и отчёт: manage.py load_test (JSON для сравнения между коммитами).
+
+REQUEST_STATUSES = ("", "WAITING", "PAID", "CANCELLED")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, latency, status):
+        with self._lock:
+            self.latencies.setdefault(route, []).append(latency)
+            by_status = self.statuses.setdefault(route, {})
+            by_status[status] = by_status.get(status, 0) + 1
+
+    def error(self, route, exc):
+        with self._lock:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        for route in sorted(self.latencies.keys() | self.errors.keys()):
+            latencies = sorted(self.latencies.get(route, []))
+            statuses = self.statuses.get(route, {})
+            routes[route] = {
+                "requests": len(latencies),
+                "errors": self.errors.get(route, 0),
+                "failed": sum(count for status, count in statuses.items() if status >= 400),
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+                "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                "max_ms": round((latencies[-1] if latencies else 0) * 1000, 2),
+            }
+        return routes
+
+
+class Session:
+    """
+    Один виртуальный пользователь: keep-alive соединение и cookies (sessionid, csrftoken)
+    """
+
+    def __init__(self, base_url, stats, timeout=30.0):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL: {base_url}")
+        self.netloc = parts.netloc
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.timeout = timeout
+        self.stats = stats
+        self.cookies = {}
+        self.conn = self.connection_class(self.netloc, timeout=timeout)
+
+    def close(self):
+        self.conn.close()
+
+    def request(self, route, method, path, body=None, headers=None):
+        """
+        (status, тело) или (None, None) при сетевой ошибке; редиректы не выполняются
+        """
+        headers = dict(headers or {})
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if method != "GET":
+            headers.setdefault("Referer", self.origin + "/")
+            if "csrftoken" in self.cookies:
+                headers.setdefault("X-CSRFToken", self.cookies["csrftoken"])
+
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            self.conn.close()
+            self.conn = self.connection_class(self.netloc, timeout=self.timeout)
+            self.stats.error(route, exc)
+            return None, None
+        self.stats.record(route, time.perf_counter() - start, response.status)
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, data
+
+    def get_json(self, route, path):
+        status, data = self.request(route, "GET", path, headers={"Accept": "application/json"})
+        if status != 200:
+            return None
+        return json.loads(data)
+
+    def post_json(self, route, path, payload):
+        return self.request(route, "POST", path, body=json.dumps(payload), headers={
+            "Content-Type": "application/json", "Accept": "application/json",
+        })
+
+    def login(self, username, password):
+        status, data = self.request("GET /accounts/login/", "GET", "/accounts/login/")
+        match = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', data or b"")
+        if match is None:
+            return False
+        body = urlencode({
+            "login": username, "password": password, "csrfmiddlewaretoken": match.group(1).decode(),
+        })
+        status, _ = self.request("POST /accounts/login/", "POST", "/accounts/login/", body=body, headers={
+            "Content-Type": "application/x-www-form-urlencoded",
+        })
+        return status == 302 and "sessionid" in self.cookies
+
+
+# --------------------
+# SCENARIOS
+# --------------------
+# Действие — функция (session, state); state хранит то, что пользователь «видел»
+# (id поставщиков/отделов, заявки на странице) между шагами.
+
+def open_request_form(session, state):
+    session.request("GET /request/item/", "GET", "/request/item/")
+    suppliers = session.get_json("GET /api/suppliers/", "/api/suppliers/")
+    customers = session.get_json("GET /api/customers/", "/api/customers/")
+    if suppliers is not None:
+        state["suppliers"] = [row["id"] for row in _results(suppliers)]
+    if customers is not None:
+        state["customers"] = [row["id"] for row in _results(customers)]
+
+
+def create_request(session, state):
+    if "suppliers" not in state:
+        open_request_form(session, state)
+    state["created"] = state.get("created", 0) + 1
+    payload = {
+        "ro_number": f"LT-{state['name']}-{state['created']}-{random.getrandbits(32):08x}",
+        "vat_percent": 12,
+        "comment": "load test",
+        "items": [
+            {"name": f"Item {i}", "quantity": random.randint(1, 10), "price": f"{random.uniform(1, 500):.2f}"}
+            for i in range(random.randint(1, 5))
+        ],
+    }
+    if state.get("suppliers"):
+        payload["supplier"] = random.choice(state["suppliers"])
+    if state.get("customers"):
+        payload["customer"] = random.choice(state["customers"])
+    session.post_json("POST /api/purchase-requests/", "/api/purchase-requests/", payload)
+
+
+def my_requests(session, state):
+    session.request("GET /my-requests/", "GET", "/my-requests/")
+
+
+def list_requests(session, state):
+    status = random.choice(REQUEST_STATUSES)
+    path = f"/requests/?status={status}" if status else "/requests/"
+    session.request(f"GET /requests/?status={status or '*'}", "GET", path)
+
+
+def _waiting_requests(session, state):
+    page = session.get_json("GET /api/purchase-requests/", "/api/purchase-requests/")
+    if page is None:
+        return []
+    return [row for row in _results(page) if row.get("status") == "WAITING"]
+
+
+def change_status(session, state):
+    # кнопка «Оплатить»/«Отменить» в списке заявок
+    waiting = _waiting_requests(session, state)
+    if not waiting:
+        return
+    row = random.choice(waiting)
+    status = random.choice(("PAID", "PAID", "PAID", "CANCELLED"))
+    session.request("GET /requests/<pk>/status/<status>/", "GET", f"/requests/{row['id']}/status/{status}/")
+
+
+def bulk_transition(session, state):
+    waiting = _waiting_requests(session, state)
+    if not waiting:
+        return
+    rows = random.sample(waiting, min(len(waiting), 10))
+    session.post_json("POST /api/purchase-requests/transition/", "/api/purchase-requests/transition/", {
+        "status": "PAID",
+        "requests": [{"id": row["id"], "version": row["version"]} for row in rows],
+    })
+
+
+def _results(data):
+    return data.get("results", []) if isinstance(data, dict) else data
+
+
+# роль -> [(действие, вес)]
+SCENARIOS = {
+    "mixed": {
+        "employee": [(open_request_form, 3), (create_request, 3), (my_requests, 2)],
+        "accountant": [(list_requests, 5), (change_status, 2), (bulk_transition, 1)],
+    },
+    "read": {
+        "employee": [(open_request_form, 1), (my_requests, 1)],
+        "accountant": [(list_requests, 1)],
+    },
+    "write": {
+        "employee": [(create_request, 1)],
+        "accountant": [(change_status, 1), (bulk_transition, 1)],
+    },
+}
+
+
+def run_user(base_url, stats, role, credentials, actions, stop, think_time, name):
+    session = Session(base_url, stats)
+    state = {"name": name}
+    try:
+        if not session.login(*credentials):
+            stats.error(f"login failed ({role})", None)
+            return
+        functions = [action for action, weight in actions]
+        weights = [weight for action, weight in actions]
+        while not stop.is_set():
+            random.choices(functions, weights)[0](session, state)
+            if think_time:
+                stop.wait(random.uniform(0, 2 * think_time))
+    finally:
+        session.close()
@@ -0,0 +1,100 @@
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.loadtest import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark a running server with N concurrent keep-alive connections "
+        "(e.g. gunicorn sync workers vs uvicorn with DJANGO_ASYNC=1)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", nargs="+", help="Full URL(s), e.g. http://127.0.0.1:8000/api/suppliers/")
+        parser.add_argument("--concurrency", "-c", type=int, default=50)
+        parser.add_argument("--requests", "-n", type=int, default=2000, help="Total requests per URL")
+        parser.add_argument(
+            "--header", "-H", action="append", default=[],
+            help='Extra header, e.g. -H "Cookie: sessionid=..." (repeatable)',
+        )
+        parser.add_argument("--timeout", type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        headers = {}
+        for header in options["header"]:
+            name, sep, value = header.partition(":")
+            if not sep:
+                raise CommandError(f"Bad header: {header!r}")
+            headers[name.strip()] = value.strip()
+
+        for url in options["url"]:
+            self.run(url, options["concurrency"], options["requests"], headers, options["timeout"])
+
+    def run(self, url, concurrency, total, headers, timeout):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise CommandError(f"Unsupported URL: {url}")
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        latencies = []
+        statuses = {}
+        errors = []
+        lock = threading.Lock()
+        remaining = [total]
+
+        def take():
+            with lock:
+                if remaining[0] <= 0:
+                    return False
+                remaining[0] -= 1
+                return True
+
+        def worker():
+            conn = connection_class(parts.netloc, timeout=timeout)
+            local_latencies = []
+            local_statuses = {}
+            while take():
+                start = time.perf_counter()
+                try:
+                    conn.request("GET", path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as exc:
+                    conn.close()
+                    conn = connection_class(parts.netloc, timeout=timeout)
+                    with lock:
+                        errors.append(exc)
+                    continue
+                local_latencies.append(time.perf_counter() - start)
+                local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+            conn.close()
+            with lock:
+                latencies.extend(local_latencies)
+                for status, count in local_statuses.items():
+                    statuses[status] = statuses.get(status, 0) + count
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        status_summary = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+        self.stdout.write(
+            f"{url}  c={concurrency}  {len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+            f"p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+            f"max {(latencies[-1] if latencies else 0) * 1000:7.1f} ms  "
+            f"[{status_summary}]" + (f"  errors: {len(errors)}" if errors else "")
+        )
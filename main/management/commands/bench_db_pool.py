@@ -0,0 +1,188 @@
+import copy
+import random
+import threading
+import time
+
+import psycopg2
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from main.loadtest import percentile
+from main.models import PurchaseRequest
+from osc_erp.db_pool import close_pool, pools
+
+MODES = ("direct", "persistent", "pooled")
+WORKLOADS = ("connect", "burst")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Postgres connection handling on the default database: a new connection per request "
+        "(CONN_MAX_AGE=0), one persistent connection per thread (CONN_MAX_AGE=600) and the process pool "
+        "(DATABASE_POOL). 'connect' — many short requests; 'burst' — more threads than the pool size "
+        "holding connections, in bursts separated by idle time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", action="append", choices=MODES, help="Repeatable; default all")
+        parser.add_argument("--workload", action="append", choices=WORKLOADS, help="Repeatable; default all")
+        parser.add_argument("--threads", type=int, default=8, help="'connect': concurrent threads")
+        parser.add_argument("--requests", type=int, default=2000, help="'connect': total requests")
+        parser.add_argument("--burst-threads", type=int, default=40)
+        parser.add_argument("--bursts", type=int, default=3)
+        parser.add_argument("--burst-requests", type=int, default=5, help="Requests per thread per burst")
+        parser.add_argument("--hold", type=float, default=10.0, help="'burst': ms a request keeps its connection")
+        parser.add_argument("--idle", type=float, default=2.0, help="'burst': seconds between bursts")
+
+    def handle(self, *args, **options):
+        default = connections[DEFAULT_DB_ALIAS]
+        if default.vendor != "postgresql":
+            raise CommandError("Needs Postgres in DATABASE_URL (e.g. DATABASE_SSL_REQUIRE=0 for a local server)")
+        self.max_pk = PurchaseRequest.objects.order_by("-pk").values_list("pk", flat=True).first()
+        if not self.max_pk:
+            raise CommandError("No purchase requests: run seed_erp first")
+        self.server_params = default.get_connection_params()
+        default.close()
+
+        pool_options = dict(settings.DATABASE_POOL_OPTIONS)
+        self.stdout.write(
+            "pool: " + ", ".join(f"{key}={value:g}" for key, value in pool_options.items())
+        )
+        for workload in options["workload"] or WORKLOADS:
+            for mode in options["mode"] or MODES:
+                alias = f"bench_{mode}"
+                self.add_alias(alias, mode, pool_options)
+                try:
+                    self.report(workload, mode, *self.run(alias, mode, workload, options))
+                finally:
+                    self.drop_alias(alias)
+
+    # ---- алиасы с нужным режимом соединений ----
+
+    def add_alias(self, alias, mode, pool_options):
+        database = copy.deepcopy(connections[DEFAULT_DB_ALIAS].settings_dict)
+        database["ENGINE"] = "osc_erp.pooled_postgresql" if mode == "pooled" else "django.db.backends.postgresql"
+        database["CONN_MAX_AGE"] = 600 if mode == "persistent" else 0
+        database["POOL"] = pool_options
+        connections.settings[alias] = database
+
+    def drop_alias(self, alias):
+        close_pool(alias)
+        del connections.settings[alias]
+
+    # ---- прогон ----
+
+    def run(self, alias, mode, workload, options):
+        latencies = []
+        errors = []
+        connects = [0]
+        lock = threading.Lock()
+
+        def request(hold):
+            conn = connections[alias]
+            fresh = conn.connection is None
+            start = time.perf_counter()
+            try:
+                PurchaseRequest.objects.using(alias).filter(
+                    pk=random.randint(1, self.max_pk)
+                ).values_list("pk", flat=True).first()
+                if hold:
+                    time.sleep(hold)
+            except DatabaseError as exc:
+                with lock:
+                    errors.append(exc)
+                return
+            finally:
+                # как request_finished: CONN_MAX_AGE=0 — закрыть (или вернуть в пул)
+                conn.close_if_unusable_or_obsolete()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                connects[0] += fresh and mode != "pooled"
+
+        if workload == "connect":
+            threads, rounds, hold = options["threads"], 1, 0
+            total = options["requests"]
+            per_thread = [total // threads + (i < total % threads) for i in range(threads)]
+        else:
+            threads, rounds, hold = options["burst_threads"], options["bursts"], options["hold"] / 1000
+            per_thread = [options["burst_requests"]] * threads
+
+        # потоки живут все раунды, как потоки воркера: постоянные соединения переживают паузы
+        round_start = threading.Barrier(threads + 1)
+        round_end = threading.Barrier(threads + 1)
+
+        def worker(count):
+            try:
+                for _ in range(rounds):
+                    round_start.wait()
+                    for _ in range(count):
+                        request(hold)
+                    round_end.wait()
+            finally:
+                connections[alias].close()
+
+        workers = [threading.Thread(target=worker, args=(count,)) for count in per_thread]
+        for thread in workers:
+            thread.start()
+        monitor = ServerConnections(self.server_params)
+        monitor.start()
+        busy = 0.0
+        for index in range(rounds):
+            if index:
+                time.sleep(options["idle"])
+            round_start.wait()
+            started = time.perf_counter()
+            round_end.wait()
+            busy += time.perf_counter() - started
+        for thread in workers:
+            thread.join()
+        monitor.stop()
+
+        if mode == "pooled":
+            stats = next(pool.stats() for pool in pools() if pool.name == alias)
+            connects[0] = stats["opened"]
+        latencies.sort()
+        return latencies, errors, busy, connects[0], monitor.peak
+
+    def report(self, workload, mode, latencies, errors, busy, connects, peak):
+        self.stdout.write(
+            f"{workload:<8} {mode:<11} {len(latencies) / busy:8.1f} req/s  "
+            f"p50 {percentile(latencies, 50) * 1000:7.2f} ms  "
+            f"p95 {percentile(latencies, 95) * 1000:7.2f} ms  "
+            f"p99 {percentile(latencies, 99) * 1000:7.2f} ms  "
+            f"max {(latencies[-1] if latencies else 0) * 1000:7.2f} ms  "
+            f"connects {connects:>6}  peak server conns {peak:>4}"
+            + (f"  errors: {len(errors)} ({errors[0]})" if errors else "")
+        )
+
+
+class ServerConnections(threading.Thread):
+    """
+    Пик числа сессий в БД (pg_stat_activity) во время прогона, опрос раз в 10 мс
+    """
+
+    def __init__(self, conn_params):
+        super().__init__(daemon=True)
+        self.conn_params = conn_params
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        connection = psycopg2.connect(**self.conn_params)
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop_event.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND pid <> pg_backend_pid()"
+                    )
+                    self.peak = max(self.peak, cursor.fetchone()[0])
+                    self._stop_event.wait(0.01)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
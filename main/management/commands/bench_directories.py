@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from main.cache import supplier_directory
+from main.models import Supplier
+from main.views import SupplierViewSet
+
+
+class UncachedSupplierViewSet(SupplierViewSet):
+    directory_cache = None
+
+
+class Command(BaseCommand):
+    help = "Benchmark /api/suppliers/: uncached vs cached vs conditional GET (304)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--seed", type=int, default=0,
+            help="Insert N temporary suppliers (rolled back afterwards)",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed"]:
+                Supplier.objects.bulk_create(
+                    Supplier(name=f"Supplier {i}", bin_iin=f"{i:012d}") for i in range(options["seed"])
+                )
+            self.run(options["requests"])
+            transaction.set_rollback(True)
+
+    def run(self, n):
+        factory = APIRequestFactory()
+        uncached = UncachedSupplierViewSet.as_view({"get": "list"})
+        cached = SupplierViewSet.as_view({"get": "list"})
+
+        supplier_directory.bump()
+        etag = cached(factory.get("/api/suppliers/"))["ETag"]
+
+        scenarios = [
+            ("uncached", uncached, {}),
+            ("cached", cached, {}),
+            ("304", cached, {"HTTP_IF_NONE_MATCH": etag}),
+        ]
+
+        self.stdout.write(f"suppliers: {Supplier.objects.count()}, requests per scenario: {n}")
+        for name, view, headers in scenarios:
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                for _ in range(n):
+                    response = view(factory.get("/api/suppliers/", **headers))
+                    response.render()
+                elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f"{name:>9}: {n / elapsed:10.1f} req/s  "
+                f"{elapsed / n * 1000:8.3f} ms/req  "
+                f"{len(ctx.captured_queries) / n:5.2f} queries/req  "
+                f"status {response.status_code}"
+            )
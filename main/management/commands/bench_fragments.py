@@ -0,0 +1,84 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.test.utils import override_settings
+
+from main.models import Customer, PurchaseItem, PurchaseRequest, Supplier
+from main.pagination import KeysetPage
+from main.views import requests_list_context, requests_list_queryset
+
+
+class Command(BaseCommand):
+    help = "Render time of requests_list.html: no row cache vs cold vs warm vs partly changed rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Temporary requests to render (rolled back)")
+        parser.add_argument("--items", type=int, default=3, help="Items per request")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--changed", type=float, default=0.1, help="Share of rows touched between renders")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options["rows"], options["items"])
+            requests = list(requests_list_queryset("").order_by("-pk")[:options["rows"]])
+            self.run(requests, options["repeat"], options["changed"])
+            transaction.set_rollback(True)
+
+    def seed(self, rows, items):
+        supplier = Supplier.objects.create(name="Bench supplier", bin_iin="000000000000")
+        customer = Customer.objects.create(name="Bench department")
+        created = PurchaseRequest.objects.bulk_create(
+            PurchaseRequest(
+                ro_number=f"BENCH-{i}", supplier=supplier, customer=customer,
+                amount_without_vat=Decimal("100.00"), amount_with_vat=Decimal("112.00"),
+                comment="Benchmark row",
+            )
+            for i in range(rows)
+        )
+        PurchaseItem.objects.bulk_create((
+            PurchaseItem(request=pr, name=f"Item {j}", quantity=j + 1, price=Decimal("10.00"), total=Decimal(10 * (j + 1)))
+            for pr in created
+            for j in range(items)
+        ), update_request_totals=False)
+
+    def run(self, requests, repeat, changed):
+        def render():
+            context = requests_list_context(KeysetPage(requests), "")
+            return render_to_string("request/requests_list.html", context)
+
+        def measure(label, before=None):
+            timings = []
+            for _ in range(repeat):
+                if before is not None:
+                    before()
+                started = time.perf_counter()
+                render()
+                timings.append(time.perf_counter() - started)
+            best = min(timings) * 1000
+            self.stdout.write(f"{label:<28} {best:8.1f} ms  ({best / len(requests) * 1000:6.1f} µs/row)")
+
+        self.stdout.write(f"rows: {len(requests)}, best of {repeat}")
+
+        dummy = {**settings.CACHES, "fragments": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with override_settings(CACHES=dummy):
+            measure("no row cache")
+
+        fragments = caches["fragments"]
+        measure("cold (render + store)", before=fragments.clear)
+        measure("warm (all rows cached)")
+
+        step = max(1, round(1 / changed)) if changed > 0 else 0
+
+        def touch():
+            # как после правки: у части строк новый updated_at
+            for pr in requests[::step]:
+                pr.updated_at += timedelta(microseconds=1)
+
+        if step:
+            measure(f"{changed:.0%} rows changed", before=touch)
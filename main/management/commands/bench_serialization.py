@@ -0,0 +1,106 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from main.models import Customer, PurchaseItem, PurchaseRequest, RequestDocument, Supplier
+from main.row_serializers import row_serializer
+from main.serializers import PurchaseRequestSerializer
+from osc_erp.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = (
+        "GET /api/purchase-requests/ body for N rows: PurchaseRequestSerializer vs row serialization "
+        "(main.row_serializers), rendered with JSONRenderer and FastJSONRenderer. Checks the bytes are identical"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Temporary requests to serialize (rolled back)")
+        parser.add_argument("--items", type=int, default=3, help="Items per request")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--expand", default="", help="e.g. supplier,customer")
+
+    def handle(self, *args, **options):
+        expand = [name for name in options["expand"].split(",") if name]
+        # build_absolute_uri для ссылок на файлы проверяет Host
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"]):
+            pks = self.seed(options["rows"], options["items"])
+            self.run(pks, expand, options["repeat"])
+            transaction.set_rollback(True)
+
+    def seed(self, rows, items):
+        supplier = Supplier.objects.create(name="Bench supplier", bin_iin="000000000000")
+        customer = Customer.objects.create(name="Bench department")
+        created = PurchaseRequest.objects.bulk_create(
+            PurchaseRequest(
+                ro_number=f"BENCH-SER-{i}", supplier=supplier, customer=customer,
+                amount_without_vat=Decimal("100.00"), amount_with_vat=Decimal("112.00"),
+                comment="Benchmark row",
+            )
+            for i in range(rows)
+        )
+        PurchaseItem.objects.bulk_create((
+            PurchaseItem(request=pr, name=f"Item {j}", quantity=j + 1, price=Decimal("10.00"))
+            for pr in created
+            for j in range(items)
+        ), update_request_totals=False)
+        RequestDocument.objects.bulk_create(
+            RequestDocument(request=pr, file=f"purchase_requests/documents/bench-{pr.pk}.pdf", filename="bench.pdf")
+            for pr in created
+        )
+        return [pr.pk for pr in created]
+
+    def run(self, pks, expand, repeat):
+        query = "?expand=" + ",".join(expand) if expand else ""
+        request = Request(RequestFactory().get(f"/api/purchase-requests/{query}"))
+        context = {"request": request}
+        queryset = PurchaseRequest.objects.filter(pk__in=pks).order_by("-created_at", "id")
+
+        def serializer_data():
+            objs = list(PurchaseRequestSerializer.setup_eager_loading(queryset))
+            return PurchaseRequestSerializer(objs, many=True, context=context).data
+
+        rows = row_serializer(PurchaseRequestSerializer, PurchaseRequestSerializer(context=context).get_expand())
+
+        def row_data():
+            return rows.serialize(rows.values(queryset), context)
+
+        variants = [("serializer", serializer_data, JSONRenderer())]
+        variants.append(("rows", row_data, JSONRenderer()))
+        if orjson is not None:
+            variants.append(("rows + orjson", row_data, FastJSONRenderer()))
+        else:
+            self.stdout.write("orjson is not installed: FastJSONRenderer = JSONRenderer")
+
+        self.stdout.write(f"rows: {len(pks)}, best of {repeat}{', expand=' + ','.join(expand) if expand else ''}")
+        reference = None
+        baseline = None
+        for label, build, renderer in variants:
+            build_times, render_times = [], []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                data = build()
+                built = time.perf_counter()
+                body = renderer.render(data)
+                build_times.append(built - started)
+                render_times.append(time.perf_counter() - built)
+
+            if reference is None:
+                reference = body
+            elif body != reference:
+                raise CommandError(f"{label}: output differs from PurchaseRequestSerializer")
+
+            build_ms, render_ms = min(build_times) * 1000, min(render_times) * 1000
+            total = build_ms + render_ms
+            baseline = baseline or total
+            self.stdout.write(
+                f"{label:<15} fetch+serialize {build_ms:8.1f} ms  render {render_ms:7.1f} ms  "
+                f"total {total:8.1f} ms  x{baseline / total:4.1f}"
+            )
+        self.stdout.write(f"identical output: {len(reference)} bytes")
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from main.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, filter_export_queryset, stream_export
+
+
+class Command(BaseCommand):
+    help = "Export purchase requests with their items to CSV/XLSX (streamed, constant memory)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+        parser.add_argument("--output", "-o", help="File path; stdout if omitted")
+        parser.add_argument("--status")
+        parser.add_argument("--date-from", help="YYYY-MM-DD, by creation date")
+        parser.add_argument("--date-to", help="YYYY-MM-DD, by creation date")
+        parser.add_argument("--supplier", help="Supplier id")
+        parser.add_argument("--customer", help="Customer id")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = filter_export_queryset({
+            "status": options["status"],
+            "date_from": options["date_from"],
+            "date_to": options["date_to"],
+            "supplier": options["supplier"],
+            "customer": options["customer"],
+        })
+
+        fmt = options["format"]
+        chunks = stream_export(queryset, fmt, chunk_size=options["chunk_size"])
+
+        if options["output"]:
+            out = open(options["output"], "wb")
+        else:
+            out = sys.stdout.buffer
+
+        try:
+            for chunk in chunks:
+                out.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        finally:
+            if options["output"]:
+                out.close()
+
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"Exported to {options['output']}"))
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from main.documents import BLOB_PREFIX, discard_temp_file
+from main.models import DocumentBlob, DocumentUpload
+from main.previews import preview_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete document blobs no RequestDocument references, abandoned chunked uploads "
+        "and blob files without a DocumentBlob row"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours", type=float, default=24,
+            help="Only touch blobs/uploads/files older than this (protects uploads in progress)",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["grace_hours"])
+        dry_run = options["dry_run"]
+
+        blobs = self.collect_blobs(cutoff, dry_run)
+        uploads = self.collect_uploads(cutoff, dry_run)
+        files = self.collect_files(cutoff, dry_run)
+
+        prefix = "would delete" if dry_run else "deleted"
+        self.stdout.write(f"{prefix}: {blobs} blobs, {uploads} uploads, {files} orphan files")
+
+    def collect_blobs(self, cutoff, dry_run):
+        unreferenced = DocumentBlob.objects.filter(documents__isnull=True, created_at__lt=cutoff)
+        if dry_run:
+            return unreferenced.count()
+
+        deleted = 0
+        for blob in unreferenced.iterator():
+            try:
+                with transaction.atomic():
+                    # PROTECT: если документ успел сослаться на blob — удаление упадёт
+                    blob.delete()
+                    transaction.on_commit(lambda blob=blob: self.delete_files(blob))
+            except ProtectedError:
+                continue
+            deleted += 1
+        return deleted
+
+    def delete_files(self, blob):
+        default_storage.delete(blob.file.name)
+        preview_cache.discard(blob.checksum)
+
+    def collect_uploads(self, cutoff, dry_run):
+        # незавершённые — брошены; завершённые больше не нужны для повторного complete
+        stale = DocumentUpload.objects.filter(updated_at__lt=cutoff)
+        if dry_run:
+            return stale.count()
+
+        deleted = 0
+        for upload in stale.iterator():
+            discard_temp_file(upload)
+            upload.delete()
+            deleted += 1
+        return deleted
+
+    def collect_files(self, cutoff, dry_run):
+        # файлы, записанные в хранилище, но без строки (транзакция complete откатилась)
+        known = set(DocumentBlob.objects.values_list("file", flat=True))
+        deleted = 0
+        for name in self.walk(BLOB_PREFIX):
+            if name in known or default_storage.get_modified_time(name) >= cutoff:
+                continue
+            if not dry_run:
+                default_storage.delete(name)
+            deleted += 1
+        return deleted
+
+    def walk(self, path):
+        try:
+            dirs, files = default_storage.listdir(path)
+        except FileNotFoundError:
+            return
+        for name in files:
+            yield f"{path}/{name}"
+        for name in dirs:
+            yield from self.walk(f"{path}/{name}")
@@ -0,0 +1,146 @@
+import json
+import subprocess
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main.loadtest import SCENARIOS, RouteStats, run_user
+
+DEFAULT_PASSWORD = "loadtest-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a scripted load test (login, request form, create, lists, status changes) "
+        "against a running server; p50/p95/p99 and throughput per route, optionally as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="e.g. http://127.0.0.1:8000")
+        parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+        parser.add_argument("--users", "-u", type=int, default=10, help="Concurrent virtual users")
+        parser.add_argument("--accountants", type=float, default=0.3, help="Share of users with the ACCOUNTANT role")
+        parser.add_argument("--duration", "-d", type=float, default=30.0, help="Seconds")
+        parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between actions, seconds")
+        parser.add_argument("--employee", default=f"loadtest-employee:{DEFAULT_PASSWORD}", help="username:password")
+        parser.add_argument("--accountant", default=f"loadtest-accountant:{DEFAULT_PASSWORD}", help="username:password")
+        parser.add_argument(
+            "--create-users", action="store_true",
+            help="Create/update the two accounts in this project's database (the server must use the same DB)",
+        )
+        parser.add_argument("--output", "-o", help="Write machine-readable results to this JSON file")
+        parser.add_argument("--compare", help="Previous JSON result: print p95/throughput deltas per route")
+
+    def handle(self, *args, **options):
+        credentials = {
+            "employee": self.parse_credentials(options["employee"]),
+            "accountant": self.parse_credentials(options["accountant"]),
+        }
+        if options["create_users"]:
+            self.create_users(credentials)
+
+        users = options["users"]
+        accountants = round(users * options["accountants"])
+        roles = ["accountant"] * accountants + ["employee"] * (users - accountants)
+        scenario = SCENARIOS[options["scenario"]]
+
+        stats = RouteStats()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=run_user, args=(
+                options["base_url"], stats, role, credentials[role], scenario[role],
+                stop, options["think_time"], f"{role[0]}{i}",
+            ))
+            for i, role in enumerate(roles)
+        ]
+
+        self.stdout.write(
+            f"{options['scenario']}: {users} users ({accountants} accountants), {options['duration']:.0f}s "
+            f"against {options['base_url']}"
+        )
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            time.sleep(options["duration"])
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+
+        routes = stats.summary(elapsed)
+        total = sum(route["requests"] for route in routes.values())
+        result = {
+            "commit": self.git_commit(),
+            "started_at": timezone.now().isoformat(),
+            "base_url": options["base_url"],
+            "scenario": options["scenario"],
+            "users": users,
+            "accountants": accountants,
+            "duration_s": round(elapsed, 2),
+            "think_time_s": options["think_time"],
+            "total_requests": total,
+            "total_rps": round(total / elapsed, 2),
+            "routes": routes,
+        }
+
+        self.report(result)
+        if options["compare"]:
+            self.compare(result, options["compare"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(result, fh, indent=2, ensure_ascii=False)
+            self.stdout.write(f"results written to {options['output']}")
+
+    def parse_credentials(self, value):
+        username, sep, password = value.partition(":")
+        if not sep or not username:
+            raise CommandError(f"Expected username:password, got {value!r}")
+        return username, password
+
+    def create_users(self, credentials):
+        User = get_user_model()
+        for role, (username, password) in credentials.items():
+            user, _ = User.objects.get_or_create(username=username)
+            user.role = role.upper()
+            user.set_password(password)
+            user.save()
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, result):
+        self.stdout.write(
+            f"{'route':<44} {'req':>6} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses"
+        )
+        for route, row in result["routes"].items():
+            statuses = ", ".join(f"{status}: {count}" for status, count in row["statuses"].items())
+            if row["errors"]:
+                statuses += f"  errors: {row['errors']}"
+            self.stdout.write(
+                f"{route:<44} {row['requests']:>6} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} "
+                f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}  {statuses}"
+            )
+        self.stdout.write(f"total: {result['total_requests']} requests, {result['total_rps']:.1f} req/s")
+
+    def compare(self, result, path):
+        with open(path, encoding="utf-8") as fh:
+            previous = json.load(fh)
+        self.stdout.write(f"vs {previous.get('commit') or path}:")
+        for route, row in result["routes"].items():
+            old = previous.get("routes", {}).get(route)
+            if not old or not old["requests"]:
+                continue
+            self.stdout.write(
+                f"{route:<44} p95 {old['p95_ms']:>8.1f} -> {row['p95_ms']:>8.1f} ms  "
+                f"rps {old['rps']:>7.1f} -> {row['rps']:>7.1f}"
+            )
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main.models import DocumentBlob, DocumentJob
+from main.processing import run_pool
+
+
+class Command(BaseCommand):
+    help = "Extract text and render previews for uploaded documents on a local process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.DOCUMENT_WORKERS)
+        parser.add_argument("--batch", type=int, default=None, help="Jobs in flight (default: 2 x workers)")
+        parser.add_argument("--poll-interval", type=float, default=2.0)
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+        parser.add_argument(
+            "--enqueue-missing", action="store_true",
+            help="Create jobs for blobs that have none (documents uploaded before this command existed)",
+        )
+        parser.add_argument("--retry-failed", action="store_true", help="Put FAILED jobs back in the queue")
+
+    def handle(self, *args, **options):
+        if options["enqueue_missing"]:
+            ids = list(DocumentBlob.objects.filter(job__isnull=True).values_list("id", flat=True))
+            DocumentJob.objects.enqueue(ids)
+            self.stdout.write(f"enqueued {len(ids)} blobs")
+
+        if options["retry_failed"]:
+            count = DocumentJob.objects.filter(status=DocumentJob.Status.FAILED).update(
+                status=DocumentJob.Status.PENDING, attempts=0, run_after=timezone.now(),
+            )
+            self.stdout.write(f"requeued {count} failed jobs")
+
+        processed = run_pool(
+            options["workers"],
+            batch=options["batch"],
+            poll_interval=options["poll_interval"],
+            once=options["once"],
+            stdout=self.stdout if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(f"processed {processed} jobs")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main.models import SpendSummary
+
+
+class Command(BaseCommand):
+    help = "Recompute SpendSummary from scratch from PurchaseRequest"
+
+    def handle(self, *args, **options):
+        rows = SpendSummary.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Spend summary rebuilt: {rows} rows"))
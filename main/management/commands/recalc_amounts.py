@@ -0,0 +1,62 @@
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.amounts import RECALC_BATCH_SIZE, recalculate_amounts
+from main.models import PurchaseRequest
+
+
+def vat_percent(value):
+    try:
+        vat = Decimal(value)
+    except InvalidOperation:
+        raise CommandError(f"Bad VAT percent: {value!r}")
+    if not 0 <= vat < 1000:
+        raise CommandError(f"VAT percent out of range: {value}")
+    return vat
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute amount_without_vat / amount_with_vat of purchase requests from their items "
+        "with set-based UPDATEs (requests without items are left as is)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vat", type=vat_percent, help="New VAT percent for the selected requests")
+        parser.add_argument(
+            "--status", action="append", choices=PurchaseRequest.Status.values,
+            help="Only requests in this status (repeatable)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="List mismatches without changing anything")
+        parser.add_argument("--batch-size", type=int, default=RECALC_BATCH_SIZE, help="Request ids per UPDATE")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        queryset = PurchaseRequest.objects.all()
+        if options["status"]:
+            queryset = queryset.filter(status__in=options["status"])
+
+        dry_run = options["dry_run"]
+        started = time.perf_counter()
+        mismatched = 0
+        for batch in recalculate_amounts(
+            queryset, vat=options["vat"], dry_run=dry_run, batch_size=options["batch_size"],
+        ):
+            mismatched += len(batch)
+            if dry_run:
+                for row in batch:
+                    self.stdout.write(
+                        f"{row.id:>10} {row.ro_number:<24} "
+                        f"{row.amount_without_vat} -> {row.expected_without_vat}  "
+                        f"{row.amount_with_vat} -> {row.expected_with_vat}  "
+                        f"VAT {row.vat_percent} -> {row.expected_vat_percent}"
+                    )
+        elapsed = time.perf_counter() - started
+
+        if dry_run:
+            self.stdout.write(f"{mismatched} requests differ ({elapsed:.1f}s, nothing changed)")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Recalculated {mismatched} requests in {elapsed:.1f}s"))
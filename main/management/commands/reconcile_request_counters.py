@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from main.models import RequestCounter
+
+
+class Command(BaseCommand):
+    help = "Compare RequestCounter with PurchaseRequest and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report the drift")
+
+    def handle(self, *args, **options):
+        drift = RequestCounter.objects.reconcile(dry_run=options["dry_run"])
+        for creator_key, status, was, now in drift:
+            self.stdout.write(f"creator {creator_key} {status}: {was if was is not None else '-'} -> {now}")
+
+        prefix = "would fix" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"Request counters: {prefix} {len(drift)} rows"))
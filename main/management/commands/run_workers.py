@@ -0,0 +1,72 @@
+import multiprocessing
+import signal
+import time
+
+import django
+from django.core.management.base import BaseCommand
+
+RESTART_DELAY = 5.0
+
+
+def _worker(stop, batch_size, poll_interval):
+    # spawn: модели импортируются только после django.setup()
+    django.setup()
+    from main.taskqueue import work
+
+    # остановкой управляет родитель через stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(batch_size=batch_size, poll_interval=poll_interval, stop=stop)
+
+
+class Command(BaseCommand):
+    help = "Run N worker processes for the DB-backed task queue (main.taskqueue)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", "-w", type=int, default=2)
+        parser.add_argument("--batch", type=int, default=20, help="Tasks claimed per round")
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--once", action="store_true", help="Drain the queue in this process and exit")
+
+    def handle(self, *args, **options):
+        from main.taskqueue import work
+
+        if options["once"]:
+            processed = work(batch_size=options["batch"], poll_interval=options["poll_interval"], once=True)
+            self.stdout.write(f"processed {processed} tasks")
+            return
+
+        # spawn: дочерние процессы не наследуют соединения с БД
+        context = multiprocessing.get_context("spawn")
+        stop = context.Event()
+        stopping = []
+
+        def shutdown(signum, frame):
+            # Event.set() в обработчике сигнала может зависнуть на собственной блокировке — только флаг
+            stopping.append(signum)
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        args = (stop, options["batch"], options["poll_interval"])
+        processes = [context.Process(target=_worker, args=args) for _ in range(options["workers"])]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"started {len(processes)} workers")
+
+        while not stopping:
+            time.sleep(1.0)
+            # упавший воркер перезапускается; его задачи вернутся в очередь по LOCK_TIMEOUT
+            for i, process in enumerate(processes):
+                if not process.is_alive() and not stopping:
+                    self.stderr.write(
+                        f"worker {process.pid} exited with {process.exitcode}, restarting in {RESTART_DELAY:.0f}s"
+                    )
+                    time.sleep(RESTART_DELAY)
+                    processes[i] = context.Process(target=_worker, args=args)
+                    processes[i].start()
+
+        stop.set()
+        for process in processes:
+            process.join()
+        self.stdout.write("stopped")
@@ -0,0 +1,79 @@
+import time
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from main.cache import customer_directory, supplier_directory
+from main.models import (
+    Customer, PurchaseItem, PurchaseRequest, RequestCounter, RequestDocument, SpendSummary, Supplier,
+)
+from main.seed import Seeder, parse_range, reset_sequences
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large consistent dataset (suppliers, departments, users, requests with items "
+        "and documents): COPY on Postgres, batched INSERTs elsewhere; reproducible from --seed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=10000)
+        parser.add_argument("--items-per-request", default="1-10", help="N or MIN-MAX")
+        parser.add_argument("--documents-per-request", default="0-2", help="N or MIN-MAX")
+        parser.add_argument("--suppliers", type=int, default=1000)
+        parser.add_argument("--customers", type=int, default=50, help="Departments")
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--end-date", type=date.fromisoformat,
+            help="YYYY-MM-DD of the newest request (default today; fix it for identical reruns)",
+        )
+        parser.add_argument("--days", type=int, default=730, help="Span of created_at, days back from --end-date")
+        parser.add_argument("--password", default="seed-password", help="Password of all generated users")
+
+    def handle(self, *args, **options):
+        try:
+            items = parse_range(options["items_per_request"])
+            documents = parse_range(options["documents_per_request"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options["requests"] and not options["users"]:
+            raise CommandError("--requests needs at least one of --users")
+
+        seeder = Seeder(
+            seed=options["seed"], end_date=options["end_date"], days=options["days"], password=options["password"],
+        )
+        started = time.perf_counter()
+        with transaction.atomic():
+            suppliers = seeder.suppliers(options["suppliers"])
+            customers = seeder.customers(options["customers"])
+            users = seeder.users(options["users"])
+            self.stdout.write(f"directories and users: {time.perf_counter() - started:.1f}s")
+
+            if options["requests"]:
+                seeder.requests(
+                    options["requests"], items, documents,
+                    creators=[pk for ids in users.values() for pk in ids],
+                    managers=users.get("MANAGER", []),
+                    suppliers=suppliers, customers=customers,
+                    blobs=seeder.blobs() if documents[1] else {},
+                )
+            loaded = time.perf_counter() - started
+
+            reset_sequences([Supplier, Customer, get_user_model(), PurchaseRequest, PurchaseItem, RequestDocument])
+            # save() и сигналы обойдены — производные таблицы пересчитываются по данным
+            summary_rows = SpendSummary.objects.rebuild()
+            counters = RequestCounter.objects.reconcile()
+        supplier_directory.bump()
+        customer_directory.bump()
+        elapsed = time.perf_counter() - started
+
+        rows = sum(seeder.counts.values())
+        for label, count in seeder.counts.items():
+            self.stdout.write(f"{label:<24} {count:>12}")
+        self.stdout.write(f"loaded {rows} rows in {loaded:.1f}s ({rows / loaded:,.0f} rows/s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {elapsed:.1f}s: spend summary {summary_rows} rows, {len(counters)} request counters updated"
+        ))
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.10 on 2026-10-18 14:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.migrations.operations import AddIndex
+
+
+BATCH_SIZE = 5000
+
+STATUS_RANKS = {
+    'WAITING': 1,
+    'PAID': 3,
+    'CANCELLED': 5,
+}
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """
+    CREATE INDEX CONCURRENTLY на Postgres, обычный CREATE INDEX на остальных БД
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+def backfill_status_rank(apps, schema_editor):
+    # миграция не атомарная: каждый батч — отдельная короткая транзакция,
+    # поэтому блокируются только строки текущего диапазона id
+    PurchaseRequest = apps.get_model('main', 'PurchaseRequest')
+    db_alias = schema_editor.connection.alias
+    qs = PurchaseRequest.objects.using(db_alias)
+
+    last_id = qs.aggregate(max_id=models.Max('id'))['max_id'] or 0
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        batch = qs.filter(id__gte=start, id__lt=start + BATCH_SIZE)
+        for status, rank in STATUS_RANKS.items():
+            batch.filter(status=status).exclude(status_rank=rank).update(status_rank=rank)
+        batch.exclude(status__in=STATUS_RANKS).exclude(status_rank=99).update(status_rank=99)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('main', '0005_alter_purchaserequest_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaserequest',
+            name='status_rank',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, verbose_name='Status rank'),
+        ),
+        migrations.RunPython(backfill_status_rank, migrations.RunPython.noop),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='purchaserequest',
+            index=models.Index(fields=['status_rank', '-created_at'], name='request_status_rank_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='purchaserequest',
+            index=models.Index(condition=models.Q(('status', 'WAITING')), fields=['-created_at'], name='request_waiting_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='purchaserequest',
+            index=models.Index(condition=models.Q(('status', 'PAID')), fields=['-created_at'], name='request_paid_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='purchaserequest',
+            index=models.Index(condition=models.Q(('status', 'CANCELLED')), fields=['-created_at'], name='request_cancelled_idx'),
+        ),
+    ]
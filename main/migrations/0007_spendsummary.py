@@ -0,0 +1,58 @@
+# Generated by Django 5.2.10 on 2026-10-18 14:53
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_spend_summary(apps, schema_editor):
+    PurchaseRequest = apps.get_model('main', 'PurchaseRequest')
+    SpendSummary = apps.get_model('main', 'SpendSummary')
+    db_alias = schema_editor.connection.alias
+
+    rows = (
+        PurchaseRequest.objects.using(db_alias)
+        .annotate(period=TruncMonth('created_at'))
+        .values('period', 'supplier_id', 'customer_id', 'status')
+        .annotate(with_vat=Sum('amount_with_vat'), without_vat=Sum('amount_without_vat'), count=Count('id'))
+        .order_by()
+    )
+    SpendSummary.objects.using(db_alias).bulk_create(
+        SpendSummary(
+            period=row['period'].date().replace(day=1),
+            supplier_key=row['supplier_id'] or 0,
+            customer_key=row['customer_id'] or 0,
+            status=row['status'],
+            total_with_vat=row['with_vat'] or 0,
+            total_without_vat=row['without_vat'] or 0,
+            request_count=row['count'],
+        )
+        for row in rows.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_purchaserequest_status_rank'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(verbose_name='Period')),
+                ('supplier_key', models.BigIntegerField(default=0, verbose_name='Supplier')),
+                ('customer_key', models.BigIntegerField(default=0, verbose_name='Department')),
+                ('status', models.CharField(choices=[('WAITING', 'Waiting for review'), ('PAID', 'Paid'), ('CANCELLED', 'Cancelled')], max_length=20, verbose_name='Status')),
+                ('total_with_vat', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Amount with VAT')),
+                ('total_without_vat', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Amount without VAT')),
+                ('request_count', models.IntegerField(default=0, verbose_name='Requests')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'supplier_key', 'customer_key', 'status'), name='spend_summary_key')],
+            },
+        ),
+        migrations.RunPython(build_spend_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.10 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS main_supplier_name_trgm_idx "
+    "ON main_supplier USING gin (name gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS main_supplier_name_trgm_idx",
+]
+
+# SQLite FTS5-индекс создаётся в post_migrate (main.search.install_sqlite_fts):
+# SQLite пересоздаёт таблицу при ALTER, и триггеры из миграции потерялись бы
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_FORWARD:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_BACKWARD:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_spendsummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='supplier',
+            name='bin_iin',
+            field=models.CharField(blank=True, db_index=True, max_length=20, null=True, verbose_name='BIN/IIN'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.10 on 2026-10-18 15:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS main_documentblob_text_fts_idx "
+    "ON main_documentblob USING gin (to_tsvector('simple', text))",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS main_documentblob_text_fts_idx",
+]
+
+# SQLite FTS5 по тексту — в post_migrate (main.search.install_sqlite_fts)
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_FORWARD:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in POSTGRES_BACKWARD:
+        schema_editor.execute(sql)
+
+
+def enqueue_existing_blobs(apps, schema_editor):
+    DocumentBlob = apps.get_model('main', 'DocumentBlob')
+    DocumentJob = apps.get_model('main', 'DocumentJob')
+    DocumentJob.objects.bulk_create(
+        [DocumentJob(blob_id=pk) for pk in DocumentBlob.objects.values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_document_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentblob',
+            name='has_preview',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='kind',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='documentblob',
+            name='text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='DocumentJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('blob', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='job', to='main.documentblob')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='document_job_ready_idx')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(enqueue_existing_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.10 on 2026-10-18 15:25
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    PurchaseRequest = apps.get_model('main', 'PurchaseRequest')
+    RequestCounter = apps.get_model('main', 'RequestCounter')
+    rows = PurchaseRequest.objects.order_by().values('creator_id', 'status').annotate(count=models.Count('id'))
+    RequestCounter.objects.bulk_create(
+        RequestCounter(creator_key=row['creator_id'] or 0, status=row['status'], count=row['count'])
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_request_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creator_key', models.BigIntegerField(default=0, verbose_name='Creator')),
+                ('status', models.CharField(choices=[('WAITING', 'Waiting for review'), ('PAID', 'Paid'), ('CANCELLED', 'Cancelled')], max_length=20, verbose_name='Status')),
+                ('count', models.IntegerField(default=0, verbose_name='Requests')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('creator_key', 'status'), name='request_counter_key')],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
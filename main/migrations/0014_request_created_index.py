@@ -0,0 +1,17 @@
+# Generated by Django 5.2.10 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_request_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaserequest',
+            index=models.Index(fields=['-created_at', 'id'], name='request_created_idx'),
+        ),
+    ]
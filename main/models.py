@@ -1,4 +1,13 @@
-from django.db import models
+import hashlib
+import os
+import uuid
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Round, TruncMonth
 from django.conf import settings
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -9,7 +18,7 @@ from django.utils.translation import gettext_lazy as _
 # (Поставщик)
 class Supplier(models.Model):
     name = models.CharField(_("Name"), max_length=255)
-    bin_iin = models.CharField(_("BIN/IIN"), max_length=20, blank=True, null=True)
+    bin_iin = models.CharField(_("BIN/IIN"), max_length=20, blank=True, null=True, db_index=True)
     phone = models.CharField(_("Phone"), max_length=30, blank=True, null=True)
     email = models.EmailField(_("Email"), blank=True, null=True)
     bank_details = models.TextField(_("Bank details"), blank=True, null=True)
@@ -27,6 +36,105 @@ class Customer(models.Model):
         return self.name
     
 
+# поля заявки, от которых зависит сводка расходов (SpendSummary)
+SPEND_FIELDS = frozenset({
+    'status', 'supplier', 'supplier_id', 'customer', 'customer_id',
+    'amount_with_vat', 'amount_without_vat', 'created_at',
+})
+
+# поля, от которых зависят счётчики заявок (RequestCounter)
+COUNTER_FIELDS = frozenset({'status', 'creator', 'creator_id'})
+
+
+class PurchaseRequestQuerySet(models.QuerySet):
+    """
+    Держит status_rank в синхронизации со status и для массовых операций,
+    которые обходят save() (админ-экшены, bulk_create/bulk_update)
+    """
+
+    def update(self, **kwargs):
+        status = kwargs.get('status')
+        if isinstance(status, str) and 'status_rank' not in kwargs:
+            kwargs['status_rank'] = self.model.rank_for(status)
+        # любое изменение строки — новая версия (оптимистичная блокировка, см. main.transitions)
+        # и updated_at, как у save() (по нему кешируются строки списков)
+        kwargs.setdefault('version', F('version') + 1)
+        kwargs.setdefault('updated_at', timezone.now())
+
+        if not (SPEND_FIELDS | COUNTER_FIELDS).intersection(kwargs):
+            return super().update(**kwargs)
+
+        # сводка и счётчики: вычитаем затронутые строки до UPDATE и добавляем после
+        spend = SPEND_FIELDS.intersection(kwargs)
+        counters = COUNTER_FIELDS.intersection(kwargs)
+        with transaction.atomic(using=self.db):
+            pks = list(self.select_for_update().values_list('pk', flat=True))
+            affected = self.model.objects.using(self.db).filter(pk__in=pks)
+            spend_before = SpendSummary.objects.aggregate_requests(affected) if spend else []
+            counts_before = RequestCounter.objects.count_requests(affected) if counters else []
+            rows = super().update(**kwargs)
+            if spend:
+                SpendSummary.objects.apply_change(spend_before, SpendSummary.objects.aggregate_requests(affected))
+            if counters:
+                RequestCounter.objects.apply(counts_before, sign=-1)
+                RequestCounter.objects.apply(RequestCounter.objects.count_requests(affected))
+        return rows
+
+    def add_item_totals(self, deltas):
+        """
+        deltas — {request_id: на сколько изменилась сумма позиций}. Сумма без НДС сдвигается
+        на разницу, сумма с НДС считается от неё по ставке заявки — атомарно в UPDATE (F()),
+        без пересчёта всех позиций. Нулевая разница только обновляет updated_at и version
+        (по ним кешируются строки списков)
+        """
+        by_delta = {}
+        for request_id, delta in deltas.items():
+            if request_id is not None:
+                by_delta.setdefault(Decimal(delta or 0), []).append(request_id)
+
+        for delta, request_ids in by_delta.items():
+            queryset = self.filter(pk__in=request_ids)
+            if not delta:
+                queryset.update()
+                continue
+            # Round() и для НДС: в SQLite 80.00 хранится как целое 80 и 80 * 112 / 100 делилось бы нацело
+            without_vat = Round(F('amount_without_vat') + delta, 2)
+            queryset.update(
+                amount_without_vat=without_vat,
+                amount_with_vat=Round(without_vat * (100 + F('vat_percent')) / 100, 2),
+            )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.refresh_status_rank()
+
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            SpendSummary.objects.apply(obj.spend_state() for obj in created)
+            RequestCounter.objects.apply(obj.counter_state() for obj in created)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if 'status' in fields and 'status_rank' not in fields:
+            for obj in objs:
+                obj.refresh_status_rank()
+            fields.append('status_rank')
+        if 'version' not in fields:
+            for obj in objs:
+                obj.version += 1
+            fields.append('version')
+
+        # сводку и счётчики пересчитывает update(), через который Django выполняет bulk_update
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        for obj in objs:
+            obj._loaded_spend_state = obj.spend_state()
+            obj._loaded_counter_state = obj.counter_state()
+        return rows
+
+
 # (Заказ)
 class PurchaseRequest(models.Model):
 
@@ -35,6 +143,14 @@ class PurchaseRequest(models.Model):
         PAID = 'PAID', _('Paid')
         CANCELLED = 'CANCELLED', _('Cancelled')
 
+    # порядок статусов в списке заявок (ожидающие — первыми)
+    STATUS_RANKS = {
+        Status.WAITING: 1,
+        Status.PAID: 3,
+        Status.CANCELLED: 5,
+    }
+    DEFAULT_STATUS_RANK = 99
+
     ro_number = models.CharField(_("R.O number"), max_length=100, unique=True)
 
     creator = models.ForeignKey(
@@ -70,14 +186,195 @@ class PurchaseRequest(models.Model):
     status = models.CharField(
         _("Status"), max_length=20, choices=Status.choices, default=Status.WAITING
     )
+    status_rank = models.PositiveSmallIntegerField(
+        _("Status rank"), default=1, editable=False
+    )
+    # растёт при каждом изменении; клиент присылает известную ему версию при смене статуса
+    version = models.PositiveIntegerField(_("Version"), default=1, editable=False)
 
     created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
 
+    objects = PurchaseRequestQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status_rank', '-created_at'], name='request_status_rank_idx'),
+            # порядок страниц API (KeysetPagination: -created_at, id)
+            models.Index(fields=['-created_at', 'id'], name='request_created_idx'),
+            models.Index(
+                fields=['-created_at'], name='request_waiting_idx',
+                condition=models.Q(status='WAITING'),
+            ),
+            models.Index(
+                fields=['-created_at'], name='request_paid_idx',
+                condition=models.Q(status='PAID'),
+            ),
+            models.Index(
+                fields=['-created_at'], name='request_cancelled_idx',
+                condition=models.Q(status='CANCELLED'),
+            ),
+        ]
+
+    @classmethod
+    def rank_for(cls, status):
+        return cls.STATUS_RANKS.get(status, cls.DEFAULT_STATUS_RANK)
+
+    def refresh_status_rank(self):
+        self.status_rank = self.rank_for(self.status)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # состояние из БД — чтобы save() применил к сводке и счётчикам только разницу
+        instance._loaded_spend_state = instance.spend_state()
+        instance._loaded_counter_state = instance.counter_state()
+        return instance
+
+    def spend_state(self):
+        """
+        (ключ сводки, сумма с НДС, сумма без НДС) или None, если поля не загружены
+        """
+        loaded = self.__dict__
+        if not all(f in loaded for f in ('created_at', 'supplier_id', 'customer_id', 'status',
+                                         'amount_with_vat', 'amount_without_vat')):
+            return None
+        if self.created_at is None:
+            return None
+        key = SpendSummary.objects.make_key(self.created_at, self.supplier_id, self.customer_id, self.status)
+        return key, self.amount_with_vat, self.amount_without_vat
+
+    def counter_state(self):
+        """
+        (ключ счётчика, 1) или None, если поля не загружены
+        """
+        loaded = self.__dict__
+        if 'creator_id' not in loaded or 'status' not in loaded:
+            return None
+        return RequestCounter.objects.make_key(self.creator_id, self.status), 1
+
+    def save(self, *args, **kwargs):
+        self.refresh_status_rank()
+        if not self._state.adding:
+            self.version += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'version', 'status_rank'} if 'status' in update_fields else {'version'}
+            kwargs['update_fields'] = {*update_fields, *extra}
+
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            new_state = self.spend_state()
+            old_state = getattr(self, '_loaded_spend_state', None)
+            if old_state != new_state:
+                if old_state is not None:
+                    SpendSummary.objects.apply([old_state], sign=-1)
+                if new_state is not None:
+                    SpendSummary.objects.apply([new_state])
+            self._loaded_spend_state = new_state
+
+            new_counter = self.counter_state()
+            old_counter = getattr(self, '_loaded_counter_state', None)
+            if old_counter != new_counter:
+                RequestCounter.objects.apply([old_counter], sign=-1)
+                RequestCounter.objects.apply([new_counter])
+            self._loaded_counter_state = new_counter
+
     def __str__(self):
         return f"{self.ro_number} - {self.supplier}"
     
 
+# поля позиции, от которых зависят суммы заявки
+ITEM_TOTAL_FIELDS = frozenset({'quantity', 'price', 'total', 'request', 'request_id'})
+
+
+def _item_sums(queryset):
+    # {request_id: сумма total} позиций queryset
+    return dict(queryset.order_by().values('request_id').annotate(sum=Sum('total')).values_list('request_id', 'sum'))
+
+
+def _sum_deltas(before, after):
+    return {
+        request_id: (after.get(request_id) or 0) - (before.get(request_id) or 0)
+        for request_id in before.keys() | after.keys()
+    }
+
+
+class PurchaseItemQuerySet(models.QuerySet):
+    """
+    Суммы заявки следуют за позициями и при массовых операциях: каждая операция
+    сдвигает заявки на разницу (PurchaseRequestQuerySet.add_item_totals)
+    """
+
+    def bulk_create(self, objs, *args, update_request_totals=True, **kwargs):
+        """
+        update_request_totals=False — суммы заявок уже посчитаны вызывающим
+        (создание заявки вместе с позициями)
+        """
+        objs = list(objs)
+        for obj in objs:
+            obj.total = obj.quantity * obj.price
+
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if update_request_totals:
+                deltas = {}
+                for obj in created:
+                    deltas[obj.request_id] = deltas.get(obj.request_id, 0) + obj.total
+                PurchaseRequest.objects.using(self.db).add_item_totals(deltas)
+        for obj in created:
+            obj.remember_loaded_state()
+        return created
+
+    def bulk_update(self, objs, fields, *args, update_request_totals=True, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if {'quantity', 'price'}.intersection(fields):
+            for obj in objs:
+                obj.total = obj.quantity * obj.price
+            if 'total' not in fields:
+                fields.append('total')
+
+        # суммы заявок правит update(), через который Django выполняет bulk_update;
+        # без update_request_totals — обычный QuerySet, без подсчёта сумм до и после
+        if update_request_totals:
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+        else:
+            rows = models.QuerySet(self.model, using=self.db).bulk_update(objs, fields, *args, **kwargs)
+        for obj in objs:
+            obj.remember_loaded_state()
+        return rows
+
+    def update(self, **kwargs):
+        if {'quantity', 'price'}.intersection(kwargs) and 'total' not in kwargs:
+            kwargs['total'] = kwargs.get('quantity', F('quantity')) * kwargs.get('price', F('price'))
+        if not ITEM_TOTAL_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            pks = list(self.select_for_update().values_list('pk', flat=True))
+            affected = self.model.objects.using(self.db).filter(pk__in=pks)
+            before = _item_sums(affected)
+            rows = super().update(**kwargs)
+            PurchaseRequest.objects.using(self.db).add_item_totals(_sum_deltas(before, _item_sums(affected)))
+        return rows
+
+    def delete(self, update_request_totals=True):
+        if not update_request_totals:
+            # на позиции никто не ссылается, а post_delete нужен только для сумм —
+            # один DELETE ... WHERE id IN без выборки удаляемых строк (Collector)
+            rows = self._raw_delete(self.db)
+            return rows, {self.model._meta.label: rows}
+
+        # post_delete позиций, удалённых через QuerySet, суммы не трогает — вычитаем здесь разом
+        with transaction.atomic(using=self.db):
+            before = _item_sums(self)
+            deleted = super().delete()
+            PurchaseRequest.objects.using(self.db).add_item_totals(_sum_deltas(before, {}))
+        return deleted
+
+
 # (Несколько заказов)
 class PurchaseItem(models.Model):
     request = models.ForeignKey(
@@ -91,15 +388,138 @@ class PurchaseItem(models.Model):
     price = models.DecimalField(_("Price"), max_digits=12, decimal_places=2)
     total = models.DecimalField(_("Total"), max_digits=12, decimal_places=2)
 
+    objects = PurchaseItemQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # состояние из БД — чтобы save() сдвинул суммы заявки только на разницу
+        instance.remember_loaded_state()
+        return instance
+
+    def remember_loaded_state(self):
+        loaded = self.__dict__
+        if 'request_id' in loaded and 'total' in loaded:
+            self._loaded_request_id = self.request_id
+            self._loaded_total = self.total
+
     def save(self, *args, **kwargs):
         self.total = self.quantity * self.price
-        super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and {'quantity', 'price'}.intersection(update_fields):
+                kwargs['update_fields'] = {*update_fields, 'total'}
+            super().save(*args, **kwargs)
+            if update_fields is not None and not ITEM_TOTAL_FIELDS.intersection(update_fields):
+                deltas = {self.request_id: 0}
+            else:
+                deltas = {self.request_id: self.total}
+                old_request_id = getattr(self, '_loaded_request_id', None)
+                if old_request_id is not None:
+                    deltas[old_request_id] = deltas.get(old_request_id, 0) - self._loaded_total
+            PurchaseRequest.objects.using(using).add_item_totals(deltas)
+        self.remember_loaded_state()
 
     def __str__(self):
         return f"{self.name} ({self.quantity})"
     
 
 # (Документы)
+class DocumentBlobManager(models.Manager):
+
+    def store_file(self, file):
+        """
+        Blob для загруженного файла (админка, формы): хеш считается потоково,
+        файл пишется в хранилище, только если такого содержимого ещё нет
+        """
+        from .documents import DOCUMENT_CHUNK_SIZE, content_key
+
+        digests = []
+        size = 0
+        for chunk in _fixed_chunks(file, DOCUMENT_CHUNK_SIZE):
+            digests.append(hashlib.sha256(chunk).digest())
+            size += len(chunk)
+
+        checksum = content_key(digests)
+        blob = self.filter(checksum=checksum).first()
+        if blob is not None:
+            return blob
+
+        file.seek(0)
+        return self._create_blob(checksum, size, lambda name: default_storage.save(name, file))
+
+    def store_path(self, checksum, path, size):
+        """
+        Blob из собранного на диске файла (chunked upload); файл переносится, а не копируется
+        """
+        blob = self.filter(checksum=checksum).first()
+        if blob is not None:
+            return blob
+
+        def save(name):
+            try:
+                target = default_storage.path(name)
+            except NotImplementedError:
+                target = None
+            if target is not None:
+                try:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(path, target)
+                    return name
+                except OSError:
+                    pass  # другой диск — обычное сохранение
+            with open(path, "rb") as fh:
+                return default_storage.save(name, File(fh))
+
+        return self._create_blob(checksum, size, save)
+
+    def _create_blob(self, checksum, size, save):
+        from .documents import blob_name
+
+        name = blob_name(checksum)
+        if not default_storage.exists(name):
+            saved = save(name)
+            if saved != name:
+                # параллельная загрузка того же содержимого успела раньше
+                default_storage.delete(saved)
+
+        try:
+            with transaction.atomic():
+                return self.create(checksum=checksum, size=size, file=name)
+        except IntegrityError:
+            return self.get(checksum=checksum)
+
+
+def _fixed_chunks(file, chunk_size):
+    # content_key зависит от границ кусков, а File.chunks() их не гарантирует
+    file.seek(0)
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+class DocumentBlob(models.Model):
+    """
+    Содержимое документа, адресуемое хешем (см. main.documents.content_key).
+    Одинаковый файл у нескольких заявок хранится один раз.
+    """
+
+    checksum = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # заполняются фоновой обработкой (process_documents), не в запросе загрузки
+    kind = models.CharField(max_length=20, blank=True)
+    text = models.TextField(blank=True)
+    has_preview = models.BooleanField(default=False)
+
+    objects = DocumentBlobManager()
+
+    def __str__(self):
+        return self.checksum
+
+
 class RequestDocument(models.Model):
 
     class DocType(models.TextChoices):
@@ -121,5 +541,511 @@ class RequestDocument(models.Model):
 
     uploaded_at = models.DateTimeField(_("Uploaded at"), auto_now_add=True)
 
+    # file указывает на файл blob; исходное имя хранится отдельно
+    blob = models.ForeignKey(
+        DocumentBlob, on_delete=models.PROTECT, null=True, blank=True, editable=False,
+        related_name='documents',
+    )
+    filename = models.CharField(_("File name"), max_length=255, blank=True)
+
+    def __str__(self):
+        return f"{self.type} - {self.request.ro_number}"
+
+    def save(self, *args, **kwargs):
+        # новый файл (админка) — через content-addressed хранилище
+        if self.file and not self.file._committed:
+            if not self.filename:
+                self.filename = os.path.basename(self.file.name)
+            self.blob = DocumentBlob.objects.store_file(self.file)
+            self.file.name = self.blob.file.name
+            self.file._committed = True
+        super().save(*args, **kwargs)
+
+
+class DocumentUpload(models.Model):
+    """
+    Сессия chunked-загрузки: куски по DOCUMENT_CHUNK_SIZE пишутся во временный файл
+    в любом порядке и докачиваются после обрыва; complete() создаёт RequestDocument
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    request = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name='uploads')
+    type = models.CharField(max_length=20, choices=RequestDocument.DocType.choices, default=RequestDocument.DocType.OTHER)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    document = models.OneToOneField(
+        RequestDocument, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.id})"
+
+
+class DocumentUploadChunk(models.Model):
+    upload = models.ForeignKey(DocumentUpload, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'index'], name='document_upload_chunk_index'),
+        ]
+
+
+class SpendSummaryManager(models.Manager):
+
+    # по сколько строк сводки _apply_bulk правит одним UPDATE
+    BULK_APPLY_BATCH = 1000
+
+    @staticmethod
+    def make_key(period, supplier_id, customer_id, status):
+        # 0 вместо NULL: уникальный ключ должен работать на любой БД
+        return SpendSummary.period_for(period), supplier_id or 0, customer_id or 0, status
+
+    def aggregate_requests(self, queryset):
+        """
+        Сумма заявок queryset в разрезе ключа сводки: [(key, with_vat, without_vat, count)]
+        """
+        rows = (
+            queryset
+            .order_by()
+            .annotate(period=TruncMonth('created_at'))
+            .values('period', 'supplier_id', 'customer_id', 'status')
+            .annotate(
+                with_vat=Sum('amount_with_vat'),
+                without_vat=Sum('amount_without_vat'),
+                count=Count('id'),
+            )
+        )
+        return [
+            (
+                self.make_key(row['period'], row['supplier_id'], row['customer_id'], row['status']),
+                row['with_vat'], row['without_vat'], row['count'],
+            )
+            for row in rows
+        ]
+
+    def apply(self, states, sign=1):
+        """
+        Прибавляет (sign=1) или вычитает (sign=-1) заявки из сводки через F()-инкременты.
+        states — (key, with_vat, without_vat) по одной заявке или (key, ..., count) из aggregate_requests
+        """
+        deltas = {}
+        for state in states:
+            if state is None:
+                continue
+            key, with_vat, without_vat, *count = state
+            delta = deltas.setdefault(key, [Decimal(0), Decimal(0), 0])
+            delta[0] += Decimal(str(with_vat or 0))
+            delta[1] += Decimal(str(without_vat or 0))
+            delta[2] += count[0] if count else 1
+
+        # один ключ — save() одной заявки; массовые операции (bulk_create, QuerySet.update,
+        # пересчёт) дают ключ почти на каждую заявку — их пишем наборами, а не по ключу
+        if len(deltas) > 1:
+            return self._apply_bulk(deltas, sign)
+        self._apply_each(deltas, sign)
+
+    def apply_change(self, before, after):
+        """
+        Разница двух aggregate_requests одних и тех же заявок (до и после UPDATE) —
+        одним проходом: ключи, где изменились только суммы, получают один UPDATE
+        """
+        self.apply([
+            *((key, -with_vat, -without_vat, -count) for key, with_vat, without_vat, count in before),
+            *after,
+        ])
+
+    def _apply_each(self, deltas, sign):
+        for (period, supplier_key, customer_key, status), (with_vat, without_vat, count) in deltas.items():
+            if not (with_vat or without_vat or count):
+                continue
+            key = dict(period=period, supplier_key=supplier_key, customer_key=customer_key, status=status)
+            changes = dict(
+                total_with_vat=F('total_with_vat') + sign * with_vat,
+                total_without_vat=F('total_without_vat') + sign * without_vat,
+                request_count=F('request_count') + sign * count,
+            )
+
+            if self.filter(**key).update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(
+                        **key,
+                        total_with_vat=sign * with_vat,
+                        total_without_vat=sign * without_vat,
+                        request_count=sign * count,
+                    )
+            except IntegrityError:
+                # строку создал параллельный запрос
+                self.filter(**key).update(**changes)
+
+    def _apply_bulk(self, deltas, sign):
+        # существующие строки блокируются и правятся пачками UPDATE ... FROM (VALUES (id, Δ...), ...),
+        # недостающие вставляются одним INSERT — число запросов не зависит от числа ключей
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using):
+            self._apply_bulk_rows(deltas, sign, using)
+
+    def _apply_bulk_rows(self, deltas, sign, using):
+        periods, suppliers, customers, statuses = zip(*deltas)
+        existing = {
+            (period, supplier_key, customer_key, status): pk
+            for pk, period, supplier_key, customer_key, status in self.using(using).select_for_update().filter(
+                period__range=(min(periods), max(periods)),
+                supplier_key__range=(min(suppliers), max(suppliers)),
+                customer_key__range=(min(customers), max(customers)),
+                status__in=set(statuses),
+            ).values_list('pk', 'period', 'supplier_key', 'customer_key', 'status')
+        }
+        changes, missing = [], {}
+        for key, (with_vat, without_vat, count) in deltas.items():
+            pk = existing.get(key)
+            if pk is None:
+                missing[key] = (with_vat, without_vat, count)
+            elif with_vat or without_vat or count:
+                changes.append((pk, sign * with_vat, sign * without_vat, sign * count))
+
+        connection = connections[using]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        for start in range(0, len(changes), self.BULK_APPLY_BATCH):
+            batch = changes[start:start + self.BULK_APPLY_BATCH]
+            values = ', '.join(['(%s, %s, %s, %s)'] * len(batch))
+            with connection.cursor() as cursor:
+                # столбцы VALUES без псевдонимов — column1..column4 и в Postgres, и в SQLite
+                cursor.execute(
+                    f'UPDATE {table} SET total_with_vat = total_with_vat + d.column2, '
+                    f'total_without_vat = total_without_vat + d.column3, '
+                    f'request_count = request_count + d.column4 '
+                    f'FROM (VALUES {values}) AS d WHERE id = d.column1',
+                    [value for change in batch for value in change],
+                )
+
+        created = [
+            SpendSummary(
+                period=period, supplier_key=supplier_key, customer_key=customer_key, status=status,
+                total_with_vat=sign * with_vat, total_without_vat=sign * without_vat, request_count=sign * count,
+            )
+            for (period, supplier_key, customer_key, status), (with_vat, without_vat, count) in missing.items()
+            if with_vat or without_vat or count
+        ]
+        if not created:
+            return
+        try:
+            with transaction.atomic(using=using):
+                self.using(using).bulk_create(created, batch_size=self.BULK_APPLY_BATCH)
+        except IntegrityError:
+            # часть строк создал параллельный запрос — эти ключи по одному
+            self.db_manager(using)._apply_each(missing, sign)
+
+    @transaction.atomic
+    def move(self, field, old_id):
+        """
+        Переносит сводку удалённого поставщика/отдела на «без поставщика/отдела»,
+        как это делает SET_NULL у самих заявок
+        """
+        rows = list(self.filter(**{field: old_id}))
+        moved = []
+        for row in rows:
+            key = [row.period, row.supplier_key, row.customer_key, row.status]
+            key[1 if field == 'supplier_key' else 2] = 0
+            moved.append((tuple(key), row.total_with_vat, row.total_without_vat, row.request_count))
+        self.filter(**{field: old_id}).delete()
+        self.apply(moved)
+
+    @transaction.atomic
+    def rebuild(self):
+        self.all().delete()
+        rows = self.aggregate_requests(PurchaseRequest.objects.all())
+        self.bulk_create(
+            SpendSummary(
+                period=period, supplier_key=supplier_key, customer_key=customer_key, status=status,
+                total_with_vat=with_vat or 0, total_without_vat=without_vat or 0, request_count=count,
+            )
+            for (period, supplier_key, customer_key, status), with_vat, without_vat, count in rows
+        )
+        return len(rows)
+
+
+# (Сводка расходов: месяц × поставщик × отдел × статус)
+class SpendSummary(models.Model):
+    period = models.DateField(_("Period"))
+
+    # id поставщика/отдела, 0 — не указан (без FK: строки удалённых переносятся сигналом)
+    supplier_key = models.BigIntegerField(_("Supplier"), default=0)
+    customer_key = models.BigIntegerField(_("Department"), default=0)
+    status = models.CharField(_("Status"), max_length=20, choices=PurchaseRequest.Status.choices)
+
+    total_with_vat = models.DecimalField(_("Amount with VAT"), max_digits=16, decimal_places=2, default=0)
+    total_without_vat = models.DecimalField(_("Amount without VAT"), max_digits=16, decimal_places=2, default=0)
+    request_count = models.IntegerField(_("Requests"), default=0)
+
+    objects = SpendSummaryManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'supplier_key', 'customer_key', 'status'],
+                name='spend_summary_key',
+            ),
+        ]
+
+    @staticmethod
+    def period_for(value):
+        if hasattr(value, 'hour'):
+            value = timezone.localtime(value) if timezone.is_aware(value) else value
+            value = value.date()
+        return value.replace(day=1)
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} {self.supplier_key}/{self.customer_key} {self.status}"
+
+
+class RequestCounterManager(models.Manager):
+
+    @staticmethod
+    def make_key(creator_id, status):
+        # 0 — заявка без создателя (как supplier_key/customer_key в SpendSummary)
+        return creator_id or 0, status
+
+    def count_requests(self, queryset):
+        """
+        Число заявок queryset в разрезе ключа счётчика: [(key, count)]
+        """
+        rows = queryset.order_by().values('creator_id', 'status').annotate(count=Count('id'))
+        return [(self.make_key(row['creator_id'], row['status']), row['count']) for row in rows]
+
+    def apply(self, states, sign=1):
+        """
+        Прибавляет (sign=1) или вычитает (sign=-1) заявки через F()-инкременты; states — [(key, count)]
+        """
+        deltas = {}
+        for state in states:
+            if state is None:
+                continue
+            key, count = state
+            deltas[key] = deltas.get(key, 0) + count
+
+        for (creator_key, status), count in deltas.items():
+            if not count:
+                continue
+            key = dict(creator_key=creator_key, status=status)
+            if self.filter(**key).update(count=F('count') + sign * count):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(**key, count=sign * count)
+            except IntegrityError:
+                # строку создал параллельный запрос
+                self.filter(**key).update(count=F('count') + sign * count)
+
+    def for_creator(self, user):
+        """
+        {status: count} заявок пользователя — для «моих заявок» и бейджей
+        """
+        return dict(self.filter(creator_key=user.pk).values_list('status', 'count'))
+
+    def totals(self):
+        """
+        {status: count} по всем заявкам. Сумма по создателям, а не отдельная
+        «глобальная» строка: её F()-инкремент сериализовал бы все создания заявок
+        """
+        rows = self.order_by().values('status').annotate(total=Sum('count'))
+        return {row['status']: row['total'] for row in rows}
+
+    @transaction.atomic
+    def move(self, old_id):
+        """
+        Переносит счётчики удалённого пользователя на «без создателя» (SET_NULL у заявок)
+        """
+        moved = [((0, status), count) for status, count in self.filter(creator_key=old_id).values_list('status', 'count')]
+        self.filter(creator_key=old_id).delete()
+        self.apply(moved)
+
+    @transaction.atomic
+    def reconcile(self, dry_run=False):
+        """
+        Сверяет счётчики с заявками и исправляет расхождения (dry_run — только находит).
+        Возвращает [(creator_key, status, было, стало)]
+        """
+        # сначала блокируем счётчики: параллельная заявка, не видная в подсчёте,
+        # применит свой F()-инкремент уже после исправления
+        stored = {
+            (creator_key, status): count
+            for creator_key, status, count in self.select_for_update().values_list('creator_key', 'status', 'count')
+        }
+        actual = dict(self.count_requests(PurchaseRequest.objects.all()))
+
+        drift = []
+        for key in stored.keys() | actual.keys():
+            was, now = stored.get(key), actual.get(key, 0)
+            if was == now:
+                continue
+            drift.append((*key, was, now))
+            creator_key, status = key
+            if dry_run:
+                continue
+            if was is None:
+                self.create(creator_key=creator_key, status=status, count=now)
+            else:
+                self.filter(creator_key=creator_key, status=status).update(count=now)
+        return sorted(drift)
+
+
+# (Счётчики заявок: создатель × статус)
+class RequestCounter(models.Model):
+    # id создателя, 0 — не указан (без FK: строки удалённых переносятся сигналом)
+    creator_key = models.BigIntegerField(_("Creator"), default=0)
+    status = models.CharField(_("Status"), max_length=20, choices=PurchaseRequest.Status.choices)
+    count = models.IntegerField(_("Requests"), default=0)
+
+    objects = RequestCounterManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['creator_key', 'status'], name='request_counter_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.creator_key} {self.status}: {self.count}"
+
+
+# --------------------
+# DB-BACKED QUEUES (DocumentJob, Task)
+# --------------------
+# Общая механика: claim() с SKIP LOCKED, повтор с экспоненциальной паузой, брошенные
+# упавшим воркером RUNNING-задачи забираются снова через lock_timeout.
+
+class QueuedJobQuerySet(models.QuerySet):
+
+    def claim(self, worker, limit, lock_timeout):
+        """
+        Забирает до limit задач: PENDING, чей run_after наступил, и RUNNING, брошенные
+        упавшим воркером дольше lock_timeout. На Postgres — SKIP LOCKED, воркеры не ждут друг друга
+        """
+        Status = QueuedJob.Status
+        now = timezone.now()
+        ready = models.Q(status=Status.PENDING, run_after__lte=now) | models.Q(
+            status=Status.RUNNING, locked_at__lt=now - lock_timeout
+        )
+        with transaction.atomic(using=self.db):
+            ids = list(
+                self.filter(ready)
+                .select_related(None)  # FOR UPDATE — только строки задач
+                .order_by('run_after', 'id')
+                .select_for_update(skip_locked=connections[self.db].features.has_select_for_update_skip_locked)
+                .values_list('id', flat=True)[:limit]
+            )
+            # повтор условия ready: без SKIP LOCKED (SQLite) задачу мог забрать другой воркер
+            self.filter(ready, id__in=ids).update(
+                status=Status.RUNNING, locked_at=now, locked_by=worker, attempts=F('attempts') + 1,
+            )
+        return list(self.filter(id__in=ids, locked_by=worker, locked_at=now))
+
+    def mark_done(self):
+        return self.update(
+            status=QueuedJob.Status.DONE, finished_at=timezone.now(), last_error="", locked_at=None, locked_by="",
+        )
+
+    def mark_failed(self, job, error, max_attempts, retry_delay):
+        """PENDING с паузой retry_delay * 2^(attempts-1) или FAILED, если попытки кончились"""
+        failed = job.attempts >= max_attempts
+        return self.filter(pk=job.pk).update(
+            status=QueuedJob.Status.FAILED if failed else QueuedJob.Status.PENDING,
+            run_after=timezone.now() + retry_delay * 2 ** (job.attempts - 1),
+            finished_at=timezone.now() if failed else None,
+            last_error=str(error)[:2000],
+            locked_at=None,
+            locked_by="",
+        )
+
+
+class QueuedJob(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        DONE = 'DONE', _('Done')
+        FAILED = 'FAILED', _('Failed')
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+
+class DocumentJobQuerySet(QueuedJobQuerySet):
+
+    def enqueue(self, blob_ids):
+        """Задачи для blob без задачи; дубликаты содержимого повторно не обрабатываются"""
+        self.bulk_create([DocumentJob(blob_id=blob_id) for blob_id in blob_ids], ignore_conflicts=True)
+
+
+class DocumentJob(QueuedJob):
+    """
+    Фоновая обработка blob: текст для поиска и превью. Одна задача на содержимое
+    """
+
+    blob = models.OneToOneField(DocumentBlob, on_delete=models.CASCADE, related_name='job')
+
+    objects = DocumentJobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='document_job_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.blob_id}: {self.status}"
+
+
+class Task(QueuedJob):
+    """
+    Задача фоновой очереди (main.taskqueue): имя зарегистрированной функции и JSON-аргументы.
+    Выполненные задачи удаляются, FAILED остаются для разбора
+    """
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+
+    objects = QueuedJobQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk}: {self.status}"
+
+
+class RequestStatusChange(models.Model):
+    """
+    Журнал смены статусов заявок; пишется задачей очереди, а не в запросе
+    """
+
+    request = models.ForeignKey(PurchaseRequest, on_delete=models.CASCADE, related_name='status_changes')
+    old_status = models.CharField(max_length=20)
+    new_status = models.CharField(max_length=20)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['request', 'changed_at'], name='status_change_request_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.type} - {self.request.ro_number}"
\ No newline at end of file
+        return f"{self.request_id}: {self.old_status} → {self.new_status}"
@@ -0,0 +1,244 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# --------------------
+# KEYSET (CURSOR) PAGINATION
+# --------------------
+# Страница выбирается через WHERE (key) > (last key) вместо OFFSET,
+# поэтому глубокие страницы стоят столько же, сколько первая.
+# Поля ключа должны быть NOT NULL, а последнее — уникальным (обычно id).
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _dump_value(value):
+    # isoformat сохраняет микросекунды (DjangoJSONEncoder их обрезает)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values, reverse=False):
+    payload = {"k": [_dump_value(v) for v in values]}
+    if reverse:
+        payload["r"] = 1
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or not isinstance(payload["k"], list):
+            raise InvalidCursor(cursor)
+        return payload["k"], bool(payload.get("r"))
+    except (TypeError, ValueError, KeyError):
+        raise InvalidCursor(cursor)
+
+
+def _cursor_values(model, ordering, values, cursor):
+    """
+    Значения курсора -> типы полей ключа (to_python). Курсор приходит от клиента:
+    всё, что не приводится к полю, — InvalidCursor (404), а не ошибка в Q(...)
+    """
+    if len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+    converted = []
+    for field, value in zip(ordering, values):
+        # поля ключа NOT NULL и скалярные
+        if value is None or isinstance(value, (list, dict)):
+            raise InvalidCursor(cursor)
+        name = _split(field)[0]
+        try:
+            model_field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+            converted.append(model_field.to_python(value))
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+            raise InvalidCursor(cursor)
+    return converted
+
+
+def _split(field):
+    if field.startswith("-"):
+        return field[1:], True
+    return field, False
+
+
+def keyset_filter(ordering, values):
+    """
+    (a, b, c) > (x, y, z) с учётом направления каждого поля:
+    a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    """
+    condition = Q()
+    equal = Q()
+
+    for field, value in zip(ordering, values):
+        name, descending = _split(field)
+        lookup = "lt" if descending else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+
+    return condition
+
+
+def _row_key(obj, ordering):
+    # obj — модель или строка .values() (main.row_serializers)
+    if isinstance(obj, dict):
+        return [obj[_split(field)[0]] for field in ordering]
+    return [getattr(obj, _split(field)[0]) for field in ordering]
+
+
+def _keyset_query(queryset, ordering, cursor, page_size):
+    reverse = False
+    if cursor:
+        values, reverse = decode_cursor(cursor)
+        values = _cursor_values(queryset.model, ordering, values, cursor)
+    else:
+        values = None
+
+    fetch_ordering = ordering
+    if reverse:
+        fetch_ordering = [f[1:] if f.startswith("-") else f"-{f}" for f in ordering]
+
+    queryset = queryset.order_by(*fetch_ordering)
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(fetch_ordering, values))
+
+    # на одну строку больше — так узнаём, есть ли следующая страница, без COUNT(*)
+    return queryset[:page_size + 1], values, reverse
+
+
+def _keyset_page(rows, ordering, values, reverse, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if reverse:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, values is not None
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor(_row_key(rows[-1], ordering))
+        if has_previous:
+            previous_cursor = encode_cursor(_row_key(rows[0], ordering), reverse=True)
+
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=20):
+    """
+    Возвращает KeysetPage для queryset, упорядоченного по ordering.
+    cursor — непрозрачная строка из next_cursor/previous_cursor предыдущей страницы.
+    """
+    queryset, values, reverse = _keyset_query(queryset, ordering, cursor, page_size)
+    return _keyset_page(list(queryset), ordering, values, reverse, page_size)
+
+
+async def apaginate_keyset(queryset, ordering, cursor=None, page_size=20):
+    """Асинхронный paginate_keyset (prefetch_related тоже выполняется)"""
+    queryset, values, reverse = _keyset_query(queryset, ordering, cursor, page_size)
+    rows = [obj async for obj in queryset]
+    return _keyset_page(rows, ordering, values, reverse, page_size)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация для API: ?cursor=... для перехода, ?count=1 — добавить общее число
+    """
+
+    ordering = ("-created_at", "id")
+    page_size = settings.REST_FRAMEWORK.get("PAGE_SIZE", 20)
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        ordering = getattr(view, "keyset_ordering", self.ordering)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("1", "true"):
+            self.count = queryset.count()
+
+        try:
+            self.page = paginate_keyset(
+                queryset,
+                ordering,
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=self.page_size,
+            )
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+
+        return self.page.items
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload["count"] = self.count
+        payload["next"] = self.get_next_link()
+        payload["previous"] = self.get_previous_link()
+        payload["results"] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "example": 123},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
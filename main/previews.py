@@ -0,0 +1,80 @@
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+
+# --------------------
+# PREVIEW DISK CACHE
+# --------------------
+# Превью — производные данные: лежат в PREVIEW_CACHE_DIR под именем <checksum>.png,
+# общий размер ограничен PREVIEW_CACHE_MAX_BYTES. При чтении mtime обновляется,
+# при переполнении удаляются файлы с самым старым mtime (LRU).
+# Вытесненное превью заново строит process_documents (задача ставится повторно).
+
+
+class PreviewCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, checksum):
+        return os.path.join(self.directory, f"{checksum}.png")
+
+    def get(self, checksum):
+        path = self.path(checksum)
+        try:
+            os.utime(path)  # отметка использования для LRU
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, checksum, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # атомарно: читатель никогда не увидит недописанный файл
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, self.path(checksum))
+        self.evict()
+
+    def discard(self, checksum):
+        try:
+            os.remove(self.path(checksum))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                with os.scandir(self.directory) as it:
+                    for entry in it:
+                        if not entry.name.endswith(".png"):
+                            continue
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                        total += stat.st_size
+            except FileNotFoundError:
+                return
+
+            if total <= self.max_bytes:
+                return
+
+            for mtime, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+
+preview_cache = PreviewCache(settings.PREVIEW_CACHE_DIR, settings.PREVIEW_CACHE_MAX_BYTES)
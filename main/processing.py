@@ -0,0 +1,89 @@
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.db import close_old_connections
+
+from .extraction import process_blob
+from .models import DocumentBlob, DocumentJob
+from .previews import preview_cache
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------
+# DOCUMENT POST-PROCESSING POOL
+# --------------------
+# Родитель забирает задачи из DocumentJob (claim) и раздаёт их пулу процессов;
+# дочерние процессы только читают файл и считают (extraction.process_blob),
+# результат — текст, тип, превью — записывает родитель. Загрузка документа лишь
+# вставляет строку задачи (signals.enqueue_document_job).
+
+MAX_ATTEMPTS = 5
+LOCK_TIMEOUT = timedelta(minutes=15)
+RETRY_DELAY = timedelta(minutes=1)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def finish_job(job, result):
+    blob = job.blob
+    blob.kind = result["kind"]
+    blob.text = result["text"]
+    blob.has_preview = result["preview"] is not None
+    if blob.has_preview:
+        preview_cache.put(blob.checksum, result["preview"])
+    DocumentBlob.objects.filter(pk=blob.pk).update(kind=blob.kind, text=blob.text, has_preview=blob.has_preview)
+
+    DocumentJob.objects.filter(pk=job.pk).mark_done()
+
+
+def fail_job(job, error):
+    logger.warning("document job %s (blob %s) failed: %s", job.pk, job.blob_id, error)
+    DocumentJob.objects.mark_failed(job, error, MAX_ATTEMPTS, RETRY_DELAY)
+
+
+def run_pool(workers, batch=None, poll_interval=2.0, once=False, stdout=None):
+    """
+    Обрабатывает задачи, пока они есть (once) или бесконечно. Возвращает число обработанных
+    """
+    batch = batch or workers * 2
+    name = worker_name()
+    processed = 0
+    running = {}
+
+    # spawn, а не fork: дочерние процессы не наследуют открытые соединения с БД
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup) as pool:
+        while True:
+            close_old_connections()
+            free = batch - len(running)
+            if free > 0:
+                for job in DocumentJob.objects.select_related('blob').claim(name, free, LOCK_TIMEOUT):
+                    running[pool.submit(process_blob, job.blob.file.name)] = job
+
+            if not running:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    finish_job(job, future.result())
+                    outcome = "ok"
+                except Exception as exc:  # ошибка разбора файла не должна останавливать пул
+                    fail_job(job, exc)
+                    outcome = f"failed: {exc}"
+                processed += 1
+                if stdout is not None:
+                    stdout.write(f"blob {job.blob_id}: {outcome}")
@@ -0,0 +1,235 @@
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, models
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+
+# --------------------
+# ROW SERIALIZATION (READ-ONLY)
+# --------------------
+# Чтение списков API без экземпляров моделей и без обхода полей DRF на каждую строку:
+# строки берутся через .values(), вложенные списки (items, documents) — одним запросом
+# на связь, как prefetch_related, а поля сериализатора один раз разбираются в
+# (имя, колонка, функция значения). Вывод совпадает с serializer.data байт в байт;
+# что разобрать нельзя (SerializerMethodField, source с точкой, M2M...) — NotCompilable,
+# и вьюха идёт через обычный сериализатор. Запись — всегда через сериализатор.
+
+
+class NotCompilable(Exception):
+    pass
+
+
+_compiled = {}
+
+
+def row_serializer(serializer_class, expand=()):
+    """
+    Разобранный serializer_class (кешируется на процесс); expand — имена из
+    serializer_class.expandable_fields, которые отдаются вложенными объектами
+    """
+    key = (serializer_class, frozenset(expand))
+    rows = _compiled.get(key)
+    if rows is None:
+        rows = _compiled[key] = RowSerializer(serializer_class, expand)
+    return rows
+
+
+class RowSerializer:
+
+    def __init__(self, serializer_class, expand=(), prefix=""):
+        # переопределённый to_representation понимаем только у сериализаторов с ?expand=
+        # (PurchaseRequestSerializer): раскрытие связей делается здесь же
+        if (serializer_class.to_representation is not serializers.Serializer.to_representation
+                and not hasattr(serializer_class, "expandable_fields")):
+            raise NotCompilable(f"{serializer_class.__name__} overrides to_representation")
+
+        self.model = serializer_class.Meta.model
+        self.pk_column = prefix + self.model._meta.pk.attname
+        self.columns = [self.pk_column]
+        self.fields = []     # (имя, колонка, bind(context) -> функция значения или None)
+        self.nested = []     # (имя, RowSerializer позиций, поле связи у позиции)
+        self.expanded = []   # (имя, колонка FK, RowSerializer связанного объекта)
+
+        for field in serializer_class().fields.values():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == "*" or "." in source:
+                raise NotCompilable(f"{serializer_class.__name__}.{field.field_name}: source {source!r}")
+            try:
+                model_field = self.model._meta.get_field(source)
+            except FieldDoesNotExist:
+                raise NotCompilable(f"{serializer_class.__name__}.{field.field_name}: not a model field")
+
+            if isinstance(field, serializers.ListSerializer):
+                if not model_field.one_to_many or prefix:
+                    raise NotCompilable(f"{serializer_class.__name__}.{field.field_name}: not a reverse FK")
+                self.nested.append((field.field_name, RowSerializer(type(field.child)), model_field.field))
+                self.fields.append((field.field_name, self.pk_column, None))
+                continue
+            if not model_field.concrete or model_field.many_to_many:
+                raise NotCompilable(f"{serializer_class.__name__}.{field.field_name}: not a column")
+
+            column = prefix + source
+            self.columns.append(column)
+            self.fields.append((field.field_name, column, _leaf(field, model_field)))
+
+        for name in expand:
+            if not self.model._meta.get_field(name).many_to_one:
+                raise NotCompilable(f"{serializer_class.__name__}.{name}: expand needs a forward FK")
+            related = RowSerializer(serializer_class.expandable_fields[name], prefix=f"{prefix}{name}__")
+            self.columns += related.columns
+            self.expanded.append((name, prefix + name, related))
+
+    def values(self, queryset, *extra):
+        """
+        queryset.values() со всеми нужными колонками; extra — колонки для пагинации
+        """
+        columns = dict.fromkeys([*self.columns, *extra])
+        return queryset.prefetch_related(None).values(*columns)
+
+    def serialize(self, rows, context=None, using=DEFAULT_DB_ALIAS):
+        """
+        Строки .values() -> список, как у serializer_class(many=True).data
+        """
+        context = context or {}
+        rows = list(rows)
+        children = {
+            name: nested.related_rows(relation, [row[self.pk_column] for row in rows], context, using)
+            for name, nested, relation in self.nested
+        }
+        fields = [
+            (name, column, _children(children[name]) if name in children else bind(context) if bind else None)
+            for name, column, bind in self.fields
+        ]
+        expanded = [(name, column, related, related.bind(context)) for name, column, related in self.expanded]
+
+        result = []
+        for row in rows:
+            data = {}
+            for name, column, convert in fields:
+                value = row[column]
+                data[name] = value if value is None or convert is None else convert(value)
+            # как PurchaseRequestSerializer.to_representation: ключ уже на своём месте
+            for name, column, related, bound in expanded:
+                data[name] = None if row[column] is None else related.build(row, bound)
+            result.append(data)
+        return result
+
+    # ---- вложенные объекты ----
+
+    def bind(self, context):
+        return [(name, column, bind(context) if bind else None) for name, column, bind in self.fields]
+
+    @staticmethod
+    def build(row, bound):
+        data = {}
+        for name, column, convert in bound:
+            value = row[column]
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    def related_rows(self, relation, parent_ids, context, using):
+        """
+        {id родителя: [строки]} одним запросом WHERE fk IN (...) — тот же, что у prefetch_related
+        """
+        if not parent_ids:
+            return {}
+        queryset = self.model._default_manager.using(using).filter(**{f"{relation.name}__in": parent_ids})
+        rows = list(self.values(queryset, relation.attname))
+        grouped = {}
+        for row, data in zip(rows, self.serialize(rows, context, using)):
+            grouped.setdefault(row[relation.attname], []).append(data)
+        return grouped
+
+
+# ---- поля ----
+
+def _children(grouped):
+    # у строки без позиций — свой пустой список
+    return lambda pk: grouped.get(pk) or []
+
+
+def _leaf(field, model_field):
+    """
+    bind(context) -> функция значения колонки или None (значение как есть)
+    """
+    if isinstance(field, serializers.RelatedField):
+        # .values('supplier') — это id, как PKOnlyObject у DRF
+        if not isinstance(field, serializers.PrimaryKeyRelatedField) or field.pk_field is not None:
+            raise NotCompilable(f"{field.field_name}: {type(field).__name__}")
+        return None
+    if isinstance(field, serializers.Serializer):
+        raise NotCompilable(f"{field.field_name}: nested serializer")
+    if isinstance(field, serializers.FileField):
+        return _file_url(field, model_field)
+    if isinstance(field, serializers.DecimalField):
+        return _decimal(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime(field)
+    if (type(field) is serializers.IntegerField and isinstance(model_field, (models.IntegerField, models.AutoField))
+            or type(field) is serializers.CharField and isinstance(model_field, (models.CharField, models.TextField))):
+        return None
+    # значение колонки то же, что атрибут модели — to_representation самого поля
+    return lambda context: field.to_representation
+
+
+def _file_url(field, model_field):
+    storage = model_field.storage
+    use_url = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+
+    def bind(context):
+        request = context.get("request")
+
+        def convert(name):
+            if not name:
+                return None
+            if not use_url:
+                return name
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+    return bind
+
+
+def _decimal(field):
+    # DecimalField.quantize, но контекст и шаг округления — один раз на поле
+    if (field.decimal_places is None or field.localize
+            or not getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)):
+        return lambda context: field.to_representation
+    step = decimal.Decimal(".1") ** field.decimal_places
+
+    def bind(context):
+        quantize_context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            quantize_context.prec = field.max_digits
+
+        def convert(value):
+            if not isinstance(value, decimal.Decimal):
+                return field.to_representation(value)
+            return "{:f}".format(value.quantize(step, rounding=field.rounding, context=quantize_context))
+        return convert
+    return bind
+
+
+def _datetime(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return lambda context: field.to_representation
+
+    def bind(context):
+        # часовой пояс запроса — один раз на ответ, а не на каждое значение
+        field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        if field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if value.tzinfo is None:
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + "Z" if value.endswith("+00:00") else value
+        return convert
+    return bind
@@ -0,0 +1,209 @@
+import sqlite3
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+
+from .models import RequestDocument, Supplier
+
+
+# --------------------
+# SUPPLIER SEARCH
+# --------------------
+# Postgres: pg_trgm + GIN-индекс по name (оператор %>, ранжирование по word_similarity).
+# SQLite: FTS5-таблица main_supplier_fts с tokenize=trigram, ранжирование bm25.
+# Индекс Postgres создаёт миграция 0008, FTS5 на SQLite — install_sqlite_fts() после migrate.
+# BIN/IIN ищется точным совпадением по обычному индексу.
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+SQLITE_FTS_TABLE = "main_supplier_fts"
+
+# external-content FTS5: текст хранится в main_supplier, триггеры держат индекс в синхронизации
+SQLITE_FTS_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS main_supplier_fts USING fts5("
+    "name, content='main_supplier', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS main_supplier_fts_ai AFTER INSERT ON main_supplier BEGIN "
+    "INSERT INTO main_supplier_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS main_supplier_fts_ad AFTER DELETE ON main_supplier BEGIN "
+    "INSERT INTO main_supplier_fts(main_supplier_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS main_supplier_fts_au AFTER UPDATE OF name ON main_supplier BEGIN "
+    "INSERT INTO main_supplier_fts(main_supplier_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+    "INSERT INTO main_supplier_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS main_supplier_fts_vocab USING fts5vocab(main_supplier_fts, 'row')",
+    "INSERT INTO main_supplier_fts(main_supplier_fts) VALUES ('rebuild')",
+]
+
+# текст документов (DocumentBlob.text, заполняет process_documents)
+SQLITE_DOCUMENT_FTS_TABLE = "main_documentblob_fts"
+
+SQLITE_DOCUMENT_FTS_SETUP = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS main_documentblob_fts USING fts5("
+    "text, content='main_documentblob', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS main_documentblob_fts_ai AFTER INSERT ON main_documentblob BEGIN "
+    "INSERT INTO main_documentblob_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS main_documentblob_fts_ad AFTER DELETE ON main_documentblob BEGIN "
+    "INSERT INTO main_documentblob_fts(main_documentblob_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS main_documentblob_fts_au AFTER UPDATE OF text ON main_documentblob BEGIN "
+    "INSERT INTO main_documentblob_fts(main_documentblob_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO main_documentblob_fts(rowid, text) VALUES (new.id, new.text); END",
+    "INSERT INTO main_documentblob_fts(main_documentblob_fts) VALUES ('rebuild')",
+]
+
+# нечёткий (OR) поиск берёт до 6 самых редких триграмм запроса,
+# причём только встречающиеся не более чем в 1000 названий (если такие есть)
+SQLITE_FUZZY_TRIGRAMS = 6
+SQLITE_FUZZY_MAX_DOCS = 1000
+
+
+def install_sqlite_fts(using="default"):
+    """
+    Создаёт (или восстанавливает) FTS5-индексы поставщиков и текста документов; идемпотентно
+    """
+    conn = connections[using]
+    # tokenize='trigram' появился в SQLite 3.34
+    if conn.vendor != "sqlite" or sqlite3.sqlite_version_info < (3, 34, 0):
+        return
+    with conn.cursor() as cursor:
+        for sql in SQLITE_FTS_SETUP + SQLITE_DOCUMENT_FTS_SETUP:
+            cursor.execute(sql)
+
+
+def search_suppliers(query, limit=SEARCH_LIMIT):
+    """
+    Топ-limit поставщиков по названию (с опечатками) или по точному BIN/IIN
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    if query.isdigit():
+        exact = list(Supplier.objects.filter(bin_iin=query)[:limit])
+        if exact:
+            return exact
+
+    if connection.vendor == "postgresql":
+        return _search_postgres(query, limit)
+    if connection.vendor == "sqlite" and len(query) >= 3 and _sqlite_fts_exists():
+        return _search_sqlite(query, limit)
+    return list(Supplier.objects.filter(name__icontains=query).order_by("name")[:limit])
+
+
+def _search_postgres(query, limit):
+    return list(
+        Supplier.objects
+        .filter(name__trigram_word_similar=query)
+        .annotate(rank=TrigramWordSimilarity(query, "name"))
+        .order_by("-rank", "name")[:limit]
+    )
+
+
+def _sqlite_fts_exists():
+    return _sqlite_table_exists(SQLITE_FTS_TABLE)
+
+
+def _sqlite_table_exists(name):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [name])
+        return cursor.fetchone() is not None
+
+
+def _trigrams(query):
+    text = query.lower()
+    return sorted({text[i:i + 3] for i in range(len(text) - 2)})
+
+
+def _fts_phrase(term):
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+def _sqlite_fts_rank(cursor, match, limit):
+    cursor.execute(
+        f"SELECT rowid, -bm25({SQLITE_FTS_TABLE}) FROM {SQLITE_FTS_TABLE} "
+        f"WHERE {SQLITE_FTS_TABLE} MATCH %s ORDER BY bm25({SQLITE_FTS_TABLE}) LIMIT %s",
+        [match, limit],
+    )
+    return cursor.fetchall()
+
+
+def _search_sqlite(query, limit):
+    with connection.cursor() as cursor:
+        # 1) точная подстрока — все триграммы запроса
+        ranked = _sqlite_fts_rank(cursor, _fts_phrase(query), limit)
+
+        # 2) с опечатками — любые общие триграммы, но только самые редкие:
+        # частые («ооо», «llp») совпадают почти со всеми строками и не различают их
+        if len(ranked) < limit:
+            trigrams = _trigrams(query)
+            placeholders = ", ".join(["%s"] * len(trigrams))
+            cursor.execute(
+                f"SELECT term, doc FROM {SQLITE_FTS_TABLE}_vocab WHERE term IN ({placeholders}) "
+                f"ORDER BY doc LIMIT %s",
+                [*trigrams, SQLITE_FUZZY_TRIGRAMS],
+            )
+            terms = cursor.fetchall()
+            rare = [term for term, docs in terms if docs <= SQLITE_FUZZY_MAX_DOCS] or [t for t, _ in terms[:1]]
+            if rare:
+                seen = {pk for pk, _ in ranked}
+                fuzzy = _sqlite_fts_rank(cursor, " OR ".join(_fts_phrase(t) for t in rare), limit)
+                ranked += [row for row in fuzzy if row[0] not in seen][:limit - len(ranked)]
+
+    suppliers = Supplier.objects.in_bulk([pk for pk, _ in ranked])
+    result = []
+    for pk, rank in ranked:
+        if pk in suppliers:
+            suppliers[pk].rank = rank
+            result.append(suppliers[pk])
+    return result
+
+
+# --------------------
+# DOCUMENT TEXT SEARCH
+# --------------------
+# Postgres: GIN по to_tsvector('simple', text) (миграция 0010), SQLite: FTS5 main_documentblob_fts.
+# Ищутся blob, документы — все ссылки на найденное содержимое.
+
+def search_documents(query, limit=SEARCH_LIMIT, documents=None):
+    """
+    Топ-limit документов заявок по извлечённому тексту; documents — доступные
+    пользователю документы (по умолчанию все)
+    """
+    query = (query or "").strip()
+    if not query:
+        return []
+
+    scoped = documents is not None
+    documents = (documents if scoped else RequestDocument.objects.all()).select_related("request", "blob")
+
+    if connection.vendor == "postgresql":
+        rank = RawSQL(
+            "ts_rank(to_tsvector('simple', main_documentblob.text), plainto_tsquery('simple', %s))", [query]
+        )
+        return list(
+            documents
+            .extra(where=["to_tsvector('simple', main_documentblob.text) @@ plainto_tsquery('simple', %s)"],
+                   params=[query])
+            .annotate(rank=rank)
+            .order_by("-rank", "-uploaded_at")[:limit]
+        )
+
+    if connection.vendor == "sqlite" and _sqlite_table_exists(SQLITE_DOCUMENT_FTS_TABLE):
+        words = query.split()
+        # доступные blob — в том же запросе, иначе LIMIT отрезал бы их чужими
+        scope_sql, scope_params = "", []
+        if scoped:
+            subquery, scope_params = documents.order_by().values("blob_id").query.sql_with_params()
+            scope_sql = f"AND rowid IN ({subquery}) "
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SQLITE_DOCUMENT_FTS_TABLE} WHERE {SQLITE_DOCUMENT_FTS_TABLE} MATCH %s "
+                f"{scope_sql}ORDER BY bm25({SQLITE_DOCUMENT_FTS_TABLE}) LIMIT %s",
+                [" ".join(_fts_phrase(word) for word in words), *scope_params, limit],
+            )
+            blob_ids = [row[0] for row in cursor.fetchall()]
+        order = {blob_id: position for position, blob_id in enumerate(blob_ids)}
+        found = documents.filter(blob_id__in=blob_ids).order_by("-uploaded_at")[:limit]
+        return sorted(found, key=lambda document: order[document.blob_id])
+
+    return list(documents.filter(blob__text__icontains=query).order_by("-uploaded_at")[:limit])
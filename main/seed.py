@@ -0,0 +1,359 @@
+import csv
+import io
+import random
+import string
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, models
+
+from .models import Customer, DocumentBlob, PurchaseItem, PurchaseRequest, RequestDocument, Supplier
+
+
+# --------------------
+# SYNTHETIC DATA (manage.py seed_erp)
+# --------------------
+# Строки генерируются кортежами значений колонок, без экземпляров моделей, и пишутся
+# пачками: COPY FROM STDIN на Postgres, многострочные INSERT на остальных БД. id назначаются
+# заранее (после текущего максимума), чтобы позиции и документы ссылались на заявки
+# без чтения обратно. Деньги считаются в тиынах (int), правила — как в
+# PurchaseItem.save и PurchaseRequestSerializer:
+#   total = quantity × price
+#   amount_without_vat = Σ total
+#   amount_with_vat = amount_without_vat × (1 + vat_percent / 100), до тиына (half up, как numeric)
+# save() и сигналы обходятся: SpendSummary, RequestCounter и кеш справочников
+# пересчитывает команда после загрузки.
+
+COPY_BATCH_SIZE = 50000
+INSERT_BATCH_SIZE = 10000
+# строк в одном многострочном INSERT (не больше, чем позволяет bulk_batch_size бэкенда)
+INSERT_STATEMENT_ROWS = 500
+
+VAT_PERCENTS = (12, 12, 12, 12, 0)
+
+# заявки моложе RECENT_DAYS в основном ждут оплаты, старые — оплачены или отменены
+RECENT_DAYS = 14
+
+SUPPLIER_FORMS = ("ТОО", "ТОО", "ТОО", "АО", "ИП")
+SUPPLIER_WORDS = (
+    "Альфа", "Бета", "Восток", "Запад", "Север", "Юг", "Строй", "Снаб", "Техно", "Торг",
+    "Сервис", "Импорт", "Экспорт", "Логистик", "Ресурс", "Пром", "Инвест", "Трейд", "Групп", "Систем",
+    "Казах", "Астана", "Алматы", "Степь", "Каспий", "Алатау", "Тенгри", "Байтерек", "Нур", "Жол",
+)
+DEPARTMENTS = (
+    "Бухгалтерия", "Отдел закупок", "IT", "Склад", "Производство", "Логистика",
+    "Отдел продаж", "Маркетинг", "HR", "Юридический отдел", "Администрация", "Служба безопасности",
+)
+ITEM_NAMES = (
+    "Бумага A4", "Картридж", "Ноутбук", "Монитор", "Клавиатура", "Мышь", "Кабель UTP", "Коммутатор",
+    "Стул офисный", "Стол", "Шкаф", "Перчатки рабочие", "Краска", "Цемент", "Кирпич", "Доска",
+    "Болты", "Гайки", "Масло моторное", "Шины", "Фильтр", "Аккумулятор", "Лампа LED", "Провод ВВГ",
+    "Вода питьевая", "Канцтовары", "Лицензия ПО", "Услуги доставки", "Ремонт оборудования", "Спецодежда",
+)
+DOCUMENT_TYPES = [value for value, label in RequestDocument.DocType.choices]
+
+# роль -> вес среди сгенерированных пользователей
+USER_ROLES = {"EMPLOYEE": 85, "MANAGER": 10, "ACCOUNTANT": 5}
+
+
+def parse_range(value):
+    """
+    "1-50" -> (1, 50), "5" -> (5, 5)
+    """
+    low, sep, high = str(value).partition("-")
+    low = int(low)
+    high = int(high) if sep else low
+    if low < 0 or high < low:
+        raise ValueError(f"Invalid range: {value!r}")
+    return low, high
+
+
+def money(cents):
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+def with_vat(cents, vat_percent):
+    return (cents * (100 + vat_percent) + 50) // 100
+
+
+# --------------------
+# TABLE WRITER
+# --------------------
+
+class TableWriter:
+    """
+    Буфер строк одной таблицы; fields — attname колонок в порядке значений кортежа
+    """
+
+    def __init__(self, model, fields, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.postgres = self.connection.vendor == "postgresql"
+        by_attname = {field.attname: field for field in model._meta.concrete_fields}
+        self.fields = [by_attname[name] for name in fields]
+        self.rows = []
+        self.count = 0
+
+        quote = self.connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        columns = ", ".join(quote(field.column) for field in self.fields)
+        if self.postgres:
+            # CSV пишет C-модуль csv; пустое поле без кавычек — NULL, кроме NOT NULL-колонок
+            not_null = ", ".join(quote(field.column) for field in self.fields if not field.null)
+            options = f"FORMAT csv, FORCE_NOT_NULL ({not_null})" if not_null else "FORMAT csv"
+            self.sql = f"COPY {table} ({columns}) FROM STDIN WITH ({options})"
+            self.batch_size = COPY_BATCH_SIZE
+        else:
+            # как bulk_create: INSERT ... VALUES (...), (...) — вдвое быстрее executemany на SQLite
+            self.sql = f"INSERT INTO {table} ({columns}) "
+            self.batch_size = INSERT_BATCH_SIZE
+            self.statement_rows = max(1, min(
+                INSERT_STATEMENT_ROWS,
+                self.connection.ops.bulk_batch_size(self.fields, range(INSERT_STATEMENT_ROWS)),
+            ))
+            self.statements = {}
+        # даты — в формат бэкенда (SQLite хранит naive UTC строкой); COPY принимает str()
+        ops = self.connection.ops
+        self.dates = [
+            (index, ops.adapt_datetimefield_value if isinstance(field, models.DateTimeField) else ops.adapt_datefield_value)
+            for index, field in enumerate(self.fields)
+            if isinstance(field, models.DateField) and not self.postgres
+        ]
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        with self.connection.cursor() as wrapper:
+            # курсор драйвера, мимо debug-обёртки: при DEBUG=True она подставляет параметры
+            # в текст каждого запроса (на SQLite — отдельным SELECT), это дороже самой вставки
+            cursor = wrapper.cursor
+            if self.postgres:
+                self._copy(cursor, self.rows)
+            else:
+                self._insert(cursor, [self._adapt(row) for row in self.rows] if self.dates else self.rows)
+        self.count += len(self.rows)
+        # тот же список: генератор может держать ссылку на rows.append
+        self.rows.clear()
+
+    def full(self):
+        return len(self.rows) >= self.batch_size
+
+    def _adapt(self, row):
+        row = list(row)
+        for index, adapt in self.dates:
+            row[index] = adapt(row[index])
+        return row
+
+    def _insert(self, cursor, rows):
+        step = self.statement_rows
+        for start in range(0, len(rows), step):
+            chunk = rows[start:start + step]
+            sql = self.statements.get(len(chunk))
+            if sql is None:
+                placeholders = [["%s"] * len(self.fields)] * len(chunk)
+                sql = self.statements[len(chunk)] = self.sql + self.connection.ops.bulk_insert_sql(self.fields, placeholders)
+            cursor.execute(sql, [value for row in chunk for value in row])
+
+    def _copy(self, cursor, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            buffer.seek(0)
+            cursor.copy_expert(self.sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(self.sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def next_id(model, using=DEFAULT_DB_ALIAS):
+    return (model.objects.using(using).aggregate(last=models.Max("pk"))["last"] or 0) + 1
+
+
+def reset_sequences(models_list, using=DEFAULT_DB_ALIAS):
+    # id писались явно — последовательности Postgres нужно сдвинуть за них
+    connection = connections[using]
+    statements = connection.ops.sequence_reset_sql(no_style(), models_list)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+# --------------------
+# GENERATOR
+# --------------------
+
+class Seeder:
+    """
+    Воспроизводимый генератор: одинаковые seed, параметры и end_date дают одинаковые строки
+    """
+
+    def __init__(self, seed=0, end_date=None, days=730, password="seed-password", using=DEFAULT_DB_ALIAS):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.using = using
+        end_date = end_date or datetime.now(dt_timezone.utc).date()
+        self.end = datetime.combine(end_date, dt_time(18, 0), tzinfo=dt_timezone.utc)
+        self.days = days
+        self.password = password
+        self.counts = {}
+
+    def writer(self, model, fields):
+        return TableWriter(model, fields, using=self.using)
+
+    def finish(self, writer):
+        writer.flush()
+        name = writer.fields[0].model._meta.label
+        self.counts[name] = self.counts.get(name, 0) + writer.count
+
+    # ---- справочники и пользователи ----
+
+    def suppliers(self, count):
+        rng = self.rng
+        start = next_id(Supplier, self.using)
+        writer = self.writer(Supplier, ["id", "name", "bin_iin", "phone", "email", "bank_details"])
+        for i in range(count):
+            pk = start + i
+            name = f"{rng.choice(SUPPLIER_FORMS)} «{rng.choice(SUPPLIER_WORDS)}{rng.choice(SUPPLIER_WORDS).lower()}-{pk}»"
+            writer.add((
+                pk, name, f"{rng.randrange(10 ** 12):012d}", f"+7 7{rng.randrange(10 ** 9):09d}",
+                f"info{pk}@example.kz", f"IBAN KZ{rng.randrange(10 ** 18):018d}",
+            ))
+        self.finish(writer)
+        return list(range(start, start + count))
+
+    def customers(self, count):
+        start = next_id(Customer, self.using)
+        writer = self.writer(Customer, ["id", "name", "description"])
+        for i in range(count):
+            pk = start + i
+            writer.add((pk, f"{DEPARTMENTS[i % len(DEPARTMENTS)]} {pk}", None))
+        self.finish(writer)
+        return list(range(start, start + count))
+
+    def users(self, count):
+        """
+        {role: [id]}; у всех один пароль (хеш считается один раз), роли и флаги — как в User.save
+        """
+        User = get_user_model()
+        rng = self.rng
+        start = next_id(User, self.using)
+        # соль из генератора: хеш тот же при повторном запуске
+        salt = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(22))
+        password = make_password(self.password, salt)
+        roles, weights = zip(*USER_ROLES.items())
+        writer = self.writer(User, [
+            "id", "password", "last_login", "is_superuser", "username", "first_name", "last_name",
+            "email", "is_staff", "is_active", "date_joined", "role",
+        ])
+        by_role = {role: [] for role in roles}
+        joined = self.end - timedelta(days=self.days + 30)
+        for i in range(count):
+            pk = start + i
+            role = rng.choices(roles, weights)[0] if i >= len(roles) else roles[i]
+            by_role[role].append(pk)
+            username = f"seed{self.seed}-{i + 1}"
+            writer.add((
+                pk, password, None, role == "ADMIN", username, "", "",
+                f"{username}@example.kz", role in ("ADMIN", "ACCOUNTANT"), True, joined, role,
+            ))
+        self.finish(writer)
+        return by_role
+
+    def blobs(self):
+        """
+        По одному файлу-заглушке на тип документа (content-addressed, при повторном запуске те же)
+        """
+        blobs = {}
+        for doc_type in DOCUMENT_TYPES:
+            content = ContentFile(f"seed_erp placeholder: {doc_type}\n".encode(), name=f"{doc_type.lower()}.txt")
+            blobs[doc_type] = DocumentBlob.objects.store_file(content)
+        return blobs
+
+    # ---- заявки ----
+
+    def requests(self, count, items_per_request, documents_per_request, creators, managers, suppliers, customers, blobs):
+        rng = self.rng
+        random_ = rng.random
+        request_id = next_id(PurchaseRequest, self.using)
+        item_id = next_id(PurchaseItem, self.using)
+        document_id = next_id(RequestDocument, self.using)
+        items_low, items_high = items_per_request
+        docs_low, docs_high = documents_per_request
+        n_items = len(ITEM_NAMES)
+        ranks = {status: PurchaseRequest.rank_for(status) for status in PurchaseRequest.Status.values}
+
+        requests = self.writer(PurchaseRequest, [
+            "id", "ro_number", "creator_id", "manager_id", "supplier_id", "customer_id",
+            "amount_without_vat", "amount_with_vat", "vat_percent", "payment_date", "ddl",
+            "comment", "accountant_comment", "status", "status_rank", "version", "created_at", "updated_at",
+        ])
+        items = self.writer(PurchaseItem, ["id", "request_id", "name", "quantity", "price", "total"])
+        documents = self.writer(RequestDocument, [
+            "id", "request_id", "file", "type", "uploaded_by_id", "uploaded_at", "blob_id", "filename",
+        ])
+
+        # позиций на порядок больше, чем заявок: без вызова add() на каждую
+        add_item = items.rows.append
+        files = {doc_type: (blob.file.name, blob.pk) for doc_type, blob in blobs.items()}
+
+        span = self.days * 86400
+        begin = self.end - timedelta(seconds=span)
+        recent = span - RECENT_DAYS * 86400
+        for n in range(count):
+            # время создания растёт вместе с id, как у настоящих заявок
+            offset = (n + random_()) * span / count
+            created_at = begin + timedelta(seconds=offset)
+            updated_at = created_at + timedelta(seconds=int(random_() * 3600))
+            status_roll = random_()
+            if offset >= recent:
+                status = "WAITING" if status_roll < 0.6 else "PAID" if status_roll < 0.9 else "CANCELLED"
+            else:
+                status = "PAID" if status_roll < 0.85 else "CANCELLED" if status_roll < 0.95 else "WAITING"
+
+            total_cents = 0
+            for _ in range(items_low + int(random_() * (items_high - items_low + 1))):
+                quantity = 1 + int(random_() * 100)
+                price = 100 + int(random_() * 500000)
+                line = quantity * price
+                total_cents += line
+                add_item((item_id, request_id, ITEM_NAMES[int(random_() * n_items)], quantity, money(price), money(line)))
+                item_id += 1
+            if items.full():
+                items.flush()
+
+            creator = creators[int(random_() * len(creators))]
+            for _ in range(docs_low + int(random_() * (docs_high - docs_low + 1))):
+                doc_type = DOCUMENT_TYPES[int(random_() * len(DOCUMENT_TYPES))]
+                file_name, blob_id = files[doc_type]
+                documents.add((
+                    document_id, request_id, file_name, doc_type, creator,
+                    created_at + timedelta(seconds=60), blob_id, f"{doc_type.lower()}-{request_id}.pdf",
+                ))
+                document_id += 1
+
+            vat = VAT_PERCENTS[int(random_() * len(VAT_PERCENTS))]
+            created_date = created_at.date()
+            requests.add((
+                request_id, f"SEED{self.seed}-{n + 1:07d}", creator,
+                managers[int(random_() * len(managers))] if managers and random_() < 0.5 else None,
+                suppliers[int(random_() * len(suppliers))] if suppliers else None,
+                customers[int(random_() * len(customers))] if customers else None,
+                money(total_cents), money(with_vat(total_cents, vat)), vat,
+                created_date + timedelta(days=int(random_() * 20)) if status == "PAID" else None,
+                created_date + timedelta(days=7 + int(random_() * 30)),
+                None, None, status, ranks[status], 1, created_at, updated_at,
+            ))
+            request_id += 1
+
+        # внешние ключи Django создаёт DEFERRABLE INITIALLY DEFERRED — порядок пачек
+        # внутри транзакции не важен
+        for writer in (requests, items, documents):
+            self.finish(writer)
@@ -1,14 +1,27 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import PurchaseRequest, PurchaseItem, Supplier, Customer
+from rest_framework.validators import UniqueValidator
+from .models import PurchaseRequest, PurchaseItem, Supplier, Customer, RequestDocument, DocumentUpload
+from .permissions import IsManagerOrAccountant
+from .documents import DOCUMENT_CHUNK_SIZE, chunk_count, missing_chunks
+from .transitions import ALLOWED_TRANSITIONS, MAX_TRANSITION_BATCH
 from django.conf import settings
+from django.db import transaction
 
 User = settings.AUTH_USER_MODEL
 
 
 class PurchaseItemSerializer(serializers.ModelSerializer):
+    # во вложенном списке заявки id указывает, какую позицию меняем, а {"id": n, "_delete": true} —
+    # какую удалить (см. PurchaseRequestSerializer.update)
+    id = serializers.IntegerField(required=False)
+    _delete = serializers.BooleanField(required=False, write_only=True)
+
     class Meta:
         model = PurchaseItem
-        fields = ["id", "name", "description", "quantity", "price", "total"]
+        fields = ["id", "name", "description", "quantity", "price", "total", "_delete"]
         read_only_fields = ["total"]
 
     def create(self, validated_data):
@@ -17,41 +30,356 @@ class PurchaseItemSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class RequestDocumentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RequestDocument
+        fields = ["id", "file", "filename", "type", "uploaded_by", "uploaded_at"]
+        read_only_fields = fields
+
+
+class DocumentSearchSerializer(RequestDocumentSerializer):
+    kind = serializers.CharField(source="blob.kind", default="", read_only=True)
+    has_preview = serializers.BooleanField(source="blob.has_preview", default=False, read_only=True)
+
+    class Meta(RequestDocumentSerializer.Meta):
+        fields = RequestDocumentSerializer.Meta.fields + ["request", "kind", "has_preview"]
+        read_only_fields = fields
+
+
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField()
+    chunk_count = serializers.SerializerMethodField()
+    missing_chunks = serializers.SerializerMethodField()
+    document = RequestDocumentSerializer(read_only=True)
+
+    class Meta:
+        model = DocumentUpload
+        fields = [
+            "id", "request", "type", "filename", "size",
+            "chunk_size", "chunk_count", "missing_chunks", "document", "created_at",
+        ]
+        read_only_fields = ["id", "document", "created_at"]
+
+    def get_chunk_size(self, obj):
+        return DOCUMENT_CHUNK_SIZE
+
+    def get_chunk_count(self, obj):
+        return chunk_count(obj.size)
+
+    def get_missing_chunks(self, obj):
+        return [] if obj.document_id else missing_chunks(obj)
+
+    def validate_request(self, value):
+        # документы прикладывает создатель заявки; бухгалтер и админ — к любой (как update заявки)
+        request = self.context['request']
+        if value.creator_id != request.user.pk and not IsManagerOrAccountant().has_permission(request, None):
+            raise serializers.ValidationError("You cannot attach documents to this request.")
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.MAX_DOCUMENT_SIZE:
+            raise serializers.ValidationError(f"Size must be between 1 and {settings.MAX_DOCUMENT_SIZE} bytes.")
+        return value
+
+
+class SupplierSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Supplier
+        fields = '__all__'
+
+class CustomerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Customer
+        fields = '__all__'
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который берёт объект из preloaded ({pk: объект}), если
+    пакет загрузил их заранее одним in_bulk (PurchaseRequestListSerializer). Чего там
+    нет — обычный queryset.get() с обычными ошибками
+    """
+    preloaded = None
+
+    def to_internal_value(self, data):
+        if self.preloaded is not None and self.pk_field is None and not isinstance(data, bool):
+            try:
+                return self.preloaded[self.get_queryset().model._meta.pk.to_python(data)]
+            except (KeyError, TypeError, DjangoValidationError):
+                pass
+        return super().to_internal_value(data)
+
+
+class PurchaseRequestListSerializer(serializers.ListSerializer):
+    """
+    Пакетное создание заявок: все заявки одним INSERT, все позиции — вторым.
+    Проверка тоже пакетная: связи — одним in_bulk на поле, уникальность ro_number —
+    одним запросом на весь список, так что число запросов не зависит от размера пакета
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.preload_related(data)
+            # UniqueValidator делал бы SELECT на каждую заявку — ro_number проверяет validate()
+            ro_number = self.child.fields['ro_number']
+            ro_number.validators = [v for v in ro_number.validators if not isinstance(v, UniqueValidator)]
+        return super().to_internal_value(data)
+
+    def preload_related(self, data):
+        for name, field in self.child.fields.items():
+            if field.read_only or not isinstance(field, PreloadedPrimaryKeyRelatedField):
+                continue
+            pk_field = field.get_queryset().model._meta.pk
+            pks = set()
+            for row in data:
+                value = row.get(name) if isinstance(row, dict) else None
+                if value is None or isinstance(value, bool):
+                    continue
+                try:
+                    pks.add(pk_field.to_python(value))
+                except DjangoValidationError:
+                    pass  # ошибку покажет само поле
+            field.preloaded = field.get_queryset().in_bulk(pks)
+
+    def validate(self, attrs):
+        numbers = [row['ro_number'] for row in attrs]
+        seen, duplicates = set(), []
+        for number in numbers:
+            if number in seen and number not in duplicates:
+                duplicates.append(number)
+            seen.add(number)
+
+        errors = []
+        if duplicates:
+            errors.append(f"Duplicate R.O numbers in this batch: {', '.join(duplicates)}.")
+        taken = sorted(PurchaseRequest.objects.filter(ro_number__in=seen).values_list('ro_number', flat=True))
+        if taken:
+            errors.append(f"Purchase requests with these R.O numbers already exist: {', '.join(taken)}.")
+        if errors:
+            raise serializers.ValidationError({'ro_number': errors})
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        requests = []
+        items = []
+
+        for attrs in validated_data:
+            items_data = attrs.pop('items')
+            request = PurchaseRequest(**attrs)
+            items.extend(self.child.build_items(request, items_data))
+            requests.append(request)
+
+        PurchaseRequest.objects.bulk_create(requests)
+        # суммы заявок посчитаны в build_items
+        PurchaseItem.objects.bulk_create(items, update_request_totals=False)
+
+        # перечитываем с prefetch, чтобы ответ не делал запрос на каждую заявку
+        queryset = PurchaseRequest.objects.filter(pk__in=[r.pk for r in requests])
+        return list(self.child.setup_eager_loading(queryset).order_by('pk'))
+
+
 class PurchaseRequestSerializer(serializers.ModelSerializer):
     items = PurchaseItemSerializer(many=True)
+    documents = RequestDocumentSerializer(many=True, read_only=True)
     
     amount_without_vat = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
     amount_with_vat = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = PurchaseRequest
-        fields = '__all__'
+        exclude = ['status_rank']
+        list_serializer_class = PurchaseRequestListSerializer
+
+    # в пакете (many=True) объекты связей загружаются одним in_bulk на поле
+    serializer_related_field = PreloadedPrimaryKeyRelatedField
+
+    # связи, которые рендерит сериализатор — по ним строится queryset во viewset
+    select_related_fields = ("supplier", "customer", "creator", "manager")
+    prefetch_related_fields = ("items", "documents")
+
+    # ?expand=supplier,customer — вложенные объекты вместо id
+    expandable_fields = {
+        "supplier": SupplierSerializer,
+        "customer": CustomerSerializer,
+    }
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        return (
+            queryset
+            .select_related(*cls.select_related_fields)
+            .prefetch_related(*cls.prefetch_related_fields)
+        )
+
+    def get_expand(self):
+        request = self.context.get("request")
+        if request is None:
+            return set()
+        expand = request.query_params.get("expand", "")
+        return {name.strip() for name in expand.split(",")} & self.expandable_fields.keys()
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+
+        for name in self.get_expand():
+            related = getattr(instance, name)
+            data[name] = self.expandable_fields[name](related).data if related else None
 
+        return data
+
+    @staticmethod
+    def amounts(total_without_vat, vat_percent):
+        """
+        (сумма без НДС, сумма с НДС) по сумме позиций — то же округление, что у ROUND()
+        в main.amounts (recalc_amounts)
+        """
+        with_vat = total_without_vat * (100 + Decimal(vat_percent)) / 100
+        return total_without_vat, with_vat.quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+    def build_items(self, request, items_data):
+        """
+        Собирает несохранённые позиции и за тот же проход считает суммы заявки
+        """
+        items = []
+        total_without_vat = Decimal('0')
+
+        for item_data in items_data:
+            item_data.pop('id', None)  # новая заявка — позиции всегда новые
+            if item_data.pop('_delete', False):
+                continue
+            total = item_data['quantity'] * item_data['price']
+            total_without_vat += total
+            items.append(PurchaseItem(request=request, total=total, **item_data))
+
+        request.amount_without_vat, request.amount_with_vat = self.amounts(total_without_vat, request.vat_percent)
+
+        return items
+
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
 
-        # calculate totals
-        total_without_vat = sum([item['quantity'] * item['price'] for item in items_data])
-        vat_percent = validated_data.get('vat_percent', 12)
-        total_with_vat = total_without_vat * (1 + vat_percent / 100)
+        request = PurchaseRequest(**validated_data)
+        items = self.build_items(request, items_data)
+
+        request.save()
+        PurchaseItem.objects.bulk_create(items, update_request_totals=False)
+
+        return request
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        items_data = validated_data.pop('items', None)
+        vat_percent = validated_data.get('vat_percent', instance.vat_percent)
+
+        if items_data is not None:
+            total_without_vat = self.update_items(instance, items_data)
+        elif 'vat_percent' in validated_data:
+            total_without_vat = instance.amount_without_vat
+        else:
+            return super().update(instance, validated_data)
+
+        # суммы сохраняются вместе с заявкой: один UPDATE, одна новая version и сводка на разницу
+        validated_data['amount_without_vat'], validated_data['amount_with_vat'] = self.amounts(
+            total_without_vat, vat_percent
+        )
+        return super().update(instance, validated_data)
 
-        validated_data['amount_without_vat'] = total_without_vat
-        validated_data['amount_with_vat'] = total_with_vat
+    def update_items(self, request, items_data):
+        """
+        Сверяет присланные позиции с текущими по id: без id — новые (один bulk_create),
+        с изменёнными полями — один bulk_update, с "_delete": true — один DELETE. PUT
+        передаёт весь список, и не присланные позиции тоже удаляются; PATCH их не трогает.
+        Число запросов не зависит от числа позиций. Возвращает сумму итоговых позиций без НДС
+        """
+        existing = {item.pk: item for item in request.items.select_for_update().order_by('pk')}
 
-        request = PurchaseRequest.objects.create(**validated_data)
+        ids = [item_data['id'] for item_data in items_data if 'id' in item_data]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError({'items': ["Duplicate item ids."]})
+        unknown = sorted(set(ids) - existing.keys())
+        if unknown:
+            raise serializers.ValidationError(
+                {'items': [f"Items {', '.join(map(str, unknown))} do not belong to this request."]}
+            )
 
+        required = [name for name, field in self.fields['items'].child.fields.items() if field.required]
+        created, changed, fields, kept, deleted = [], [], set(), [], []
         for item_data in items_data:
-            PurchaseItem.objects.create(request=request, **item_data)
+            item = existing.pop(item_data.pop('id', None), None)
+            if item_data.pop('_delete', False):
+                if item is None:
+                    raise serializers.ValidationError({'items': ["Only existing items (with id) can be deleted."]})
+                deleted.append(item.pk)
+                continue
+            if item is None:
+                # PATCH не требует полей позиций, но новой позиции они нужны
+                missing = [name for name in required if name not in item_data]
+                if missing:
+                    raise serializers.ValidationError(
+                        {'items': [f"New items require: {', '.join(missing)}."]}
+                    )
+                created.append(PurchaseItem(request=request, **item_data))
+                continue
 
-        return request
+            diff = {name: value for name, value in item_data.items() if getattr(item, name) != value}
+            for name, value in diff.items():
+                setattr(item, name, value)
+            (changed if diff else kept).append(item)
+            fields.update(diff)
 
+        # суммы заявки посчитаны здесь — сами операции их не двигают
+        if created:
+            PurchaseItem.objects.bulk_create(created, update_request_totals=False)
+        if changed:
+            PurchaseItem.objects.bulk_update(changed, fields, update_request_totals=False)
+        if self.partial:
+            kept.extend(existing.values())
+        else:
+            deleted.extend(existing)
+        if deleted:
+            PurchaseItem.objects.filter(pk__in=deleted).delete(update_request_totals=False)
 
-class SupplierSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Supplier
-        fields = '__all__'
+        return sum((item.total for item in [*created, *changed, *kept]), Decimal('0'))
 
-class CustomerSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Customer
-        fields = '__all__'
\ No newline at end of file
+
+class TransitionItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    version = serializers.IntegerField(required=False, min_value=1)
+    updated_at = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if 'version' not in attrs and 'updated_at' not in attrs:
+            raise serializers.ValidationError("Either version or updated_at is required.")
+        return attrs
+
+
+class RequestTransitionSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=list(ALLOWED_TRANSITIONS))
+    requests = TransitionItemSerializer(many=True, allow_empty=False, max_length=MAX_TRANSITION_BATCH)
+
+    def validate_requests(self, value):
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Duplicate request ids.")
+        return value
+
+
+class TransitionResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    result = serializers.CharField()
+    status = serializers.CharField(allow_null=True)
+    version = serializers.IntegerField(allow_null=True)
+
+
+class SpendReportSerializer(serializers.Serializer):
+    period = serializers.DateField(format="%Y-%m", allow_null=True)
+    supplier = serializers.IntegerField(source="supplier_key", allow_null=True)
+    supplier_name = serializers.CharField(allow_null=True)
+    customer = serializers.IntegerField(source="customer_key", allow_null=True)
+    customer_name = serializers.CharField(allow_null=True)
+    status = serializers.CharField(allow_null=True)
+    total_with_vat = serializers.DecimalField(max_digits=16, decimal_places=2)
+    total_without_vat = serializers.DecimalField(max_digits=16, decimal_places=2)
+    request_count = serializers.IntegerField()
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .cache import customer_directory, supplier_directory
+from .search import install_sqlite_fts
+from .models import (
+    Customer, DocumentBlob, DocumentJob, PurchaseItem, PurchaseRequest, RequestCounter, SpendSummary, Supplier,
+)
+
+
+# --------------------
+# DIRECTORY CACHE INVALIDATION
+# --------------------
+
+# новая версия — после COMMIT: иначе параллельный запрос соберёт под ней ещё старые данные
+@receiver([post_save, post_delete], sender=Supplier)
+def bump_supplier_directory(sender, using=None, **kwargs):
+    transaction.on_commit(supplier_directory.bump, using=using)
+
+
+@receiver([post_save, post_delete], sender=Customer)
+def bump_customer_directory(sender, using=None, **kwargs):
+    transaction.on_commit(customer_directory.bump, using=using)
+
+
+# --------------------
+# SPEND SUMMARY
+# --------------------
+# создание и изменение заявок учитываются в PurchaseRequest.save() и PurchaseRequestQuerySet
+
+@receiver(post_delete, sender=PurchaseRequest)
+def subtract_deleted_request(sender, instance, **kwargs):
+    state = getattr(instance, '_loaded_spend_state', None) or instance.spend_state()
+    SpendSummary.objects.apply([state], sign=-1)
+
+
+@receiver(post_delete, sender=Supplier)
+def move_supplier_spend(sender, instance, **kwargs):
+    # заявки удалённого поставщика получают supplier=NULL (SET_NULL) — сводка тоже
+    SpendSummary.objects.move('supplier_key', instance.pk)
+
+
+@receiver(post_delete, sender=Customer)
+def move_customer_spend(sender, instance, **kwargs):
+    SpendSummary.objects.move('customer_key', instance.pk)
+
+
+# --------------------
+# REQUEST COUNTERS
+# --------------------
+# создание и изменение — в PurchaseRequest.save() и PurchaseRequestQuerySet, как у сводки
+
+@receiver(post_delete, sender=PurchaseRequest)
+def subtract_deleted_request_count(sender, instance, **kwargs):
+    state = getattr(instance, '_loaded_counter_state', None) or instance.counter_state()
+    RequestCounter.objects.apply([state], sign=-1)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def move_creator_counters(sender, instance, **kwargs):
+    # заявки удалённого пользователя получают creator=NULL (SET_NULL) — счётчики тоже
+    RequestCounter.objects.move(instance.pk)
+
+
+# --------------------
+# REQUEST TOTALS
+# --------------------
+# вставка и изменение позиций сдвигают суммы заявки в PurchaseItem.save() и
+# PurchaseItemQuerySet; заодно обновляется updated_at, по которому кешируются
+# строки списков ({% cache %} в шаблонах)
+
+@receiver(post_delete, sender=PurchaseItem)
+def subtract_deleted_item(sender, instance, origin=None, using=None, **kwargs):
+    # каскад от удаления самой заявки — трогать нечего;
+    # QuerySet.delete() позиций вычитает суммы сам, одним UPDATE на заявку
+    if getattr(origin, 'model', None) in (PurchaseRequest, PurchaseItem) or isinstance(origin, PurchaseRequest):
+        return
+    total = getattr(instance, '_loaded_total', instance.total)
+    PurchaseRequest.objects.using(using).add_item_totals({instance.request_id: -total})
+
+
+# --------------------
+# DOCUMENT POST-PROCESSING
+# --------------------
+# в запросе загрузки — только строка задачи; обработка в manage.py process_documents
+
+@receiver(post_save, sender=DocumentBlob)
+def enqueue_document_job(sender, instance, created, **kwargs):
+    if created:
+        DocumentJob.objects.enqueue([instance.pk])
+
+
+# --------------------
+# FULL-TEXT SEARCH (SQLite)
+# --------------------
+
+@receiver(post_migrate)
+def setup_supplier_search(sender, app_config=None, using="default", **kwargs):
+    if app_config is not None and app_config.label == "main":
+        install_sqlite_fts(using)
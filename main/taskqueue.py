@@ -0,0 +1,161 @@
+import logging
+import os
+import random
+import socket
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import partial
+from datetime import timedelta
+
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------
+# DB-BACKED TASK QUEUE
+# --------------------
+# Побочные эффекты (уведомления, журнал, сводки) — вне запроса, без брокера:
+# задачи лежат в таблице Task, manage.py run_workers выполняет их в N процессах.
+#
+#     @task(batch=True)
+#     def request_status_changed(payloads): ...
+#
+#     enqueue(request_status_changed, {"request": pr.pk, ...})
+#     enqueue_many(request_status_changed, [{...}, {...}])
+#
+# enqueue()/enqueue_many() внутри transaction.atomic откладывают INSERT до COMMIT
+# (transaction.on_commit): откат — задачи нет; задачи одного вызова enqueue_many
+# вставляются одним bulk_create. durable=True вставляет строки сразу, в той же
+# транзакции (атомарно с изменением данных).
+
+LOCK_TIMEOUT = timedelta(minutes=10)
+RETRY_DELAY = timedelta(seconds=10)
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    name: str
+    func: object
+    batch: bool
+    max_attempts: int
+
+
+registry = {}
+
+
+def task(name=None, batch=False, max_attempts=5):
+    """
+    Регистрирует функцию как задачу. batch=True — функция получает список payload
+    всех однотипных задач, забранных воркером за раз (например, один bulk_create)
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        registry[task_name] = TaskSpec(task_name, func, batch, max_attempts)
+        func.task_name = task_name
+        return func
+    return decorator
+
+
+def enqueue(func, payload=None, *, delay=None, durable=False, using=None):
+    enqueue_many(func, [payload], delay=delay, durable=durable, using=using)
+
+
+def enqueue_many(func, payloads, *, delay=None, durable=False, using=None):
+    """
+    Задачи одного типа (по одной на payload) — одним bulk_create
+    """
+    name = getattr(func, "task_name", func)
+    if name not in registry:
+        raise KeyError(f"Unknown task: {name}")
+
+    run_after = timezone.now() + (delay or timedelta())
+    items = [
+        Task(name=name, payload=payload or {}, max_attempts=registry[name].max_attempts, run_after=run_after)
+        for payload in payloads
+    ]
+    if not items:
+        return
+    if durable:
+        Task.objects.using(using).bulk_create(items)
+        return
+
+    # вне atomic on_commit выполняется сразу; откат точки сохранения выбрасывает и задачи
+    transaction.on_commit(partial(Task.objects.using(using).bulk_create, items), using=using)
+
+
+# --------------------
+# WORKER
+# --------------------
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_batch(worker, limit):
+    """
+    Забирает и выполняет до limit задач. Возвращает число забранных
+    """
+    claimed = Task.objects.claim(worker, limit, LOCK_TIMEOUT)
+
+    groups = defaultdict(list)
+    for item in claimed:
+        groups[item.name].append(item)
+
+    for name, items in groups.items():
+        spec = registry.get(name)
+        if spec is None:
+            for item in items:
+                Task.objects.mark_failed(item, f"Unknown task: {name}", 0, RETRY_DELAY)
+            continue
+
+        if spec.batch:
+            _execute(spec, items, lambda: spec.func([item.payload for item in items]))
+        else:
+            for item in items:
+                _execute(spec, [item], lambda item=item: spec.func(**item.payload))
+
+    return len(claimed)
+
+
+def _execute(spec, items, call):
+    try:
+        with transaction.atomic():
+            call()
+            Task.objects.filter(pk__in=[item.pk for item in items]).delete()
+    except Exception as exc:
+        logger.warning("task %s failed (%s item(s)): %s", spec.name, len(items), exc)
+        # лимит — из строки: задачи, поставленные до смены max_attempts, доживают со своим
+        for item in items:
+            Task.objects.mark_failed(item, exc, item.max_attempts, RETRY_DELAY)
+
+
+def work(batch_size=20, poll_interval=1.0, stop=None, once=False):
+    """
+    Цикл воркера: пока есть задачи — без пауз, иначе опрос с poll_interval (с разбросом)
+    """
+    worker = worker_name()
+    processed = 0
+    while stop is None or not stop.is_set():
+        close_old_connections()
+        try:
+            count = run_batch(worker, batch_size)
+        except DatabaseError as exc:
+            # SQLite без SKIP LOCKED: конкурентный claim получает "database is locked" — повторить позже
+            logger.warning("task worker %s: %s", worker, exc)
+            count = 0
+        processed += count
+        if count:
+            continue
+        if once:
+            break
+        delay = poll_interval * random.uniform(0.5, 1.5)
+        if stop is not None:
+            stop.wait(delay)
+        else:
+            time.sleep(delay)
+    return processed
@@ -0,0 +1,42 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import RequestStatusChange
+from .taskqueue import enqueue_many, task
+
+
+# --------------------
+# TASKS
+# --------------------
+# Регистрируются при импорте (MainConfig.ready), выполняются в manage.py run_workers.
+
+@task(batch=True)
+def request_status_changed(payloads):
+    """
+    Журнал смены статусов; пачка задач — один INSERT.
+    Сюда же добавятся уведомления.
+    """
+    RequestStatusChange.objects.bulk_create([
+        RequestStatusChange(
+            request_id=payload["request"],
+            old_status=payload["old"],
+            new_status=payload["new"],
+            changed_by_id=payload.get("user"),
+            changed_at=parse_datetime(payload["at"]),
+        )
+        for payload in payloads
+    ])
+
+
+def notify_status_changes(changes, user=None):
+    """
+    changes — [(request_id, old_status, new_status)]; вызывать внутри транзакции изменения
+    """
+    now = timezone.now().isoformat()
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    # все изменения пачки — одна вставка задач после COMMIT
+    enqueue_many(request_status_changed, [
+        {"request": request_id, "old": old, "new": new, "user": user_id, "at": now}
+        for request_id, old, new in changes
+        if old != new
+    ])
@@ -1,3 +1,959 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import re
+import tempfile
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib import admin
+from django.contrib.messages import get_messages
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.test import TestCase, override_settings
+from django.urls import include, path
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from user.models import User
+from .amounts import recalculate_amounts
+from .cache import VERSION_TIMEOUT, supplier_directory
+from .pagination import KeysetPagination, encode_cursor, paginate_keyset
+from .previews import preview_cache
+from .models import (
+    Customer, DocumentBlob, DocumentJob, PurchaseItem, PurchaseRequest, RequestCounter, RequestDocument,
+    SpendSummary, Supplier, Task,
+)
+from . import async_views, taskqueue
+from .taskqueue import enqueue
+from .tasks import notify_status_changes
+from .views import CustomerViewSet, SupplierViewSet
+
+# тестовый URLconf: админка (в osc_erp/urls.py не подключена) и async-вью рядом с синхронными —
+# main/urls.py подключает их вместо синхронных только при DJANGO_ASYNC=1
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path("async/requests/", async_views.requests_list_view),
+    path("async/my-requests/", async_views.my_requests_view),
+    path("async/api/suppliers/", async_views.supplier_list_view(SupplierViewSet.as_view({"get": "list"}))),
+    path("async/api/suppliers/search/", async_views.supplier_search_view),
+    path("async/api/customers/", async_views.customer_list_view(CustomerViewSet.as_view({"get": "list"}))),
+    path("", include("osc_erp.urls")),
+]
+
+
+class PurchaseRequestApiQueryCountTests(TestCase):
+    """
+    Число SQL-запросов на страницу списка не зависит от количества заявок
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("employee", password="pass", role=User.Role.EMPLOYEE)
+        self.supplier = Supplier.objects.create(name="Supplier")
+        self.customer = Customer.objects.create(name="Department")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_requests(self, count):
+        start = PurchaseRequest.objects.count()
+        for i in range(start, start + count):
+            pr = PurchaseRequest.objects.create(
+                ro_number=f"RO-{i}",
+                creator=self.user,
+                manager=self.user,
+                supplier=self.supplier,
+                customer=self.customer,
+                amount_without_vat=100,
+                amount_with_vat=112,
+            )
+            PurchaseItem.objects.create(request=pr, name="Item", quantity=2, price=50)
+            RequestDocument.objects.create(request=pr, file="doc.pdf", uploaded_by=self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        self.create_requests(2)
+        small = self.count_queries("/api/purchase-requests/")
+        self.create_requests(15)
+        large = self.count_queries("/api/purchase-requests/")
+        self.assertEqual(small, large)
+
+    def test_expand_reuses_joins(self):
+        self.create_requests(5)
+        plain = self.count_queries("/api/purchase-requests/")
+        expanded = self.count_queries("/api/purchase-requests/?expand=supplier,customer")
+        self.assertEqual(plain, expanded)
+
+        row = self.client.get("/api/purchase-requests/?expand=supplier").json()["results"][0]
+        self.assertEqual(row["supplier"]["name"], "Supplier")
+        self.assertEqual(row["customer"], self.customer.pk)
+        self.assertEqual(len(row["items"]), 1)
+        self.assertEqual(len(row["documents"]), 1)
+
+    def test_retrieve_query_count_is_constant(self):
+        self.create_requests(1)
+        pr = PurchaseRequest.objects.get()
+        before = self.count_queries(f"/api/purchase-requests/{pr.pk}/")
+        PurchaseItem.objects.bulk_create(
+            PurchaseItem(request=pr, name="Extra", quantity=1, price=1, total=1) for _ in range(10)
+        )
+        after = self.count_queries(f"/api/purchase-requests/{pr.pk}/")
+        self.assertEqual(before, after)
+
+    def test_row_serialization_matches_serializer(self):
+        self.create_requests(3)
+        PurchaseRequest.objects.filter(pk=PurchaseRequest.objects.earliest("pk").pk).update(supplier=None)
+        for url in ("/api/purchase-requests/", "/api/purchase-requests/?expand=supplier,customer"):
+            with self.settings(API_ROW_SERIALIZATION=False):
+                expected = self.client.get(url).content
+            self.assertEqual(self.client.get(url).content, expected)
+
+    def put_items(self, current, items):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.put(
+                f"/api/purchase-requests/{current['id']}/", dict(current, items=items), format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_nested_item_update_query_count_is_constant(self):
+        self.client.force_authenticate(
+            User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT)
+        )
+        counts = []
+        for size in (2, 12):
+            self.create_requests(1)
+            pr = PurchaseRequest.objects.latest("pk")
+            PurchaseItem.objects.bulk_create(
+                PurchaseItem(request=pr, name="Extra", quantity=1, price=10) for _ in range(size - 1)
+            )
+            current = self.client.get(f"/api/purchase-requests/{pr.pk}/").json()
+            items = current["items"]
+            # первая позиция меняется, последняя удаляется, остальные как есть, плюс новая
+            payload = [dict(items[0], quantity=3), *items[1:-1], {"name": "New", "quantity": 1, "price": "5.00"}]
+            data, queries = self.put_items(current, payload)
+            counts.append(queries)
+
+            self.assertEqual([item["id"] for item in data["items"][:-1]], [item["id"] for item in items[:-1]])
+            expected = 3 * 50 + 10 * (size - 2) + 5
+            self.assertEqual(data["amount_without_vat"], f"{expected:.2f}")
+            self.assertEqual(data["version"], current["version"] + 1)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_patch_items_keeps_omitted_items(self):
+        self.client.force_authenticate(
+            User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT)
+        )
+        self.create_requests(1)
+        pr = PurchaseRequest.objects.latest("pk")
+        PurchaseItem.objects.bulk_create(PurchaseItem(request=pr, name="Extra", quantity=1, price=10) for _ in range(2))
+        first, second, third = self.client.get(f"/api/purchase-requests/{pr.pk}/").json()["items"]
+
+        response = self.client.patch(
+            f"/api/purchase-requests/{pr.pk}/", {"items": [{"id": first["id"], "quantity": 3}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(sorted(item["id"] for item in data["items"]), [first["id"], second["id"], third["id"]])
+        self.assertEqual(data["amount_without_vat"], "170.00")
+
+        # удаление в PATCH — только явным "_delete"
+        response = self.client.patch(
+            f"/api/purchase-requests/{pr.pk}/", {"items": [{"id": second["id"], "_delete": True}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(sorted(item["id"] for item in data["items"]), [first["id"], third["id"]])
+        self.assertEqual(data["amount_without_vat"], "160.00")
+
+    def bulk_payload(self, prefix, count):
+        return [
+            {
+                "ro_number": f"{prefix}-{i}",
+                "supplier": self.supplier.pk,
+                "customer": self.customer.pk,
+                "items": [{"name": "Item", "quantity": 2, "price": "50.00"}],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_query_count_is_constant(self):
+        # первая пачка создаёт строки сводки и счётчика, дальше только их обновление
+        self.client.post("/api/purchase-requests/bulk/", self.bulk_payload("WARMUP", 1), format="json")
+        for prefix, size in (("SMALL", 3), ("LARGE", 20)):
+            with self.assertNumQueries(16):
+                response = self.client.post(
+                    "/api/purchase-requests/bulk/", self.bulk_payload(prefix, size), format="json"
+                )
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(len(response.json()), size)
+
+    def test_bulk_create_rejects_duplicate_ro_numbers(self):
+        PurchaseRequest.objects.create(
+            ro_number="TAKEN", supplier=self.supplier, customer=self.customer,
+            amount_without_vat=0, amount_with_vat=0,
+        )
+        payload = self.bulk_payload("DUP", 3)
+        payload[2]["ro_number"] = "DUP-0"
+        response = self.client.post("/api/purchase-requests/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("DUP-0", response.json()["ro_number"][0])
+
+        payload = self.bulk_payload("NEW", 2) + [dict(self.bulk_payload("X", 1)[0], ro_number="TAKEN")]
+        response = self.client.post("/api/purchase-requests/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("TAKEN", response.json()["ro_number"][0])
+        self.assertFalse(PurchaseRequest.objects.filter(ro_number__startswith="DUP").exists())
+        self.assertFalse(PurchaseRequest.objects.filter(ro_number__startswith="NEW").exists())
+
+    def test_bulk_create_reports_unknown_supplier(self):
+        payload = self.bulk_payload("BAD", 2)
+        payload[1]["supplier"] = self.supplier.pk + 1000
+        response = self.client.post("/api/purchase-requests/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("supplier", response.json()[1])
+
+
+class StatusTransitionTests(TestCase):
+    """
+    POST /api/purchase-requests/transition/ и старая HTML-вьюха смены статуса
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, ro_number, status=PurchaseRequest.Status.WAITING):
+        return PurchaseRequest.objects.create(
+            ro_number=ro_number, status=status, amount_without_vat=100, amount_with_vat=112,
+        )
+
+    def test_transition_results(self):
+        fresh = self.create("FRESH")
+        stale = self.create("STALE")
+        cancelled = self.create("CANCELLED", PurchaseRequest.Status.CANCELLED)
+        stale.comment = "changed by someone else"
+        stale.save()  # version + 1: клиент видел предыдущую
+
+        response = self.client.post("/api/purchase-requests/transition/", {
+            "status": "PAID",
+            "requests": [
+                {"id": fresh.pk, "version": fresh.version},
+                {"id": stale.pk, "version": stale.version - 1},
+                {"id": cancelled.pk, "version": cancelled.version},
+                {"id": cancelled.pk + 100, "version": 1},
+            ],
+        }, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        results = {row["id"]: row for row in response.json()["results"]}
+
+        self.assertEqual(results[fresh.pk], {"id": fresh.pk, "result": "applied", "status": "PAID",
+                                             "version": fresh.version + 1})
+        self.assertEqual(results[stale.pk], {"id": stale.pk, "result": "conflict", "status": "WAITING",
+                                             "version": stale.version})
+        self.assertEqual(results[cancelled.pk]["result"], "not_allowed")
+        self.assertEqual(results[cancelled.pk + 100]["result"], "not_found")
+
+        fresh.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual((fresh.status, fresh.manager), (PurchaseRequest.Status.PAID, self.user))
+        self.assertEqual(stale.status, PurchaseRequest.Status.WAITING)
+
+    def test_legacy_view_reports_rejected_transition(self):
+        cancelled = self.create("CANCELLED", PurchaseRequest.Status.CANCELLED)
+        waiting = self.create("WAITING")
+        self.client.force_login(self.user)
+
+        response = self.client.get(f"/requests/{waiting.pk}/status/PAID/")
+        self.assertRedirects(response, "/requests/", fetch_redirect_response=False)
+        self.assertEqual(list(get_messages(response.wsgi_request)), [])
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.status, PurchaseRequest.Status.PAID)
+
+        # CANCELLED -> PAID раньше проходил молча, теперь отклоняется с сообщением
+        response = self.client.get(f"/requests/{cancelled.pk}/status/PAID/")
+        self.assertRedirects(response, "/requests/", fetch_redirect_response=False)
+        [message] = get_messages(response.wsgi_request)
+        self.assertEqual(message.level_tag, "error")
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, PurchaseRequest.Status.CANCELLED)
+
+        response = self.client.get(f"/requests/{waiting.pk + 100}/status/PAID/")
+        self.assertEqual(response.status_code, 404)
+
+
+class SpendSummaryTests(TestCase):
+    """
+    Сводка, которую ведут save()/QuerySet, совпадает с пересчётом по заявкам
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user("employee", password="pass", role=User.Role.EMPLOYEE)
+        self.suppliers = [Supplier.objects.create(name=f"Supplier {i}") for i in range(15)]
+        self.customer = Customer.objects.create(name="Department")
+
+    def build(self, prefix, count):
+        return [
+            PurchaseRequest(
+                ro_number=f"{prefix}-{i}", creator=self.user, supplier=self.suppliers[i % len(self.suppliers)],
+                customer=self.customer, amount_without_vat=Decimal("100.00") * (i + 1),
+                amount_with_vat=Decimal("112.00") * (i + 1),
+            )
+            for i in range(count)
+        ]
+
+    def assertSummaryMatches(self):
+        def normalize(rows):
+            return {
+                key: (Decimal(with_vat or 0), Decimal(without_vat or 0), count)
+                for key, with_vat, without_vat, count in rows
+                if with_vat or without_vat or count
+            }
+
+        expected = normalize(SpendSummary.objects.aggregate_requests(PurchaseRequest.objects.all()))
+        actual = normalize(
+            ((period, supplier_key, customer_key, status), with_vat, without_vat, count)
+            for period, supplier_key, customer_key, status, with_vat, without_vat, count
+            in SpendSummary.objects.values_list(
+                'period', 'supplier_key', 'customer_key', 'status',
+                'total_with_vat', 'total_without_vat', 'request_count',
+            )
+        )
+        self.assertEqual(actual, expected)
+
+    def test_incremental_summary_matches_aggregate(self):
+        pr = self.build("SAVE", 1)[0]
+        pr.save()
+        self.assertSummaryMatches()
+        pr.status = PurchaseRequest.Status.PAID
+        pr.supplier = self.suppliers[1]
+        pr.save()
+        self.assertSummaryMatches()
+
+        PurchaseRequest.objects.bulk_create(self.build("BULK", 12))
+        self.assertSummaryMatches()
+
+        PurchaseRequest.objects.filter(ro_number__startswith="BULK").exclude(
+            supplier=self.suppliers[0]
+        ).update(status=PurchaseRequest.Status.CANCELLED, amount_with_vat=F("amount_with_vat") + 1)
+        self.assertSummaryMatches()
+
+        PurchaseRequest.objects.get(ro_number="BULK-3").delete()
+        PurchaseRequest.objects.filter(ro_number__in=["BULK-4", "BULK-5"]).delete()
+        pr.delete()
+        self.assertSummaryMatches()
+
+    def test_bulk_create_writes_summary_in_constant_queries(self):
+        PurchaseRequest.objects.bulk_create(self.build("WARMUP", 1))  # строка счётчика создателя
+        counts = []
+        for prefix, size in (("SMALL", 3), ("LARGE", 15)):
+            # свой отдел — все ключи сводки новые в обоих прогонах
+            self.customer = Customer.objects.create(name=prefix)
+            with CaptureQueriesContext(connection) as ctx:
+                PurchaseRequest.objects.bulk_create(self.build(prefix, size))
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertSummaryMatches()
+
+
+class RecalculateAmountsTests(TestCase):
+
+    def setUp(self):
+        self.requests = []
+        for i in range(5):
+            pr = PurchaseRequest.objects.create(ro_number=f"RC-{i}", amount_without_vat=0, amount_with_vat=0)
+            PurchaseItem.objects.create(request=pr, name="Item", quantity=i + 1, price=Decimal("10.00"))
+            self.requests.append(pr)
+        # без позиций — сумма введена вручную
+        self.manual = PurchaseRequest.objects.create(ro_number="RC-MANUAL", amount_without_vat=7, amount_with_vat=8)
+        # расхождения: суммы записаны в обход позиций
+        self.broken = [self.requests[1].pk, self.requests[3].pk]
+        PurchaseRequest.objects.filter(pk__in=self.broken).update(amount_without_vat=1, amount_with_vat=1)
+
+    def amounts(self):
+        return dict(PurchaseRequest.objects.values_list("pk", "amount_with_vat"))
+
+    def test_dry_run_reports_without_changes(self):
+        before = self.amounts()
+        mismatches = [row for batch in recalculate_amounts(dry_run=True, batch_size=2) for row in batch]
+
+        self.assertEqual([row.id for row in mismatches], self.broken)
+        self.assertEqual(mismatches[0].amount_with_vat, Decimal("1.00"))
+        self.assertEqual(mismatches[0].expected_without_vat, Decimal("20.00"))
+        self.assertEqual(mismatches[0].expected_with_vat, Decimal("22.40"))
+        self.assertEqual(self.amounts(), before)
+
+    def test_apply_fixes_only_mismatches(self):
+        versions = dict(PurchaseRequest.objects.values_list("pk", "version"))
+        queryset = PurchaseRequest.objects.filter(pk__in=[self.broken[0], self.requests[0].pk, self.manual.pk])
+        fixed = [row.id for batch in recalculate_amounts(queryset, batch_size=2) for row in batch]
+
+        self.assertEqual(fixed, [self.broken[0]])
+        amounts = self.amounts()
+        self.assertEqual(amounts[self.broken[0]], Decimal("22.40"))
+        self.assertEqual(amounts[self.broken[1]], Decimal("1.00"))   # вне queryset
+        self.assertEqual(amounts[self.manual.pk], Decimal("8.00"))    # без позиций
+        self.assertEqual(PurchaseRequest.objects.get(pk=self.broken[0]).version, versions[self.broken[0]] + 1)
+        self.assertEqual(PurchaseRequest.objects.get(pk=self.requests[0].pk).version, versions[self.requests[0].pk])
+
+        self.assertEqual(list(recalculate_amounts(queryset, dry_run=True)), [[]])
+
+
+class ItemTotalsTests(TestCase):
+    """
+    Суммы заявки равны SUM(items.total) после любых операций с позициями
+    """
+
+    def setUp(self):
+        self.first = PurchaseRequest.objects.create(ro_number="T-1", amount_without_vat=0, amount_with_vat=0)
+        self.second = PurchaseRequest.objects.create(
+            ro_number="T-2", amount_without_vat=0, amount_with_vat=0, vat_percent=Decimal("16.00"),
+        )
+        self.items = [
+            PurchaseItem.objects.create(request=self.first, name="A", quantity=2, price=Decimal("10.50")),
+            PurchaseItem.objects.create(request=self.first, name="B", quantity=1, price=Decimal("3.33")),
+            PurchaseItem.objects.create(request=self.second, name="C", quantity=3, price=Decimal("7.77")),
+        ]
+
+    def assertTotals(self):
+        sums = dict(
+            PurchaseItem.objects.order_by().values("request_id").annotate(sum=Sum("total"))
+            .values_list("request_id", "sum")
+        )
+        for pr in PurchaseRequest.objects.all():
+            without_vat = Decimal(sums.get(pr.pk) or 0).quantize(Decimal("0.01"))
+            with_vat = (without_vat * (100 + pr.vat_percent) / 100).quantize(Decimal("0.01"), ROUND_HALF_UP)
+            self.assertEqual((pr.amount_without_vat, pr.amount_with_vat), (without_vat, with_vat), pr.ro_number)
+
+    def test_save_and_delete(self):
+        self.assertTotals()
+        item = self.items[0]
+        item.price = Decimal("11.25")
+        item.save()
+        self.assertTotals()
+
+        item.quantity = 5
+        item.save(update_fields=["quantity"])
+        self.assertTotals()
+
+        item.request = self.second
+        item.save()
+        self.assertTotals()
+
+        self.items[1].delete()
+        self.assertTotals()
+
+    def test_queryset_update(self):
+        PurchaseItem.objects.filter(request=self.first).update(price=Decimal("4.10"))
+        self.assertTotals()
+        PurchaseItem.objects.update(quantity=F("quantity") + 1)
+        self.assertTotals()
+        PurchaseItem.objects.filter(pk=self.items[2].pk).update(request=self.first)
+        self.assertTotals()
+
+    def test_queryset_delete(self):
+        PurchaseItem.objects.filter(name__in=["A", "C"]).delete()
+        self.assertTotals()
+        PurchaseItem.objects.all().delete()
+        self.assertTotals()
+        self.assertEqual(PurchaseRequest.objects.get(pk=self.first.pk).amount_with_vat, 0)
+
+    def test_bulk_create_and_bulk_update(self):
+        created = PurchaseItem.objects.bulk_create([
+            PurchaseItem(request=self.first, name="D", quantity=4, price=Decimal("2.25")),
+            PurchaseItem(request=self.second, name="E", quantity=1, price=Decimal("99.99")),
+        ])
+        self.assertTotals()
+
+        created[0].price = Decimal("1.01")
+        created[1].quantity = 7
+        self.items[2].price = Decimal("0.50")
+        PurchaseItem.objects.bulk_update([*created, self.items[2]], ["price", "quantity"])
+        self.assertTotals()
+
+    def test_api_update_with_unsynced_item_operations(self):
+        # сериализатор сам считает суммы и вызывает операции с update_request_totals=False
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT))
+        url = f"/api/purchase-requests/{self.first.pk}/"
+        first, second = self.items[:2]
+
+        response = client.patch(url, {"items": [
+            {"id": first.pk, "price": "12.00"},
+            {"id": second.pk, "_delete": True},
+            {"name": "New", "quantity": 3, "price": "1.10"},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTotals()
+
+        response = client.put(url, {
+            "ro_number": "T-1",
+            "items": [{"name": "Only", "quantity": 1, "price": "5.55"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(PurchaseItem.objects.filter(request=self.first).count(), 1)
+        self.assertTotals()
+
+        response = client.patch(url, {"vat_percent": "5.00"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTotals()
+
+    @override_settings(ROOT_URLCONF="main.tests")
+    def test_admin_inline_and_vat_change(self):
+        user = User.objects.create_user("admin", password="pass", role=User.Role.ADMIN)
+        self.client.force_login(user)
+        first, second = self.items[:2]
+        pr = PurchaseRequest.objects.get(pk=self.first.pk)
+        pr.creator = user
+        pr.supplier = Supplier.objects.create(name="Supplier")
+        pr.customer = Customer.objects.create(name="Customer")
+        pr.save()
+
+        def post(items, **changes):
+            data = {
+                "ro_number": pr.ro_number, "status": pr.status, "creator": pr.creator_id,
+                "supplier": pr.supplier_id, "customer": pr.customer_id,
+                "amount_without_vat": pr.amount_without_vat, "amount_with_vat": pr.amount_with_vat,
+                "vat_percent": pr.vat_percent, **changes,
+                "items-TOTAL_FORMS": len(items), "items-INITIAL_FORMS": 2,
+                "items-MIN_NUM_FORMS": 0, "items-MAX_NUM_FORMS": 1000,
+                "documents-TOTAL_FORMS": 0, "documents-INITIAL_FORMS": 0,
+                "documents-MIN_NUM_FORMS": 0, "documents-MAX_NUM_FORMS": 1000,
+            }
+            for index, item in enumerate(items):
+                data.update({f"items-{index}-{name}": value for name, value in item.items()})
+                data[f"items-{index}-request"] = pr.pk
+            response = self.client.post(f"/admin/main/purchaserequest/{pr.pk}/change/", data)
+            self.assertEqual(response.status_code, 302, response.context and response.context["errors"])
+
+        # правка одной позиции, удаление другой и новая позиция
+        post([
+            {"id": first.pk, "name": "A", "quantity": 2, "price": "20.00"},
+            {"id": second.pk, "name": "B", "quantity": 1, "price": "3.33", "DELETE": "on"},
+            {"name": "New", "quantity": 6, "price": "0.99"},
+        ])
+        self.assertTotals()
+
+        # в форме остались суммы со старой ставкой — save_related выравнивает их по позициям
+        pr.refresh_from_db()
+        new = PurchaseItem.objects.get(request=pr, name="New")
+        post([
+            {"id": first.pk, "name": "A", "quantity": 2, "price": "20.00"},
+            {"id": new.pk, "name": "New", "quantity": 6, "price": "0.99"},
+        ], vat_percent="20.00")
+        self.assertEqual(PurchaseRequest.objects.get(pk=pr.pk).vat_percent, Decimal("20.00"))
+        self.assertTotals()
+
+
+class SeedErpTests(TestCase):
+    """
+    seed_erp в малом масштабе: данные согласованы так же, как после save()
+    """
+
+    def seed(self, **options):
+        options = {
+            "requests": 30, "items_per_request": "1-4", "documents_per_request": "0-2",
+            "suppliers": 5, "customers": 3, "users": 6, "seed": 1, "end_date": date(2026, 1, 1), **options,
+        }
+        call_command("seed_erp", stdout=io.StringIO(), **options)
+
+    def test_small_dataset_is_consistent(self):
+        self.seed()
+
+        self.assertEqual(PurchaseRequest.objects.count(), 30)
+        self.assertEqual(Supplier.objects.count(), 5)
+        self.assertEqual(Customer.objects.count(), 3)
+        self.assertEqual(User.objects.count(), 6)
+        items = PurchaseItem.objects.values("request").annotate(count=Count("id"))
+        self.assertEqual(len(items), 30)
+        self.assertTrue(all(1 <= row["count"] <= 4 for row in items))
+        for quantity, price, total in PurchaseItem.objects.values_list("quantity", "price", "total"):
+            self.assertEqual(quantity * price, total)
+
+        # суммы заявок, сводка и счётчики — как их посчитали бы save() и сигналы
+        self.assertEqual(list(recalculate_amounts(dry_run=True)), [[]])
+        totals = PurchaseRequest.objects.aggregate(with_vat=Sum("amount_with_vat"), count=Count("id"))
+        self.assertEqual(SpendSummary.objects.aggregate(with_vat=Sum("total_with_vat"), count=Sum("request_count")),
+                         totals)
+        for user in User.objects.all():
+            self.assertEqual(
+                {status: count for status, count in RequestCounter.objects.for_creator(user).items() if count},
+                dict(PurchaseRequest.objects.filter(creator=user).order_by().values_list("status")
+                     .annotate(count=Count("id"))),
+            )
+
+        # новые объекты через ORM получают id после сгенерированных
+        supplier = Supplier.objects.create(name="After seed")
+        self.assertGreater(supplier.pk, max(Supplier.objects.exclude(pk=supplier.pk).values_list("pk", flat=True)))
+
+    def test_same_seed_gives_same_rows(self):
+        fields = (
+            "ro_number", "status", "amount_without_vat", "amount_with_vat", "created_at",
+            "supplier__name", "customer__name", "creator__email", "creator__password",
+        )
+        self.seed(requests=10)
+        first = list(PurchaseRequest.objects.order_by("ro_number").values_list(*fields))
+        for model in (PurchaseRequest, Supplier, Customer, User):
+            model.objects.all().delete()
+
+        self.seed(requests=10)
+        self.assertEqual(list(PurchaseRequest.objects.order_by("ro_number").values_list(*fields)), first)
+
+    def test_bad_range_is_rejected(self):
+        with self.assertRaises(CommandError):
+            self.seed(items_per_request="5-1")
+
+
+class RequestCounterTests(TestCase):
+    WAITING, PAID, CANCELLED = PurchaseRequest.Status
+
+    def setUp(self):
+        self.user = User.objects.create_user("employee", password="pass", role=User.Role.EMPLOYEE)
+
+    def create(self, ro_number, creator=None, status=PurchaseRequest.Status.WAITING):
+        return PurchaseRequest.objects.create(
+            ro_number=ro_number, creator=creator or self.user, status=status,
+            amount_without_vat=100, amount_with_vat=112,
+        )
+
+    def counts(self, user=None):
+        return {status: count for status, count in RequestCounter.objects.for_creator(user or self.user).items() if count}
+
+    def test_counters_follow_requests(self):
+        first = self.create("C-1")
+        self.create("C-2")
+        self.create("C-3", status=self.PAID)
+        PurchaseRequest.objects.bulk_create(
+            PurchaseRequest(ro_number=f"C-B{i}", creator=self.user, amount_without_vat=0, amount_with_vat=0)
+            for i in range(3)
+        )
+        self.assertEqual(self.counts(), {self.WAITING: 5, self.PAID: 1})
+
+        first.status = self.CANCELLED
+        first.save()
+        PurchaseRequest.objects.filter(ro_number__startswith="C-B").update(status=self.PAID)
+        self.assertEqual(self.counts(), {self.WAITING: 1, self.PAID: 4, self.CANCELLED: 1})
+
+        first.delete()
+        PurchaseRequest.objects.filter(ro_number="C-3").delete()
+        self.assertEqual(self.counts(), {self.WAITING: 1, self.PAID: 3})
+        self.assertEqual(RequestCounter.objects.reconcile(dry_run=True), [])
+
+        # удалённый создатель: заявки остаются (SET_NULL), счётчики — на «без создателя»
+        self.user.delete()
+        self.assertEqual(RequestCounter.objects.totals(), {self.WAITING: 1, self.PAID: 3})
+        self.assertEqual(set(RequestCounter.objects.values_list("creator_key", flat=True)), {0})
+        self.assertEqual(RequestCounter.objects.reconcile(dry_run=True), [])
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.create("C-1")
+        self.create("C-2", status=self.PAID)
+        # расхождение: счётчик правили в обход заявок, строку PAID потеряли
+        RequestCounter.objects.filter(creator_key=self.user.pk, status=self.WAITING).update(count=7)
+        RequestCounter.objects.filter(creator_key=self.user.pk, status=self.PAID).delete()
+
+        drift = RequestCounter.objects.reconcile(dry_run=True)
+        self.assertEqual(drift, sorted([(self.user.pk, self.WAITING, 7, 1), (self.user.pk, self.PAID, None, 1)]))
+        self.assertEqual(self.counts(), {self.WAITING: 7})  # dry_run ничего не пишет
+
+        self.assertEqual(RequestCounter.objects.reconcile(), drift)
+        self.assertEqual(self.counts(), {self.WAITING: 1, self.PAID: 1})
+        self.assertEqual(RequestCounter.objects.reconcile(dry_run=True), [])
+
+
+def cache_settings(backend, **options):
+    return {alias: {"BACKEND": backend, "KEY_PREFIX": alias, **options} for alias in ("default", "auth", "fragments")}
+
+
+class DirectoryCacheTests(TestCase):
+
+    def setUp(self):
+        Supplier.objects.create(name="Supplier")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("employee", password="pass"))
+
+    def test_version_is_bumped_after_commit(self):
+        version, _ = supplier_directory.get_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Supplier.objects.create(name="New")
+            # до COMMIT читатели видят старую версию вместе со старыми данными
+            self.assertEqual(supplier_directory.get_version()[0], version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(supplier_directory.get_version()[0], version)
+
+    def test_dummy_cache_builds_etag(self):
+        with override_settings(CACHES=cache_settings("django.core.cache.backends.dummy.DummyCache")):
+            response = self.client.get("/api/suppliers/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('"supplier-'))
+        self.assertEqual(response.json()[0]["name"], "Supplier")
+
+    def test_shared_backend_keeps_version_without_ttl(self):
+        self.assertEqual(supplier_directory.version_timeout(), VERSION_TIMEOUT)  # LocMemCache процесса
+
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES=cache_settings("django.core.cache.backends.filebased.FileBasedCache", LOCATION=location)
+        ):
+            self.assertIsNone(supplier_directory.version_timeout())
+            first = self.client.get("/api/suppliers/")
+            second = self.client.get("/api/suppliers/", HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(second.status_code, 304)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Supplier.objects.create(name="Another")
+            third = self.client.get("/api/suppliers/", HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(third.status_code, 200)
+            self.assertNotEqual(third["ETag"], first["ETag"])
+
+
+class DocumentApiTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="pass", role=User.Role.EMPLOYEE)
+        self.request = PurchaseRequest.objects.create(
+            ro_number="DOC-1", creator=self.owner, amount_without_vat=0, amount_with_vat=0,
+        )
+        self.client = APIClient()
+
+    def start_upload(self, user):
+        self.client.force_authenticate(user)
+        return self.client.post("/api/document-uploads/", {
+            "request": self.request.pk, "filename": "invoice.pdf", "size": 10,
+        }, format="json")
+
+    def test_only_creator_or_accountant_can_attach(self):
+        other = User.objects.create_user("other", password="pass", role=User.Role.EMPLOYEE)
+        response = self.start_upload(other)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("request", response.json())
+
+        self.assertEqual(self.start_upload(self.owner).status_code, 201)
+        accountant = User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT)
+        self.assertEqual(self.start_upload(accountant).status_code, 201)
+
+    def test_documents_are_visible_to_creator_and_accountant(self):
+        other = User.objects.create_user("other", password="pass", role=User.Role.EMPLOYEE)
+        other_request = PurchaseRequest.objects.create(
+            ro_number="DOC-2", creator=other, amount_without_vat=0, amount_with_vat=0,
+        )
+        documents = []
+        for index, pr in enumerate([self.request, other_request]):
+            blob = DocumentBlob.objects.create(
+                checksum=str(index) * 64, file=f"doc{index}.pdf", size=1, text="Договор поставки",
+            )
+            documents.append(RequestDocument.objects.create(request=pr, file=blob.file, blob=blob))
+        own, foreign = documents
+
+        def visible(user):
+            self.client.force_authenticate(user)
+            listed = {row["id"] for row in self.client.get("/api/documents/").json()["results"]}
+            found = {row["id"] for row in self.client.get("/api/documents/search/", {"q": "поставки"}).json()}
+            return listed, found
+
+        self.assertEqual(visible(self.owner), ({own.pk}, {own.pk}))
+        self.assertEqual(visible(other), ({foreign.pk}, {foreign.pk}))
+        self.assertEqual(self.client.get(f"/api/documents/{own.pk}/").status_code, 404)
+        self.assertEqual(self.client.get(f"/api/documents/{own.pk}/preview/").status_code, 404)
+
+        accountant = User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT)
+        self.assertEqual(visible(accountant), ({own.pk, foreign.pk}, {own.pk, foreign.pk}))
+
+    def test_evicted_preview_is_regenerated(self):
+        blob = DocumentBlob.objects.create(checksum="0" * 64, file="doc.pdf", size=1, has_preview=True)
+        DocumentJob.objects.filter(blob=blob).update(status=DocumentJob.Status.DONE)
+        document = RequestDocument.objects.create(request=self.request, file="doc.pdf", blob=blob)
+        self.client.force_authenticate(self.owner)
+
+        # файл удалён вытеснением уже после preview_cache.get()
+        with mock.patch.object(preview_cache, "get", return_value="/nonexistent/preview.png"):
+            response = self.client.get(f"/api/documents/{document.pk}/preview/")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(DocumentJob.objects.get(blob=blob).status, DocumentJob.Status.PENDING)
+
+
+class TaskQueueTests(TestCase):
+
+    def test_tasks_are_inserted_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            notify_status_changes([(1, "WAITING", "PAID"), (2, "WAITING", "CANCELLED"), (3, "PAID", "PAID")])
+            try:
+                with transaction.atomic():
+                    notify_status_changes([(4, "WAITING", "PAID")])
+                    raise RuntimeError
+            except RuntimeError:
+                pass  # откат точки сохранения — её задачи не вставляются
+            self.assertEqual(Task.objects.count(), 0)
+
+        self.assertEqual(len(callbacks), 1)  # одна пачка — один bulk_create
+        self.assertEqual(sorted(task.payload["request"] for task in Task.objects.all()), [1, 2])
+
+    def test_failed_task_uses_stored_max_attempts(self):
+        def failing(**payload):
+            raise RuntimeError("boom")
+
+        name = "tests.failing"
+        taskqueue.task(name, max_attempts=5)(failing)
+        self.addCleanup(taskqueue.registry.pop, name)
+        enqueue(name, durable=True)
+        Task.objects.update(max_attempts=1)
+
+        taskqueue.run_batch("worker", 10)
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.Status.FAILED)
+        self.assertEqual(task.last_error, "boom")
+
+
+@override_settings(ROOT_URLCONF="main.tests")
+class AsyncViewsTests(TestCase):
+    """
+    ASGI-профиль (main.async_views): те же права и те же ответы, что у синхронных вью
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.accountant = User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT)
+        cls.employee = User.objects.create_user("employee", password="pass", role=User.Role.EMPLOYEE)
+        supplier = Supplier.objects.create(name="Kaspi Supply", bin_iin="123456789012")
+        customer = Customer.objects.create(name="IT")
+        for i, status in enumerate(["WAITING", "PAID", "CANCELLED", "WAITING"]):
+            PurchaseRequest.objects.create(
+                ro_number=f"AS-{i}", creator=cls.employee, supplier=supplier, customer=customer, status=status,
+                amount_without_vat=100, amount_with_vat=112,
+            )
+
+    def both(self, url, user=None, **extra):
+        """
+        (синхронный ответ, async-ответ) на один и тот же запрос
+        """
+        if user is not None:
+            self.client.force_login(user)
+        sync_response = self.client.get(url, **extra)
+
+        async def request():
+            if user is not None:
+                await self.async_client.aforce_login(user)
+            return await self.async_client.get(f"/async{url}", **extra)
+
+        return sync_response, async_to_sync(request)()
+
+    def assertSameHtml(self, url, user, **extra):
+        sync_response, async_response = self.both(url, user, **extra)
+        self.assertEqual(sync_response.status_code, 200)
+        self.assertEqual(async_response.status_code, 200)
+
+        def html(response):
+            # CSRF-токен в формах свой у каждого запроса
+            return re.sub(r'name="csrfmiddlewaretoken" value="[^"]*"', "", response.content.decode())
+
+        self.assertIn("AS-0", html(sync_response))
+        self.assertEqual(html(async_response), html(sync_response))
+
+    def test_anonymous_is_redirected_to_login(self):
+        for url in ("/requests/", "/my-requests/"):
+            sync_response, async_response = self.both(url)
+            self.assertEqual(async_response.status_code, 302)
+            self.assertEqual(sync_response.status_code, 302)
+            self.assertEqual(async_response.url.split("?")[0], sync_response.url.split("?")[0])
+
+    def test_requests_list_is_for_admin_and_accountant(self):
+        sync_response, async_response = self.both("/requests/", self.employee)
+        self.assertEqual((sync_response.status_code, async_response.status_code), (403, 403))
+
+    def test_request_lists_match_sync_views(self):
+        self.assertSameHtml("/requests/", self.accountant)
+        self.assertSameHtml("/requests/", self.accountant, data={"status": "WAITING"})
+        self.assertSameHtml("/my-requests/", self.employee)
+
+        sync_response, async_response = self.both("/requests/", self.accountant, data={"cursor": "garbage"})
+        self.assertEqual((sync_response.status_code, async_response.status_code), (404, 404))
+
+    def test_directories_match_sync_views(self):
+        for url in ("/api/suppliers/", "/api/customers/"):
+            sync_response, async_response = self.both(url)
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(async_response.json(), sync_response.json())
+            self.assertEqual(async_response["ETag"], sync_response["ETag"])
+
+            sync_response, async_response = self.both(url, headers={"If-None-Match": sync_response["ETag"]})
+            self.assertEqual((sync_response.status_code, async_response.status_code), (304, 304))
+
+        sync_response, async_response = self.both("/api/suppliers/search/", data={"q": "kaspi"})
+        self.assertEqual(async_response.json(), sync_response.json())
+        self.assertEqual(len(async_response.json()), 1)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("accountant", password="pass", role=User.Role.ACCOUNTANT)
+        PurchaseRequest.objects.bulk_create(
+            PurchaseRequest(ro_number=f"KP-{i}", amount_without_vat=0, amount_with_vat=0) for i in range(7)
+        )
+        self.ordering = ("-created_at", "id")
+
+    def test_next_and_previous_round_trip(self):
+        queryset = PurchaseRequest.objects.all()
+        expected = list(queryset.order_by(*self.ordering).values_list("pk", flat=True))
+
+        pages, cursor = [], None
+        while True:
+            page = paginate_keyset(queryset, self.ordering, cursor=cursor, page_size=3)
+            pages.append(page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual([pr.pk for page in pages for pr in page], expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        # назад с последней страницы — те же страницы в обратном порядке
+        previous = paginate_keyset(queryset, self.ordering, cursor=pages[-1].previous_cursor, page_size=3)
+        self.assertEqual([pr.pk for pr in previous], [pr.pk for pr in pages[1]])
+        previous = paginate_keyset(queryset, self.ordering, cursor=previous.previous_cursor, page_size=3)
+        self.assertEqual([pr.pk for pr in previous], [pr.pk for pr in pages[0]])
+        self.assertFalse(previous.has_previous)
+
+    def test_api_pages_follow_links(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(KeysetPagination, "page_size", 3):
+            first = client.get("/api/purchase-requests/").json()
+            second = client.get(first["next"]).json()
+            back = client.get(second["previous"]).json()
+        self.assertEqual(len(second["results"]), 3)
+        self.assertEqual([row["id"] for row in back["results"]], [row["id"] for row in first["results"]])
+
+    def tampered(self):
+        raw = [
+            {"k": ["abc", 1]},
+            {"k": ["2026-01-01T00:00:00+00:00", "abc"]},
+            {"k": [[1], 1]},
+            {"k": [{"a": 1}, 1]},
+            {"k": [None, 1]},
+            {"k": "abc"},
+            [1, 2],
+        ]
+        cursors = [base64.urlsafe_b64encode(json.dumps(value).encode()).decode() for value in raw]
+        return cursors + ["not-base64!", encode_cursor([1])]
+
+    def test_tampered_cursor_is_404(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for cursor in self.tampered():
+            with self.subTest(cursor=cursor):
+                self.assertEqual(client.get("/api/purchase-requests/", {"cursor": cursor}).status_code, 404)
+
+        self.client.force_login(self.user)
+        for value in ([1, "abc", 1], ["abc", "2026-01-01T00:00:00+00:00", 1], [1, [], 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({"k": value}).encode()).decode()
+            with self.subTest(cursor=value):
+                self.assertEqual(self.client.get("/requests/", {"cursor": cursor}).status_code, 404)
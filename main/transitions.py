@@ -0,0 +1,138 @@
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PurchaseRequest
+from .tasks import notify_status_changes
+
+
+# --------------------
+# BULK STATUS TRANSITIONS
+# --------------------
+# Смена статуса пачки заявок одним условным UPDATE:
+#
+#     UPDATE ... SET status, manager, version = version + 1
+#     WHERE id IN (...) AND status IN (allowed) AND ((id = 1 AND version = 3) OR ...)
+#
+# Клиент присылает версию (или updated_at), которую видел; если заявку успели
+# изменить — результат CONFLICT, и чужое решение не перезаписывается молча.
+# Через этот путь идут API, админ-экшены и change_request_status.
+
+# целевой статус -> из каких статусов в него можно перейти
+ALLOWED_TRANSITIONS = {
+    PurchaseRequest.Status.PAID: (PurchaseRequest.Status.WAITING,),
+    PurchaseRequest.Status.CANCELLED: (PurchaseRequest.Status.WAITING, PurchaseRequest.Status.PAID),
+}
+
+# ограничение глубины выражения WHERE (SQLite: 1000) — OR по версиям на каждый id
+MAX_TRANSITION_BATCH = 500
+
+APPLIED = 'applied'
+CONFLICT = 'conflict'
+NOT_ALLOWED = 'not_allowed'
+NOT_FOUND = 'not_found'
+
+
+@dataclass(frozen=True)
+class Expected:
+    """
+    Что клиент знает о заявке; None в обоих полях — без проверки (админка)
+    """
+    version: int = None
+    updated_at: object = None
+
+    def matches(self, version, updated_at):
+        if self.version is not None and self.version != version:
+            return False
+        if self.updated_at is not None and self.updated_at != updated_at:
+            return False
+        return True
+
+    def lookup(self):
+        lookup = {}
+        if self.version is not None:
+            lookup['version'] = self.version
+        if self.updated_at is not None:
+            lookup['updated_at'] = self.updated_at
+        return lookup
+
+
+@dataclass(frozen=True)
+class TransitionResult:
+    id: int
+    result: str
+    status: str = None
+    version: int = None
+
+
+def transition_requests(expected, status, user=None, using=None):
+    """
+    expected — {pk: Expected}. Возвращает [TransitionResult] в порядке expected.
+    Запросов к БД — константа, независимо от числа заявок
+    """
+    allowed = ALLOWED_TRANSITIONS.get(status)
+    if allowed is None:
+        raise ValueError(f"Transition to {status!r} is not allowed")
+    if len(expected) > MAX_TRANSITION_BATCH:
+        raise ValueError(f"At most {MAX_TRANSITION_BATCH} requests per transition")
+
+    using = using or router.db_for_write(PurchaseRequest)
+    queryset = PurchaseRequest.objects.using(using)
+    manager = user if user is not None and user.is_authenticated else None
+
+    with transaction.atomic(using=using):
+        # блокировка строк: между проверкой и UPDATE их никто не изменит
+        current = {
+            pk: (old_status, version, updated_at)
+            for pk, old_status, version, updated_at in queryset.select_for_update()
+            .filter(pk__in=list(expected))
+            .values_list('pk', 'status', 'version', 'updated_at')
+        }
+
+        results = {}
+        matched = []
+        for pk, known in expected.items():
+            if pk not in current:
+                results[pk] = TransitionResult(pk, NOT_FOUND)
+                continue
+            old_status, version, updated_at = current[pk]
+            if not known.matches(version, updated_at):
+                results[pk] = TransitionResult(pk, CONFLICT, old_status, version)
+            elif old_status not in allowed:
+                results[pk] = TransitionResult(pk, NOT_ALLOWED, old_status, version)
+            else:
+                matched.append(pk)
+
+        if matched:
+            queryset.filter(pk__in=matched, status__in=allowed).filter(
+                _version_condition({pk: expected[pk] for pk in matched})
+            ).update(status=status, manager=manager, updated_at=timezone.now())
+
+            # версия после UPDATE: +1 — строка обновлена этим запросом
+            versions = dict(queryset.filter(pk__in=matched).values_list('pk', 'version'))
+            changes = []
+            for pk in matched:
+                old_status, version, updated_at = current[pk]
+                new_version = versions.get(pk)
+                if new_version == version + 1:
+                    results[pk] = TransitionResult(pk, APPLIED, status, new_version)
+                    changes.append((pk, old_status, status))
+                else:
+                    results[pk] = TransitionResult(pk, CONFLICT, old_status, new_version)
+
+            # журнал/уведомления — в очереди задач, после COMMIT
+            notify_status_changes(changes, user)
+
+    return [results[pk] for pk in expected]
+
+
+def _version_condition(expected):
+    unchecked = [pk for pk, known in expected.items() if not known.lookup()]
+    conditions = [Q(pk=pk, **known.lookup()) for pk, known in expected.items() if known.lookup()]
+    if unchecked:
+        conditions.append(Q(pk__in=unchecked))
+    return reduce(or_, conditions)
@@ -1,4 +1,5 @@
 from rest_framework.routers import DefaultRouter
+from django.conf import settings
 from django.urls import path, include
 from .views import PurchaseRequestViewSet
 from . import views
@@ -7,6 +8,9 @@ router = DefaultRouter()
 router.register(r'purchase-requests', PurchaseRequestViewSet, basename='purchase-request')
 router.register(r'suppliers', views.SupplierViewSet, basename='supplier')
 router.register(r'customers', views.CustomerViewSet, basename='customer')
+router.register(r'reports/spend', views.SpendReportViewSet, basename='spend-report')
+router.register(r'document-uploads', views.DocumentUploadViewSet, basename='document-upload')
+router.register(r'documents', views.RequestDocumentViewSet, basename='document')
 
 urlpatterns = [
     path("", views.home, name="home"),
@@ -15,8 +19,23 @@ urlpatterns = [
 
     path('request/item/', views.purchase_request, name='request_item'),
     path("requests/", views.requests_list_view, name="requests_list"),
+    path("requests/export/", views.export_requests_view, name="export_requests"),
     path("requests/<int:pk>/status/<str:status>/", views.change_request_status, name="change_request_status"),
     path("my-requests/", views.my_requests_view, name="my_requests"),
 
     path("create/supplier/", views.CreateSupplierViewSet.as_view({'post': 'create'}), name="create_supplier"),
-]
\ No newline at end of file
+]
+
+# ASGI-профиль (DJANGO_ASYNC=1): read-вью на async ORM вместо синхронных
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    urlpatterns = [
+        path('api/suppliers/', async_views.supplier_list_view(
+            views.SupplierViewSet.as_view({'get': 'list'})), name='supplier-list'),
+        path('api/suppliers/search/', async_views.supplier_search_view, name='supplier-search'),
+        path('api/customers/', async_views.customer_list_view(
+            views.CustomerViewSet.as_view({'get': 'list'})), name='customer-list'),
+        path("requests/", async_views.requests_list_view, name="requests_list"),
+        path("my-requests/", async_views.my_requests_view, name="my_requests"),
+    ] + urlpatterns
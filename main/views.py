@@ -1,12 +1,35 @@
-from django.shortcuts import render, get_object_or_404, redirect
-from rest_framework import viewsets
+from django.shortcuts import render, redirect
+from rest_framework import mixins, viewsets, status as http_status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .models import PurchaseRequest, Customer, Supplier
-from .serializers import PurchaseRequestSerializer, CustomerSerializer, SupplierSerializer
+from .models import (
+    PurchaseRequest, Customer, Supplier, SpendSummary, DocumentUpload, DocumentJob, RequestDocument, RequestCounter,
+)
+from .serializers import (
+    PurchaseRequestSerializer, CustomerSerializer, SupplierSerializer, SpendReportSerializer,
+    DocumentUploadSerializer, RequestDocumentSerializer, DocumentSearchSerializer,
+    RequestTransitionSerializer, TransitionResultSerializer,
+)
 from .permissions import IsEmployeeOrReadOnly, IsManagerOrAccountant
+from .pagination import InvalidCursor, KeysetPagination, paginate_keyset
+from .cache import CachedDirectoryMixin, customer_directory, supplier_directory
+from .search import MAX_SEARCH_LIMIT, SEARCH_LIMIT, search_documents, search_suppliers
+from .previews import preview_cache
+from .transitions import ALLOWED_TRANSITIONS, CONFLICT, NOT_ALLOWED, NOT_FOUND, Expected, transition_requests
+from .documents import IncompleteUpload, complete_upload, discard_temp_file, write_chunk
+from .exports import EXPORT_FORMATS, filter_export_queryset, stream_export
+from .row_serializers import NotCompilable, row_serializer
+from osc_erp.db_router import ReplicaReadMixin, read_alias, read_from_replica
 from user.decorators import admin_or_accountant_required
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Case, When, IntegerField
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Sum
+import datetime
+import io
 
 
 @login_required(login_url="/accounts/login/")
@@ -14,15 +37,40 @@ def home(request):
     return redirect("/user/profile/")
 
 
-class PurchaseRequestViewSet(viewsets.ModelViewSet):
+class PurchaseRequestViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = PurchaseRequest.objects.all().order_by('-created_at')
     serializer_class = PurchaseRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', 'id')
+
+    def get_queryset(self):
+        # select_related/prefetch по связям сериализатора — без N+1 на странице
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        """
+        Страница строится из .values() без сериализатора на строку (main.row_serializers);
+        вывод тот же, что у PurchaseRequestSerializer
+        """
+        if not settings.API_ROW_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer()
+        try:
+            rows = row_serializer(type(serializer), serializer.get_expand())
+        except NotCompilable:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        values = rows.values(queryset, *(field.lstrip('-') for field in self.keyset_ordering))
+        page = self.paginate_queryset(values)
+        data = rows.serialize(values if page is None else page, self.get_serializer_context(), using=queryset.db)
+        return Response(data) if page is None else self.get_paginated_response(data)
 
     def get_permissions(self):
-        if self.action in ['create']:
+        if self.action in ['create', 'bulk']:
             self.permission_classes = [IsAuthenticated, IsEmployeeOrReadOnly]
-        elif self.action in ['update', 'partial_update', 'destroy']:
+        elif self.action in ['update', 'partial_update', 'destroy', 'transition']:
             self.permission_classes = [IsAuthenticated, IsManagerOrAccountant]
         else:
             self.permission_classes = [IsAuthenticated]
@@ -31,58 +79,237 @@ class PurchaseRequestViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
-@login_required
-@admin_or_accountant_required
-def requests_list_view(request):
-    # статусы, которые доступны для фильтрации
-    filter_values = [
-        PurchaseRequest.Status.WAITING,
-        PurchaseRequest.Status.PAID,
-        PurchaseRequest.Status.CANCELLED,
-    ]
-
-    # базовый queryset с сортировкой (оставляем аннотацию сортировки)
-    requests_qs = PurchaseRequest.objects.annotate(
-        sort_order=Case(
-            When(status=PurchaseRequest.Status.WAITING, then=1),
-            When(status=PurchaseRequest.Status.PAID, then=3),
-            When(status=PurchaseRequest.Status.CANCELLED, then=5),
-            default=99,
-            output_field=IntegerField()
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        POST /api/purchase-requests/bulk/ — список заявок за один вызов
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=http_status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        POST /api/purchase-requests/transition/
+        {"status": "PAID", "requests": [{"id": 1, "version": 3}, {"id": 2, "updated_at": "..."}]}
+        — одним UPDATE; по каждой заявке applied / conflict / not_allowed / not_found
+        """
+        serializer = RequestTransitionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        expected = {
+            item['id']: Expected(version=item.get('version'), updated_at=item.get('updated_at'))
+            for item in serializer.validated_data['requests']
+        }
+        results = transition_requests(expected, serializer.validated_data['status'], request.user)
+        return Response({"results": TransitionResultSerializer(results, many=True).data})
+
+
+class DocumentUploadViewSet(mixins.CreateModelMixin,
+                            mixins.RetrieveModelMixin,
+                            mixins.DestroyModelMixin,
+                            viewsets.GenericViewSet):
+    """
+    Chunked/resumable загрузка документов заявки:
+    POST   /api/document-uploads/ {request, type, filename, size} — сессия, chunk_size/chunk_count
+    PUT    /api/document-uploads/<id>/chunks/<index>/ — сырые байты куска (X-Chunk-SHA256 — проверка)
+    GET    /api/document-uploads/<id>/ — missing_chunks для докачки
+    POST   /api/document-uploads/<id>/complete/ — RequestDocument (дубликат ссылается на уже сохранённый blob)
+    DELETE /api/document-uploads/<id>/ — отменить загрузку
+    """
+
+    serializer_class = DocumentUploadSerializer
+    permission_classes = [IsAuthenticated, IsEmployeeOrReadOnly]
+
+    def get_queryset(self):
+        return DocumentUpload.objects.filter(uploaded_by=self.request.user).select_related('document')
+
+    def perform_create(self, serializer):
+        serializer.save(uploaded_by=self.request.user)
+
+    def perform_destroy(self, instance):
+        discard_temp_file(instance)
+        instance.delete()
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        upload = self.get_object()
+        if upload.document_id:
+            return Response({"detail": "Upload is already completed."}, status=http_status.HTTP_409_CONFLICT)
+
+        # тело читается потоком, без буферизации всего куска в памяти
+        checksum = write_chunk(upload, int(index), request.stream or io.BytesIO(), request.headers.get('X-Chunk-SHA256'))
+        return Response({"index": int(index), "checksum": checksum})
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        try:
+            document = complete_upload(self.get_object())
+        except IncompleteUpload as exc:
+            return Response({"detail": "Upload is incomplete.", "missing_chunks": exc.missing},
+                            status=http_status.HTTP_409_CONFLICT)
+        return Response(RequestDocumentSerializer(document, context=self.get_serializer_context()).data,
+                        status=http_status.HTTP_201_CREATED)
+
+
+class RequestDocumentViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    GET /api/documents/search/?q=... — поиск по извлечённому тексту документов
+    GET /api/documents/<id>/preview/ — превью первой страницы (PNG)
+    """
+
+    queryset = RequestDocument.objects.select_related('blob').order_by('-uploaded_at')
+    serializer_class = DocumentSearchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # как и при загрузке (DocumentUploadSerializer): свои заявки, бухгалтер и админ — все
+        queryset = super().get_queryset()
+        if IsManagerOrAccountant().has_permission(self.request, self):
+            return queryset
+        return queryset.filter(request__creator=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+        except ValueError:
+            limit = SEARCH_LIMIT
+
+        documents = search_documents(
+            request.query_params.get('q', ''), limit=max(limit, 1), documents=self.get_queryset(),
         )
-    ).order_by("sort_order", "-created_at")
+        return Response(self.get_serializer(documents, many=True).data)
+
+    @action(detail=True, methods=['get'])
+    def preview(self, request, pk=None):
+        blob = self.get_object().blob
+        if blob is None or not blob.has_preview:
+            raise Http404
+
+        path = preview_cache.get(blob.checksum)
+        try:
+            preview = open(path, 'rb') if path is not None else None
+        except FileNotFoundError:
+            preview = None  # вытеснено между get() и open()
+        if preview is None:
+            # вытеснено из кеша — строится заново в process_documents
+            DocumentJob.objects.filter(blob=blob, status=DocumentJob.Status.DONE).update(
+                status=DocumentJob.Status.PENDING, run_after=timezone.now(),
+            )
+            return Response({"detail": "Preview is being regenerated."}, status=http_status.HTTP_202_ACCEPTED)
+
+        response = FileResponse(preview, content_type='image/png')
+        response['Cache-Control'] = 'private, max-age=86400'
+        return response
+
+
+REQUESTS_PAGE_SIZE = 50
+REQUESTS_LIST_ORDERING = ("status_rank", "-created_at", "id")
+
+# статусы, которые доступны для фильтрации
+REQUESTS_FILTER_STATUSES = [
+    PurchaseRequest.Status.WAITING,
+    PurchaseRequest.Status.PAID,
+    PurchaseRequest.Status.CANCELLED,
+]
+
+
+def requests_list_queryset(selected_status):
+    # базовый queryset; порядок статусов хранится в индексируемом status_rank
+    requests_qs = (
+        PurchaseRequest.objects
+        .select_related("creator", "supplier", "customer")
+        .prefetch_related("items")
+    )
 
     # применить фильтр по GET-параметру ?status=...
-    selected_status = request.GET.get("status", "")
-    if selected_status in filter_values:
+    if selected_status in REQUESTS_FILTER_STATUSES:
         requests_qs = requests_qs.filter(status=selected_status)
 
+    return requests_qs
+
+
+def requests_list_context(page, selected_status):
     # передать в шаблон варианты фильтра (значение, метка)
-    # используем только те варианты, которые входят в filter_values
-    status_choices = [c for c in PurchaseRequest.Status.choices if c[0] in filter_values]
+    # используем только те варианты, которые входят в REQUESTS_FILTER_STATUSES
+    status_choices = [c for c in PurchaseRequest.Status.choices if c[0] in REQUESTS_FILTER_STATUSES]
 
-    return render(request, "request/requests_list.html", {
-        "requests": requests_qs,
+    return {
+        "requests": page,
+        "page": page,
         "statuses": status_choices,
         "selected_status": selected_status,
-    })
+    }
 
 
+@login_required
 @admin_or_accountant_required
-def change_request_status(request, pk, status):
-    pr = get_object_or_404(PurchaseRequest, pk=pk)
+@read_from_replica
+def requests_list_view(request):
+    selected_status = request.GET.get("status", "")
+    requests_qs = requests_list_queryset(selected_status)
 
-    allowed_statuses = [
-        PurchaseRequest.Status.PAID,
-        PurchaseRequest.Status.CANCELLED,
-    ]
+    # keyset-пагинация вместо рендера всей таблицы (?cursor=...)
+    try:
+        page = paginate_keyset(
+            requests_qs,
+            REQUESTS_LIST_ORDERING,
+            cursor=request.GET.get("cursor"),
+            page_size=REQUESTS_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        raise Http404
 
-    if status not in allowed_statuses:
+    return render(request, "request/requests_list.html", requests_list_context(page, selected_status))
+
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+@login_required
+@admin_or_accountant_required
+@read_from_replica
+def export_requests_view(request):
+    # ?format=csv|xlsx&status=...&date_from=YYYY-MM-DD&date_to=...&supplier=<id>&customer=<id>
+    fmt = request.GET.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        fmt = "csv"
+
+    # строки читаются уже после выхода из вью, при отдаче ответа — БД выбирается сейчас
+    queryset = filter_export_queryset(request.GET).using(read_alias())
+    filename = f"requests_{timezone.localdate():%Y%m%d}.{fmt}"
+
+    response = StreamingHttpResponse(
+        stream_export(queryset, fmt),
+        content_type=EXPORT_CONTENT_TYPES[fmt],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@admin_or_accountant_required
+def change_request_status(request, pk, status):
+    if status not in ALLOWED_TRANSITIONS:
         return redirect("requests_list")
 
-    pr.status = status
-    pr.manager = request.user
-    pr.save()
+    # без загрузки строки и save() — тот же условный UPDATE, что и у API
+    [result] = transition_requests({pk: Expected()}, status, request.user)
+    if result.result == NOT_FOUND:
+        raise Http404
+    # раньше save() перезаписывал любой статус; теперь переходы — по ALLOWED_TRANSITIONS
+    if result.result == NOT_ALLOWED:
+        messages.error(
+            request,
+            f"Заявку в статусе «{PurchaseRequest.Status(result.status).label}» "
+            f"нельзя перевести в «{PurchaseRequest.Status(status).label}»",
+        )
+    elif result.result == CONFLICT:
+        messages.error(request, "Заявку только что изменили, обновите страницу и повторите")
 
     return redirect("requests_list")
 
@@ -93,17 +320,102 @@ class CreateSupplierViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
-class SupplierViewSet(viewsets.ReadOnlyModelViewSet):
+class SupplierViewSet(CachedDirectoryMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     pagination_class = None
     permission_classes = [AllowAny]
+    directory_cache = supplier_directory
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        GET /api/suppliers/search/?q=...&limit=10 — по названию (с опечатками) или точному BIN/IIN
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+        except ValueError:
+            limit = SEARCH_LIMIT
+
+        suppliers = search_suppliers(request.query_params.get('q', ''), limit=max(limit, 1))
+        return Response(self.get_serializer(suppliers, many=True).data)
 
-class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
+class CustomerViewSet(CachedDirectoryMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     pagination_class = None
     permission_classes = [AllowAny]
+    directory_cache = customer_directory
+
+
+class SpendReportViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    GET /api/reports/spend/ — расходы из SpendSummary (таблица заявок не читается).
+    ?group_by=period,supplier,customer,status  ?period_from=YYYY-MM  ?period_to=YYYY-MM
+    ?status=PAID  ?supplier=<id>  ?customer=<id>  (0 — не указан)
+    """
+
+    permission_classes = [IsAuthenticated, IsManagerOrAccountant]
+
+    group_by_columns = {
+        "period": "period",
+        "supplier": "supplier_key",
+        "customer": "customer_key",
+        "status": "status",
+    }
+
+    @staticmethod
+    def parse_period(value):
+        try:
+            return datetime.datetime.strptime(value, "%Y-%m").date()
+        except (TypeError, ValueError):
+            return None
+
+    def list(self, request):
+        params = request.query_params
+
+        group_by = [
+            name.strip() for name in params.get("group_by", "period").split(",")
+            if name.strip() in self.group_by_columns
+        ] or ["period"]
+        columns = [self.group_by_columns[name] for name in group_by]
+
+        qs = SpendSummary.objects.exclude(request_count=0)
+
+        period_from = self.parse_period(params.get("period_from"))
+        if period_from:
+            qs = qs.filter(period__gte=period_from)
+        period_to = self.parse_period(params.get("period_to"))
+        if period_to:
+            qs = qs.filter(period__lte=period_to)
+        if params.get("status") in PurchaseRequest.Status.values:
+            qs = qs.filter(status=params["status"])
+        if params.get("supplier", "").isdigit():
+            qs = qs.filter(supplier_key=params["supplier"])
+        if params.get("customer", "").isdigit():
+            qs = qs.filter(customer_key=params["customer"])
+
+        rows = list(
+            qs.values(*columns)
+            .annotate(
+                total_with_vat=Sum("total_with_vat"),
+                total_without_vat=Sum("total_without_vat"),
+                request_count=Sum("request_count"),
+            )
+            .order_by(*columns)
+        )
+
+        supplier_names = Supplier.objects.in_bulk({r["supplier_key"] for r in rows if r.get("supplier_key")})
+        customer_names = Customer.objects.in_bulk({r["customer_key"] for r in rows if r.get("customer_key")})
+        for row in rows:
+            for column in self.group_by_columns.values():
+                row.setdefault(column, None)
+            supplier = supplier_names.get(row["supplier_key"])
+            customer = customer_names.get(row["customer_key"])
+            row["supplier_name"] = supplier.name if supplier else None
+            row["customer_name"] = customer.name if customer else None
+
+        return Response(SpendReportSerializer(rows, many=True).data)
 
 
 @login_required
@@ -111,16 +423,48 @@ def purchase_request(request):
     return render(request, "request/request.html")
 
 
-@login_required
-def my_requests_view(request):
-    my_requests = (
+MY_REQUESTS_PAGE_SIZE = 20
+MY_REQUESTS_ORDERING = ("-created_at", "id")
+
+
+def my_requests_queryset(user):
+    return (
         PurchaseRequest.objects
-        .filter(creator=request.user)
+        .filter(creator=user)
         .select_related("supplier", "customer")
         .prefetch_related("items")
-        .order_by("-created_at")
     )
 
-    return render(request, "request/my_requests.html", {
-        "requests": my_requests
-    })
\ No newline at end of file
+
+def status_badges(counts):
+    """
+    [(статус, метка, число)] для бейджей «N ожидают / N оплачено»; counts — из RequestCounter
+    """
+    return [(value, label, counts.get(value, 0)) for value, label in PurchaseRequest.Status.choices]
+
+
+def my_requests_context(page, counts):
+    # итоги — из счётчиков, без COUNT(*) по заявкам пользователя
+    return {
+        "requests": page,
+        "page": page,
+        "badges": status_badges(counts),
+        "total": sum(counts.values()),
+    }
+
+
+@login_required
+@read_from_replica
+def my_requests_view(request):
+    try:
+        page = paginate_keyset(
+            my_requests_queryset(request.user),
+            MY_REQUESTS_ORDERING,
+            cursor=request.GET.get("cursor"),
+            page_size=MY_REQUESTS_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        raise Http404
+
+    counts = RequestCounter.objects.for_creator(request.user)
+    return render(request, "request/my_requests.html", my_requests_context(page, counts))
\ No newline at end of file
@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'osc_erp.settings')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402  (после get_asgi_application — settings уже настроены)
+
+if settings.ASYNC_VIEWS:
+    # вместо WhiteNoise (он только WSGI): статика через finders, как у runserver
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+
+    application = ASGIStaticFilesHandler(application)
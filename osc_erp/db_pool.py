@@ -0,0 +1,325 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import psycopg2
+
+from .metrics import Histogram, _histogram_lines, _label, registry
+
+
+# --------------------
+# POSTGRES CONNECTION POOL (psycopg2)
+# --------------------
+# Один пул на алиас БД в процессе (gunicorn-воркер), общий для всех потоков.
+# Django берёт соединение из пула на время запроса (CONN_MAX_AGE=0) и возвращает
+# его в DatabaseWrapper._close(), см. osc_erp/pooled_postgresql.
+#   - max_size: больше соединений пул не откроет; остальные ждут до timeout, затем PoolTimeout;
+#   - min_size: столько соединений держится открытыми и в простое (без переподключения
+#     после тихого периода); лишние закрываются через max_idle;
+#   - max_lifetime: соединение старше (±10%) закрывается при возврате/выдаче;
+#   - check_interval: пролежавшее дольше этого соединение проверяется SELECT 1 перед выдачей.
+# Метрики пула — в /metrics (osc_db_pool_*).
+
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+DEFAULT_POOL_OPTIONS = {
+    "min_size": 2,
+    "max_size": 10,
+    "timeout": 10.0,
+    "max_lifetime": 1800.0,
+    "max_idle": 300.0,
+    "check_interval": 5.0,
+}
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """
+    Свободное соединение не появилось за timeout (Django превращает в OperationalError)
+    """
+
+
+class PooledConnection:
+    __slots__ = ("connection", "created_at", "expires_at", "returned_at")
+
+    def __init__(self, connection, max_lifetime):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        # разброс, чтобы соединения одного возраста не переоткрывались разом
+        self.expires_at = self.created_at + max_lifetime * random.uniform(0.9, 1.0)
+        self.returned_at = self.created_at
+
+
+class ConnectionPool:
+
+    def __init__(self, name, connect, min_size=2, max_size=10, timeout=10.0,
+                 max_lifetime=1800.0, max_idle=300.0, check_interval=5.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self.name = name
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.pid = os.getpid()
+        self.key = None
+        self.is_closed = False
+
+        self._idle = deque()     # PooledConnection; справа — последние возвращённые
+        self._in_use = {}        # psycopg2 connection -> PooledConnection
+        self._size = 0           # открытые + открываемые сейчас
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+        self.wait_time = Histogram(POOL_WAIT_BUCKETS)
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = {}         # причина -> число
+
+    def __contains__(self, connection):
+        return connection in self._in_use
+
+    # ---- выдача ----
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            entry, stale = self._reserve(deadline)
+            for old in stale:
+                self._close(old, "idle")
+            if entry is None:
+                entry = self._open()
+            else:
+                reason = self._check(entry)
+                if reason is not None:
+                    self._discard(entry, reason)
+                    continue
+            with self._cond:
+                self._in_use[entry.connection] = entry
+                self.wait_time.observe(time.monotonic() - start)
+            return entry.connection
+
+    def _reserve(self, deadline):
+        """
+        (соединение из простоя или None — «открой новое», [лишние простаивающие])
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    stale = self._trim_idle()
+                    if self._idle:
+                        return self._idle.pop(), stale
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None, stale
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No free connection in pool {self.name!r} within {self.timeout:g}s "
+                            f"({self.max_size} in use)"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+    def _trim_idle(self):
+        # самые давние простаивающие — слева; под локом
+        stale = []
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size and now - self._idle[0].returned_at > self.max_idle:
+            stale.append(self._idle.popleft())
+            self._size -= 1
+        return stale
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.opened += 1
+        return PooledConnection(connection, self.max_lifetime)
+
+    def _check(self, entry):
+        """
+        Причина не выдавать соединение из простоя или None
+        """
+        connection = entry.connection
+        if connection.closed:
+            return "broken"
+        now = time.monotonic()
+        if now >= entry.expires_at:
+            return "lifetime"
+        if now - entry.returned_at < self.check_interval:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if not connection.autocommit:
+                connection.rollback()
+        except psycopg2.Error:
+            return "failed_check"
+        return None
+
+    # ---- возврат ----
+
+    def putconn(self, connection):
+        with self._cond:
+            entry = self._in_use.pop(connection, None)
+        if entry is None:
+            connection.close()
+            return
+
+        reason = None
+        if self.is_closed:
+            reason = "pool_closed"
+        elif connection.closed:
+            reason = "broken"
+        elif time.monotonic() >= entry.expires_at:
+            reason = "lifetime"
+        elif connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # запрос упал посреди транзакции — следующий должен получить чистое соединение
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                reason = "broken"
+        if reason is not None:
+            self._discard(entry, reason)
+            return
+
+        entry.returned_at = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def _discard(self, entry, reason):
+        self._close(entry, reason)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _close(self, entry, reason):
+        try:
+            entry.connection.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self.closed[reason] = self.closed.get(reason, 0) + 1
+
+    def close(self):
+        """
+        Закрывает простаивающие соединения (выданные закроются при возврате)
+        """
+        with self._cond:
+            self.is_closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for entry in idle:
+            self._close(entry, "pool_closed")
+
+    # ---- метрики ----
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiting,
+                "opened": self.opened,
+                "timeouts": self.timeouts,
+                "closed": dict(self.closed),
+                "wait_time": _copy_histogram(self.wait_time),
+            }
+
+
+def _copy_histogram(histogram):
+    copy = Histogram(histogram.buckets)
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    copy.count = histogram.count
+    return copy
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, conn_params, options):
+    """
+    Пул алиаса в текущем процессе. После fork (gunicorn форкает воркеры от мастера)
+    унаследованные сокеты не закрываются — они общие с родителем — а забываются.
+    Смена параметров подключения (тестовая БД) — новый пул, старый закрывается.
+    """
+    key = repr(sorted(conn_params.items()))
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is not None and pool.pid == os.getpid() and pool.key == key and not pool.is_closed:
+            return pool
+        if pool is not None and pool.pid == os.getpid():
+            pool.close()
+        pool = _pools[alias] = ConnectionPool(alias, connect, **{**DEFAULT_POOL_OPTIONS, **options})
+        pool.key = key
+        return pool
+
+
+def close_pool(alias):
+    with _pools_lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None and pool.pid == os.getpid():
+        pool.close()
+
+
+def pools():
+    with _pools_lock:
+        return [pool for pool in _pools.values() if pool.pid == os.getpid()]
+
+
+POOL_GAUGES = (
+    ("osc_db_pool_connections", "size", "gauge", "Open connections (idle + in use)."),
+    ("osc_db_pool_idle_connections", "idle", "gauge", "Idle connections."),
+    ("osc_db_pool_in_use_connections", "in_use", "gauge", "Connections checked out by requests."),
+    ("osc_db_pool_waiting", "waiting", "gauge", "Threads waiting for a connection."),
+    ("osc_db_pool_opened_total", "opened", "counter", "Connections opened."),
+    ("osc_db_pool_timeouts_total", "timeouts", "counter", "Checkouts that gave up after the pool timeout."),
+)
+
+
+def pool_metrics_lines():
+    current = sorted(((pool.name, pool.stats()) for pool in pools()), key=lambda item: item[0])
+    if not current:
+        return []
+    lines = []
+    for name, key, kind, help_text in POOL_GAUGES:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for alias, stats in current:
+            lines.append(f'{name}{{pool="{_label(alias)}"}} {stats[key]}')
+
+    lines += [
+        "# HELP osc_db_pool_closed_total Connections closed by reason.",
+        "# TYPE osc_db_pool_closed_total counter",
+    ]
+    for alias, stats in current:
+        for reason, count in sorted(stats["closed"].items()):
+            lines.append(f'osc_db_pool_closed_total{{pool="{_label(alias)}",reason="{reason}"}} {count}')
+
+    lines += [
+        "# HELP osc_db_pool_wait_seconds Time to get a connection from the pool.",
+        "# TYPE osc_db_pool_wait_seconds histogram",
+    ]
+    for alias, stats in current:
+        lines += _histogram_lines("osc_db_pool_wait_seconds", f'pool="{_label(alias)}"', stats["wait_time"])
+    return lines
+
+
+registry.add_collector(pool_metrics_lines)
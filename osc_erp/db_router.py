@@ -0,0 +1,164 @@
+import contextvars
+import random
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# --------------------
+# READ REPLICAS
+# --------------------
+# Запись — всегда в default. На реплику читают только явно отмеченные вью
+# (@read_from_replica) и действия вьюсетов (ReplicaReadMixin.replica_actions), и то если:
+#   - пользователь не писал за последние REPLICA_PIN_SECONDS (read-your-writes);
+#   - в этом запросе ещё не было записи;
+#   - мы не внутри транзакции на default.
+# Состояние запроса — в contextvar (ReplicaRoutingMiddleware), как и RequestStats в metrics.
+# Вне запроса (команды, задачи) всё читается с default.
+#
+# Отметка «недавно писал» — по id пользователя в кеше REPLICA_PIN_CACHE, а не в cookie:
+# у API-клиентов с токеном cookie нет. Кеш должен быть общим для всех воркеров
+# (Redis/Memcached), с LocMemCache отметку видит только процесс, где была запись.
+# Отметку ставят только записи моделей приложения: сессия пишется почти на каждом GET.
+
+PIN_IGNORED_APPS = {"sessions"}
+
+
+class RoutingState:
+    __slots__ = ("request", "pinned", "replica", "alias", "wrote")
+
+    def __init__(self, request=None):
+        self.request = request
+        # None — ещё не проверяли: пользователь известен только после аутентификации
+        self.pinned = None if request is not None else False
+        self.replica = False
+        self.alias = None
+        self.wrote = False
+
+
+_current_state = contextvars.ContextVar("db_routing", default=None)
+
+
+def start_routing(request=None):
+    state = RoutingState(request)
+    return state, _current_state.set(state)
+
+
+def finish_routing(token):
+    _current_state.reset(token)
+
+
+def replicas():
+    # только настроенные алиасы: тестовые настройки могут заменить DATABASES целиком
+    return [alias for alias in getattr(settings, "DATABASE_REPLICAS", []) if alias in settings.DATABASES]
+
+
+def _pin_key(request):
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return None
+    return f"db_pin:{user.pk}"
+
+
+def pin_reads(request):
+    """
+    Следующие REPLICA_PIN_SECONDS пользователь запроса читает только с default
+    """
+    key = _pin_key(request)
+    if key is not None:
+        caches[settings.REPLICA_PIN_CACHE].set(key, 1, settings.REPLICA_PIN_SECONDS)
+
+
+def _is_pinned(state):
+    if state.pinned is None:
+        # запросы на время проверки (сессия, пользователь) — на default
+        state.pinned = True
+        key = _pin_key(state.request)
+        state.pinned = key is not None and caches[settings.REPLICA_PIN_CACHE].get(key) is not None
+    return state.pinned
+
+
+def use_replica():
+    """
+    Разрешает чтение с реплики до конца текущего запроса
+    """
+    state = _current_state.get()
+    if state is not None:
+        state.replica = True
+
+
+def read_alias():
+    """
+    Алиас для чтения в текущем запросе — для запросов, которые выполнятся уже
+    после вью (StreamingHttpResponse): queryset.using(read_alias())
+    """
+    state = _current_state.get()
+    if state is None or not state.replica or state.wrote:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block or not replicas():
+        return DEFAULT_DB_ALIAS
+    if _is_pinned(state):
+        return DEFAULT_DB_ALIAS
+    if state.alias is None:
+        # одна реплика на запрос — согласованный снимок в пределах страницы
+        state.alias = random.choice(replicas())
+    return state.alias
+
+
+def read_from_replica(view_func):
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            use_replica()
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        use_replica()
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """
+    Для DRF-вьюсетов: действия из replica_actions читают с реплики
+    """
+
+    replica_actions = ("list", "retrieve")
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            use_replica()
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # связанные объекты — из той же БД, что и сам объект
+            return instance._state.db
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _current_state.get()
+        if state is not None and model._meta.app_label not in PIN_IGNORED_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему на реплики приносит репликация
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,218 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+
+# --------------------
+# PER-REQUEST STATS
+# --------------------
+# Счётчики текущего запроса лежат в contextvar — корректно и для потоков, и для ASGI.
+
+class RequestStats:
+    __slots__ = ("db_count", "db_time", "template_time")
+
+    def __init__(self):
+        self.db_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+
+_current_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def start_request_stats():
+    stats = RequestStats()
+    return stats, _current_stats.set(stats)
+
+
+def finish_request_stats(token):
+    _current_stats.reset(token)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """Для connection.execute_wrapper: время и число SQL-запросов"""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.db_count += 1
+
+
+def _add_execute_wrapper(connection):
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    _add_execute_wrapper(connection)
+
+
+def install_db_instrumentation():
+    """
+    Вешает db_execute_wrapper на все соединения навсегда (вне запроса он ничего не делает).
+    Соединения thread-local: под ASGI ORM работает в потоках sync_to_async, поэтому
+    обёртка ставится при создании соединения, а не на время запроса в потоке middleware.
+    """
+    connection_created.connect(_on_connection_created, dispatch_uid="osc_erp.metrics")
+    for connection in connections.all(initialized_only=True):
+        _add_execute_wrapper(connection)
+
+
+class InstrumentedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current_stats.get()
+        if stats is None:
+            return self.template.render(context, request)
+
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django, который засекает время render() для метрик"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name))
+
+
+# --------------------
+# AGGREGATED METRICS (Prometheus text format)
+# --------------------
+# Метрики живут в памяти процесса: у каждого воркера gunicorn — свои.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collectors = []   # функции -> строки метрик других подсистем (пул БД)
+        self.reset()
+
+    def add_collector(self, collect):
+        self._collectors.append(collect)
+
+    def reset(self):
+        self.requests = {}      # (route, method, status) -> count
+        self.duration = {}      # (route, method) -> Histogram
+        self.db_queries = {}    # route -> Histogram
+        self.db_time = {}       # route -> seconds
+        self.template_time = {}  # route -> seconds
+        self.response_bytes = {}  # route -> bytes
+
+    def observe(self, route, method, status, duration, stats, size):
+        with self._lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            histogram = self.duration.get((route, method))
+            if histogram is None:
+                histogram = self.duration[(route, method)] = Histogram(DURATION_BUCKETS)
+            histogram.observe(duration)
+
+            histogram = self.db_queries.get(route)
+            if histogram is None:
+                histogram = self.db_queries[route] = Histogram(QUERY_COUNT_BUCKETS)
+            histogram.observe(stats.db_count)
+
+            self.db_time[route] = self.db_time.get(route, 0.0) + stats.db_time
+            self.template_time[route] = self.template_time.get(route, 0.0) + stats.template_time
+            self.response_bytes[route] = self.response_bytes.get(route, 0) + size
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP osc_http_requests_total HTTP requests by route, method and status.",
+                "# TYPE osc_http_requests_total counter",
+            ]
+            for (route, method, status), value in sorted(self.requests.items()):
+                lines.append(
+                    f'osc_http_requests_total{{route="{_label(route)}",method="{method}",status="{status}"}} {value}'
+                )
+
+            lines += [
+                "# HELP osc_http_request_duration_seconds Wall time per request.",
+                "# TYPE osc_http_request_duration_seconds histogram",
+            ]
+            for (route, method), histogram in sorted(self.duration.items()):
+                lines += _histogram_lines(
+                    "osc_http_request_duration_seconds", f'route="{_label(route)}",method="{method}"', histogram
+                )
+
+            lines += [
+                "# HELP osc_db_queries_per_request SQL queries per request.",
+                "# TYPE osc_db_queries_per_request histogram",
+            ]
+            for route, histogram in sorted(self.db_queries.items()):
+                lines += _histogram_lines("osc_db_queries_per_request", f'route="{_label(route)}"', histogram)
+
+            for name, help_text, values in (
+                ("osc_db_duration_seconds_total", "Total time spent in SQL.", self.db_time),
+                ("osc_template_render_seconds_total", "Total template render time.", self.template_time),
+                ("osc_http_response_bytes_total", "Total response body size.", self.response_bytes),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for route, value in sorted(values.items()):
+                    lines.append(f'{name}{{route="{_label(route)}"}} {value}')
+
+        for collect in self._collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+registry = MetricsRegistry()
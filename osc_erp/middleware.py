@@ -1,5 +1,12 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.utils import translation
 
+from .db_router import finish_routing, pin_reads, replicas, start_routing
+from .metrics import finish_request_stats, install_db_instrumentation, registry, start_request_stats
+
 class ForceRussianMiddleware:
     """
     Temporarily forces Russian for all requests.
@@ -12,4 +19,96 @@ class ForceRussianMiddleware:
         translation.activate('ru')  # force Russian
         response = self.get_response(request)
         translation.deactivate()
-        return response
\ No newline at end of file
+        return response
+
+
+class PerformanceMiddleware:
+    """
+    Per-request wall time, SQL count/time (connection execute wrapper) and template
+    render time. Sent back as a Server-Timing header and aggregated for /metrics.
+    Should be the first middleware so its wall time covers the whole stack.
+    Works under both WSGI and ASGI (does not force async views into a thread).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "SERVER_TIMING_HEADER", True)
+        install_db_instrumentation()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats, token = start_request_stats()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request_stats(token)
+        return self.process(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats, token = start_request_stats()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request_stats(token)
+        return self.process(request, response, stats, time.perf_counter() - start)
+
+    def process(self, request, response, stats, duration):
+        match = getattr(request, "resolver_match", None)
+        route = (match.view_name or match.route) if match else "unmatched"
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(route, request.method, response.status_code, duration, stats, size)
+
+        if self.server_timing:
+            response["Server-Timing"] = (
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_count} queries", '
+                f"tpl;dur={stats.template_time * 1000:.1f}, "
+                f"total;dur={duration * 1000:.1f}"
+            )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Per-request state for osc_erp.db_router.PrimaryReplicaRouter. A request that wrote
+    to the primary pins its user to the primary for REPLICA_PIN_SECONDS (read-your-writes
+    despite replication lag); the pin lives in the shared cache, so token clients get it too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state, token = start_routing(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_routing(token)
+        if state.wrote and replicas():
+            pin_reads(request)
+        return response
+
+    async def __acall__(self, request):
+        state, token = start_routing(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_routing(token)
+        if state.wrote and replicas():
+            # request.user может быть ещё не загружен — это запрос к БД
+            await sync_to_async(pin_reads)(request)
+        return response
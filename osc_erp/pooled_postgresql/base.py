@@ -0,0 +1,67 @@
+import os
+
+import psycopg2.extras
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.utils.asyncio import async_unsafe
+
+from osc_erp.db_pool import get_pool
+
+
+# --------------------
+# POSTGRES + POOL
+# --------------------
+# ENGINE = "osc_erp.pooled_postgresql": обычный бэкенд Django, но физические соединения
+# берутся из пула процесса (osc_erp.db_pool) и возвращаются в него при close().
+# Встроенный OPTIONS["pool"] Django работает только с psycopg 3, поэтому параметры
+# пула — в отдельном ключе настроек POOL (см. DATABASE_POOL_* в settings).
+# CONN_MAX_AGE должен быть 0: соединение отдаётся в пул в конце каждого запроса.
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+
+    def __init__(self, settings_dict, alias=None):
+        super().__init__(settings_dict, alias)
+        self._pool = None
+
+    def connection_pool(self, conn_params):
+        def connect():
+            return self.Database.connect(**conn_params)
+
+        return get_pool(self.alias, connect, conn_params, self.settings_dict.get("POOL") or {})
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict["OPTIONS"]
+        isolation_level = options.get("isolation_level")
+        try:
+            self.isolation_level = IsolationLevel(
+                IsolationLevel.READ_COMMITTED if isolation_level is None else isolation_level
+            )
+        except ValueError:
+            raise ImproperlyConfigured(
+                f"Invalid transaction isolation level {isolation_level} specified."
+            )
+
+        self._pool = self.connection_pool(conn_params)
+        connection = self._pool.getconn()
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        # как в базовом бэкенде: без лишнего json.loads для JSONField
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool, self._pool = self._pool, None
+        with self.wrap_database_errors:
+            try:
+                if pool is not None and pool.pid == os.getpid() and self.connection in pool:
+                    pool.putconn(self.connection)
+                else:
+                    # унаследовано от родителя после fork или пул заменён
+                    self.connection.close()
+            finally:
+                # соединение могло уйти другому потоку — даже внутри atomic его больше не трогаем
+                self.connection = None
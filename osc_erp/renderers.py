@@ -0,0 +1,47 @@
+import datetime
+import decimal
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # без orjson — обычный JSONRenderer DRF
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson: dict/list/str/int, даты и UUID кодируются в C, без
+    JSONEncoder.default на каждое значение. Байты те же, что у JSONRenderer (компактный
+    UTF-8, \\u2028/\\u2029 экранируются, даты с «Z», Decimal — как float), кроме записи
+    float вне [1e-4, 1e16) (1e16 вместо 1e+16) и NaN (null вместо ошибки). С отступом
+    (?indent, Browsable API), с UNICODE_JSON/COMPACT_JSON=False, без orjson или на том,
+    что orjson не кодирует (не-строковые ключи, int больше 64 бит...) — JSONRenderer
+    """
+
+    options = orjson.OPT_UTC_Z if orjson is not None else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=self.options)
+        except TypeError:  # orjson.JSONEncodeError
+            return super().render(data, accepted_media_type, renderer_context)
+        # как JSONRenderer: JSON остаётся подмножеством JavaScript
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+def _default(obj):
+    # то, что orjson не знает сам, — как rest_framework.utils.encoders.JSONEncoder
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    raise TypeError(type(obj).__name__)
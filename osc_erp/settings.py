@@ -46,7 +46,9 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
+    'rest_framework.authtoken',
     'allauth',
     'allauth.account',
     'allauth.socialaccount',
@@ -55,6 +57,8 @@ INSTALLED_APPS = [
 SITE_ID = 1
 
 MIDDLEWARE = [
+    'osc_erp.middleware.PerformanceMiddleware',  # первым: время всего стека
+    'osc_erp.middleware.ReplicaRoutingMiddleware',  # до сессий: их запись тоже «запись»
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -71,7 +75,7 @@ ROOT_URLCONF = 'osc_erp.urls'
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "osc_erp.metrics.InstrumentedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -85,6 +89,21 @@ TEMPLATES = [
     },
 ]
 WSGI_APPLICATION = 'osc_erp.wsgi.application'
+ASGI_APPLICATION = 'osc_erp.asgi.application'
+
+# ASGI-профиль: DJANGO_ASYNC=1 + uvicorn (см. README).
+# Списки заявок и справочники обслуживаются async-вью (main/async_views.py);
+# WhiteNoiseMiddleware только синхронная — статику отдаёт ASGIStaticFilesHandler в asgi.py
+ASYNC_VIEWS = os.getenv("DJANGO_ASYNC") == "1"
+if ASYNC_VIEWS:
+    MIDDLEWARE.remove("whitenoise.middleware.WhiteNoiseMiddleware")
+
+
+# Performance metrics (osc_erp.middleware.PerformanceMiddleware)
+# /metrics отдаётся по "Authorization: Bearer $METRICS_TOKEN", без токена — только staff
+
+SERVER_TIMING_HEADER = True
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
 
 # Database
@@ -109,14 +128,108 @@ WSGI_APPLICATION = 'osc_erp.wsgi.application'
 #     }
 # }
 
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.getenv("DATABASE_URL"),
+        default=DATABASE_URL,
         conn_max_age=600,
-        ssl_require=True
+        # локальные БД (нагрузочные тесты, seed): sqlite:///... или DATABASE_SSL_REQUIRE=0
+        ssl_require=not DATABASE_URL.startswith("sqlite") and os.getenv("DATABASE_SSL_REQUIRE", "1") == "1",
     )
 }
 
+# Реплики для чтения: DATABASE_REPLICA_URLS="postgres://...,postgres://..." (алиасы replica1, replica2, ...).
+# Запись — всегда в default; на реплику читают отмеченные вью и list/retrieve вьюсетов,
+# кроме клиентов, писавших за последние REPLICA_PIN_SECONDS (osc_erp/db_router.py).
+# Локально: две SQLite-базы, DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DATABASE_REPLICAS = []
+
+for _index, _url in enumerate(DATABASE_REPLICA_URLS, start=1):
+    DATABASES[f'replica{_index}'] = {
+        **dj_database_url.parse(
+            _url,
+            conn_max_age=600,
+            ssl_require=not _url.startswith("sqlite") and os.getenv("DATABASE_SSL_REQUIRE", "1") == "1",
+        ),
+        # в тестах реплика — та же тестовая БД
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+
+DATABASE_ROUTERS = ['osc_erp.db_router.PrimaryReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "15"))
+# отметки «недавно писал» по id пользователя; с несколькими воркерами — общий кеш
+REPLICA_PIN_CACHE = 'default'
+
+for _database in DATABASES.values():
+    if _database.get('ENGINE') == 'django.db.backends.sqlite3':
+        # транзакция сразу берёт блокировку записи: иначе параллельные «прочитал, затем пишу»
+        # (смена статуса, счётчики) падают с "database is locked", не дожидаясь очереди
+        _database.setdefault('OPTIONS', {}).update({'transaction_mode': 'IMMEDIATE', 'timeout': 20})
+
+# Пул соединений Postgres в каждом воркере (osc_erp/db_pool.py): DATABASE_POOL=1.
+# Вместо постоянного соединения на поток (CONN_MAX_AGE) — общий ограниченный пул:
+# проверка SELECT 1 перед выдачей, ограничение срока жизни, очередь с таймаутом.
+# Суммарно к БД: воркеры × DATABASE_POOL_MAX_SIZE (× число алиасов).
+
+DATABASE_POOL = os.getenv("DATABASE_POOL", "0") == "1"
+DATABASE_POOL_OPTIONS = {
+    'min_size': int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+    'max_size': int(os.getenv("DATABASE_POOL_MAX_SIZE", "10")),
+    'timeout': float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),             # ожидание свободного, с
+    'max_lifetime': float(os.getenv("DATABASE_POOL_MAX_LIFETIME", "1800")),
+    'max_idle': float(os.getenv("DATABASE_POOL_MAX_IDLE", "300")),           # сверх min_size
+    'check_interval': float(os.getenv("DATABASE_POOL_CHECK_INTERVAL", "5")),  # 0 — проверять всегда
+}
+
+if DATABASE_POOL:
+    for _database in DATABASES.values():
+        if _database.get('ENGINE') == 'django.db.backends.postgresql':
+            _database.update({
+                'ENGINE': 'osc_erp.pooled_postgresql',
+                # соединение возвращается в пул в конце каждого запроса
+                'CONN_MAX_AGE': 0,
+                'POOL': dict(DATABASE_POOL_OPTIONS),
+            })
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# По умолчанию — LocMemCache (свой в каждом процессе). Для нескольких воркеров
+# укажите общий бэкенд, например:
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://...
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache")
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv("CACHE_LOCATION", ""),
+    },
+    # снимки пользователей по API-токенам (user.authentication.CachedTokenAuthentication)
+    'auth': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv("CACHE_LOCATION", "auth"),
+        'KEY_PREFIX': 'auth',
+    },
+    # отрендеренные строки списков заявок ({% cache ... using="fragments" %})
+    'fragments': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv("CACHE_LOCATION", "fragments"),
+        'KEY_PREFIX': 'fragments',
+    },
+}
+if CACHE_BACKEND.endswith("LocMemCache"):
+    CACHES['auth']['OPTIONS'] = {'MAX_ENTRIES': 10000}
+    CACHES['fragments']['OPTIONS'] = {'MAX_ENTRIES': 20000}
+
+AUTH_TOKEN_CACHE = 'auth'
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT", 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -163,6 +276,17 @@ LOCALE_PATHS = [BASE_DIR / 'locale']
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
+# Документы заявок (main.documents): временные файлы chunked-загрузок и лимит размера.
+# Каталог должен быть общим для всех воркеров; на том же диске, что и хранилище, файл переносится без копирования
+DOCUMENT_UPLOAD_TEMP_DIR = os.getenv("DOCUMENT_UPLOAD_TEMP_DIR", str(BASE_DIR / "uploads_tmp"))
+MAX_DOCUMENT_SIZE = int(os.getenv("MAX_DOCUMENT_SIZE", 200 * 1024 * 1024))
+
+# Фоновая обработка документов (manage.py process_documents): текст и превью.
+# Кеш превью — на диске, с LRU-вытеснением по размеру; должен быть доступен и веб-процессам
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR", str(BASE_DIR / "preview_cache"))
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+DOCUMENT_WORKERS = int(os.getenv("DOCUMENT_WORKERS", os.cpu_count() or 2))
+
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]  # your development static folder
 STATIC_ROOT = BASE_DIR / "staticfiles" 
@@ -177,7 +301,7 @@ REST_FRAMEWORK = {
     # 1. Аутентификация
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',  # для админки
-        'rest_framework.authentication.TokenAuthentication',    # для API токенов
+        'user.authentication.CachedTokenAuthentication',        # для API токенов (кеш токен -> пользователь)
     ],
 
     # 2. Permissions по умолчанию
@@ -191,11 +315,15 @@ REST_FRAMEWORK = {
 
     # 4. Формат ответов (по желанию)
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',   # JSON по умолчанию
+        'osc_erp.renderers.FastJSONRenderer',   # JSON по умолчанию (orjson, если установлен)
         'rest_framework.renderers.BrowsableAPIRenderer',  # красивый интерфейс для теста
     )
 }
 
+# Списки API читаются через .values() без сериализатора на строку (main/row_serializers.py);
+# вывод тот же. API_ROW_SERIALIZATION=0 — через обычный сериализатор
+API_ROW_SERIALIZATION = os.getenv("API_ROW_SERIALIZATION", "1") == "1"
+
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',  # для admin
     'allauth.account.auth_backends.AuthenticationBackend',  # для allauth
@@ -0,0 +1,314 @@
+import threading
+import warnings
+from types import SimpleNamespace
+from unittest import mock
+
+import psycopg2
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from main.models import PurchaseRequest, Supplier
+from .db_pool import ConnectionPool, PoolTimeout, close_pool
+from .db_router import (
+    PrimaryReplicaRouter, finish_routing, pin_reads, read_alias, start_routing, use_replica,
+)
+from .middleware import ReplicaRoutingMiddleware
+from .pooled_postgresql.base import DatabaseWrapper as PooledDatabaseWrapper
+
+# вторая SQLite-база как реплика; роутеру нужны только алиас и настройки
+REPLICA = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+
+
+class PrimaryReplicaRouterTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with warnings.catch_warnings():
+            # DATABASES подменяется только для replicas(): соединения с репликой тесту не нужны
+            warnings.simplefilter("ignore")
+            cls.enterClassContext(override_settings(
+                DATABASES={**settings.DATABASES, "replica1": REPLICA},
+                DATABASE_REPLICAS=["replica1"],
+            ))
+        cls.enterClassContext(override_settings(
+            CACHES={**settings.CACHES, "pins": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "pins",
+            }},
+            REPLICA_PIN_CACHE="pins",
+        ))
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        caches["pins"].clear()
+
+    def routing(self, request=None):
+        state, token = start_routing(request)
+        self.addCleanup(finish_routing, token)
+        return state
+
+    def user_request(self, pk=1, method="get"):
+        request = getattr(RequestFactory(), method)("/")
+        request.user = SimpleNamespace(pk=pk, is_authenticated=True)
+        return request
+
+    def test_reads_go_to_replica_only_when_marked(self):
+        # вне запроса (команды, задачи) — default
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "default")
+
+        self.routing()
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "default")
+        use_replica()
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "replica1")
+        self.assertEqual(self.router.db_for_read(Supplier), "replica1")
+        self.assertEqual(read_alias(), "replica1")
+
+    def test_related_objects_follow_instance_database(self):
+        supplier = Supplier(name="Supplier")
+        supplier._state.db = "replica1"
+        self.assertEqual(self.router.db_for_read(PurchaseRequest, instance=supplier), "replica1")
+
+        other = Supplier(name="Other")
+        other._state.db = "default"
+        self.assertTrue(self.router.allow_relation(supplier, other))
+
+    def test_write_sends_reads_back_to_default(self):
+        state = self.routing()
+        use_replica()
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "replica1")
+
+        self.assertEqual(self.router.db_for_write(PurchaseRequest), "default")
+        self.assertTrue(state.wrote)
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "default")
+
+    def test_session_write_does_not_pin(self):
+        state = self.routing()
+        use_replica()
+        self.assertEqual(self.router.db_for_write(Session), "default")
+        self.assertFalse(state.wrote)
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "replica1")
+
+    def test_pinned_user_reads_from_default(self):
+        pin_reads(self.user_request(pk=1))
+
+        self.routing(self.user_request(pk=1))
+        use_replica()
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "default")
+
+        # другой пользователь и аноним читают с реплики
+        self.routing(self.user_request(pk=2))
+        use_replica()
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "replica1")
+
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        self.routing(request)
+        use_replica()
+        self.assertEqual(self.router.db_for_read(PurchaseRequest), "replica1")
+
+    def test_middleware_pins_user_after_write(self):
+        seen = []
+
+        def view(request):
+            # как DRF: пользователь по токену появляется уже внутри вью, cookie у клиента нет
+            request.user = SimpleNamespace(pk=request.GET.get("user", 1), is_authenticated=True)
+            use_replica()
+            seen.append(read_alias())
+            if request.method == "POST":
+                self.router.db_for_write(PurchaseRequest)
+            else:
+                self.router.db_for_write(Session)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+
+        response = middleware(factory.get("/"))
+        self.assertEqual(response.cookies, {})
+        self.assertIsNone(caches["pins"].get("db_pin:1"))
+
+        response = middleware(factory.post("/"))
+        self.assertEqual(response.cookies, {})
+        self.assertIsNotNone(caches["pins"].get("db_pin:1"))
+
+        middleware(factory.get("/"))
+        middleware(factory.get("/", {"user": 2}))
+        self.assertEqual(seen, ["replica1", "replica1", "default", "replica1"])
+
+    def test_allow_migrate(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "main", "purchaserequest"))
+        self.assertIsNone(self.router.allow_migrate("default", "main", "purchaserequest"))
+
+
+class FakeConnection:
+    """
+    Соединение psycopg2 для тестов пула: только то, чем пользуется ConnectionPool
+    """
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = True
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.check_error = None
+        self.rollback_error = None
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if self.check_error is not None:
+            raise self.check_error
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        if self.rollback_error is not None:
+            raise self.rollback_error
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **options):
+        self.opened = []
+
+        def connect():
+            connection = FakeConnection()
+            self.opened.append(connection)
+            return connection
+
+        return ConnectionPool("test", connect, **{"min_size": 0, "max_size": 2, "timeout": 0.05, **options})
+
+    def test_checkout_and_return_reuse_connection(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        self.assertIn(connection, pool)
+        self.assertEqual(pool.stats()["in_use"], 1)
+
+        pool.putconn(connection)
+        self.assertNotIn(connection, pool)
+        self.assertEqual(pool.stats()["idle"], 1)
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(len(self.opened), 1)
+        self.assertFalse(connection.closed)
+
+    def test_broken_connection_is_closed_not_returned(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        connection.closed = 2  # сервер оборвал соединение
+        pool.putconn(connection)
+        self.assertEqual(pool.stats()["idle"], 0)
+        self.assertEqual(pool.stats()["closed"], {"broken": 1})
+
+        fresh = pool.getconn()
+        self.assertIsNot(fresh, connection)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_failed_transaction_is_rolled_back_or_dropped(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        connection.status = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)  # откатили и вернули в пул
+
+        connection.status = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+        connection.rollback_error = psycopg2.OperationalError("server closed the connection")
+        pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["closed"], {"broken": 1})
+
+    def test_idle_connection_failing_check_is_replaced(self):
+        pool = self.make_pool(check_interval=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.check_error = psycopg2.OperationalError("SSL SYSCALL error")
+
+        fresh = pool.getconn()
+        self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["closed"], {"failed_check": 1})
+
+    def test_exhausted_pool_waits_then_times_out(self):
+        pool = self.make_pool(max_size=1)
+        connection = pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        self.assertEqual(len(self.opened), 1)
+
+        # ждущий получает соединение, как только его вернули
+        pool.timeout = 5
+        threading.Timer(0.05, pool.putconn, [connection]).start()
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_failed_connect_frees_the_slot(self):
+        pool = self.make_pool(max_size=1)
+        with mock.patch.object(pool, "connect", side_effect=psycopg2.OperationalError("refused")):
+            with self.assertRaises(psycopg2.OperationalError):
+                pool.getconn()
+        self.assertEqual(pool.stats()["size"], 0)
+        pool.getconn()
+
+
+class PooledBackendTests(SimpleTestCase):
+    alias = "pooled_test"
+
+    def setUp(self):
+        self.addCleanup(close_pool, self.alias)
+        patcher = mock.patch("psycopg2.connect", side_effect=lambda **params: FakeConnection())
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        jsonb = mock.patch("psycopg2.extras.register_default_jsonb")
+        jsonb.start()
+        self.addCleanup(jsonb.stop)
+
+    def wrapper(self):
+        return PooledDatabaseWrapper({
+            **settings.DATABASES["default"], "ENGINE": "osc_erp.pooled_postgresql", "NAME": "osc",
+            "OPTIONS": {}, "CONN_MAX_AGE": 0, "POOL": {"min_size": 0, "max_size": 1, "timeout": 0.05},
+        }, self.alias)
+
+    def test_close_returns_connection_to_pool(self):
+        params = {"dbname": "osc"}
+        first = self.wrapper()
+        first.connection = first.get_new_connection(params)
+        connection = first.connection
+        first.close()
+        self.assertIsNone(first.connection)
+        self.assertFalse(connection.closed)
+
+        second = self.wrapper()
+        self.assertIs(second.get_new_connection(params), connection)
+        self.assertEqual(self.connect.call_count, 1)
+
+        # пул из одного соединения занят — следующий запрос получает ошибку по таймауту
+        with self.assertRaises(PoolTimeout):
+            self.wrapper().get_new_connection(params)
+
+    def test_broken_connection_is_not_reused(self):
+        params = {"dbname": "osc"}
+        wrapper = self.wrapper()
+        wrapper.connection = wrapper.get_new_connection(params)
+        broken = wrapper.connection
+        broken.closed = 2
+        wrapper.close()
+
+        wrapper = self.wrapper()
+        self.assertIsNot(wrapper.get_new_connection(params), broken)
+        self.assertEqual(self.connect.call_count, 2)
@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .views import metrics_view
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
@@ -23,4 +24,6 @@ urlpatterns = [
 
     path('', include('main.urls')),
     path("user/", include("user.urls")),
+
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,23 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+
+from .metrics import registry
+
+
+def metrics_view(request):
+    """
+    Prometheus text format. With METRICS_TOKEN set, expects
+    "Authorization: Bearer <token>"; otherwise only staff users may read it.
+    """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, token):
+            raise PermissionDenied
+    elif not (request.user.is_authenticated and request.user.is_staff):
+        raise PermissionDenied
+
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
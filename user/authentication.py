@@ -0,0 +1,83 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+# --------------------
+# CACHED TOKEN AUTHENTICATION
+# --------------------
+# TokenAuthentication делает token JOIN user на каждый вызов API. Здесь в кеше
+# (CACHES[AUTH_TOKEN_CACHE], ограничен по размеру и TTL) лежит снимок пользователя —
+# ровно те поля, по которым принимаются решения о доступе. request.user собирается
+# через from_db: остальные поля отложены и при обращении догрузятся из БД,
+# а save() запишет только загруженные поля.
+#
+# Инвалидация — сигналами (user.signals) и UserQuerySet.update(): изменение
+# роли/активности пользователя, удаление токена; ещё раз — после COMMIT. Поэтому
+# кеш должен быть общим для всех воркеров (Redis/Memcached): с LocMemCache другие
+# процессы не увидели бы отзыв, и снимки не кешируются — токен проверяется по БД.
+
+SNAPSHOT_FIELDS = ("id", "username", "role", "is_active", "is_staff", "is_superuser")
+
+
+def token_cache():
+    """
+    Кеш снимков или None, если он локальный для процесса
+    """
+    cache = caches[settings.AUTH_TOKEN_CACHE]
+    return None if isinstance(cache, LocMemCache) else cache
+
+
+def token_cache_key(key):
+    # сам токен в ключ кеша не попадает
+    return "auth:token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def invalidate_tokens(keys, using=None):
+    cache = token_cache()
+    cache_keys = [token_cache_key(key) for key in keys]
+    if cache is None or not cache_keys:
+        return
+    cache.delete_many(cache_keys)
+    # параллельный запрос мог закешировать снимок по данным до COMMIT
+    transaction.on_commit(lambda: cache.delete_many(cache_keys), using=using)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        if cache is None:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        snapshot = cache.get(cache_key)
+
+        if snapshot is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related("user").get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            snapshot = {name: getattr(token.user, name) for name in SNAPSHOT_FIELDS}
+            cache.set(cache_key, snapshot, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+        if not snapshot["is_active"]:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        return self.build_user(snapshot), self.build_token(key, snapshot["id"])
+
+    def build_user(self, snapshot):
+        User = get_user_model()
+        names = [f.attname for f in User._meta.concrete_fields if f.attname in snapshot]
+        return User.from_db(router.db_for_read(User), names, [snapshot[name] for name in names])
+
+    def build_token(self, key, user_id):
+        model = self.get_model()
+        return model.from_db(router.db_for_read(model), ["key", "user_id"], [key, user_id])
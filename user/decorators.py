@@ -1,6 +1,34 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
 from django.core.exceptions import PermissionDenied
 
+
+async def aget_user(request):
+    """
+    Пользователь для async-вью. Подставляет его в request.user, чтобы шаблоны и
+    context processors не делали синхронный запрос к БД внутри event loop.
+    """
+    user = await request.auser()
+    request.user = user
+    return user
+
+
 def admin_or_accountant_required(view_func):
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            user = await aget_user(request)
+            if not user.is_authenticated:
+                raise PermissionDenied
+
+            if user.role not in ["ADMIN", "ACCOUNTANT"]:
+                raise PermissionDenied
+
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             raise PermissionDenied
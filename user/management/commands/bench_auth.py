@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Queries and time per API call for token authentication: "
+        "DRF TokenAuthentication vs CachedTokenAuthentication, plus a full request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User whose token is used (created if missing)")
+        parser.add_argument("--requests", "-n", type=int, default=1000)
+        parser.add_argument("--path", default="/api/customers/", help="API path for the full-request run")
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options["username"]).first()
+        if user is None:
+            raise CommandError(f"No user {options['username']!r}")
+        token, _ = Token.objects.get_or_create(user=user)
+        header = f"Token {token.key}"
+        total = options["requests"]
+
+        request = RequestFactory().get(options["path"], HTTP_AUTHORIZATION=header)
+        cache = token_cache()
+        if cache is None:
+            self.stdout.write("CACHES['auth'] is process-local (LocMemCache): token snapshots are not cached")
+        for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+            if cache is not None:
+                cache.clear()
+            authenticator = auth_class()
+            self.report(auth_class.__name__, total, lambda: authenticator.authenticate(request))
+
+        # весь стек (middleware, аутентификация, права, вью) с настроенными классами
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ("*",) and not h.startswith(".")), "testserver")
+        client = Client(HTTP_AUTHORIZATION=header, HTTP_HOST=host)
+        response = client.get(options["path"])
+        if response.status_code != 200:
+            raise CommandError(f"GET {options['path']} -> {response.status_code}")
+        self.report(f"GET {options['path']}", total, lambda: client.get(options["path"]))
+
+    def report(self, label, total, call):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(total):
+                call()
+            elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{label:<32} {len(queries) / total:6.2f} queries/call  "
+            f"{elapsed / total * 1000:7.3f} ms/call  ({total} calls)"
+        )
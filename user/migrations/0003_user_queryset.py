@@ -0,0 +1,20 @@
+# Generated by Django 5.2.10 on 2026-10-18 17:12
+
+import user.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', user.models.UserManager()),
+            ],
+        ),
+    ]
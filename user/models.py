@@ -1,9 +1,31 @@
-from django.db import models
-from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.db import models, transaction
+from django.contrib.auth.models import AbstractUser, Group, Permission, UserManager as BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
 # Create your models here.
 
+class UserQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        # сигналов нет: кеш токенов (user.authentication) сбрасывается здесь
+        from rest_framework.authtoken.models import Token
+        from .authentication import SNAPSHOT_FIELDS, invalidate_tokens
+
+        if not set(SNAPSHOT_FIELDS).intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            keys = list(
+                Token.objects.using(self.db).filter(user__in=self.values("pk")).values_list("key", flat=True)
+            )
+            rows = super().update(**kwargs)
+            invalidate_tokens(keys, self.db)
+        return rows
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
+
 class User(AbstractUser):
 
     class Role(models.TextChoices):
@@ -33,6 +55,8 @@ class User(AbstractUser):
         related_name="custom_user_permissions_set"
     )
 
+    objects = UserManager()
+
     def __str__(self):
         return f"{self.username} ({self.role})"
     
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import SNAPSHOT_FIELDS, invalidate_tokens
+from .models import User
+
+
+# --------------------
+# TOKEN CACHE INVALIDATION
+# --------------------
+# QuerySet.update() сигналов не шлёт — см. UserQuerySet.update
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields=None, using=None, **kwargs):
+    # last_login и прочие поля вне снимка кеш не трогают
+    if created or (update_fields is not None and not set(SNAPSHOT_FIELDS).intersection(update_fields)):
+        return
+    invalidate_tokens(Token.objects.using(using).filter(user=instance).values_list("key", flat=True), using)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_token(sender, instance, using=None, **kwargs):
+    # отзыв токена (и каскад при удалении пользователя)
+    invalidate_tokens([instance.key], using)
@@ -1,3 +1,78 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from .authentication import CachedTokenAuthentication, token_cache, token_cache_key
+from .models import User
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+    Снимок пользователя в общем кеше (здесь — FileBasedCache) и его сброс
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "auth": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory.name},
+        })
+        shared.enable()
+        self.addCleanup(shared.disable)
+
+        self.user = User.objects.create_user("api", password="pass", role=User.Role.ACCOUNTANT)
+        self.token = Token.objects.create(user=self.user)
+        self.key = self.token.key  # pk токена, delete() его обнуляет
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.auth.authenticate_credentials(self.key)[0]
+
+    def test_cache_hit_skips_database(self):
+        self.assertEqual(self.authenticate().role, User.Role.ACCOUNTANT)
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.pk, user.role, user.is_staff), (self.user.pk, User.Role.ACCOUNTANT, True))
+
+    def test_deleted_token_is_rejected(self):
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_role_change_is_seen(self):
+        self.authenticate()
+        self.user.role = User.Role.EMPLOYEE
+        self.user.save()
+        self.assertEqual(self.authenticate().role, User.Role.EMPLOYEE)
+
+        # массовое изменение без сигналов
+        User.objects.filter(pk=self.user.pk).update(role=User.Role.ADMIN)
+        self.assertEqual(self.authenticate().role, User.Role.ADMIN)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_snapshot_cached_before_commit_is_dropped(self):
+        self.authenticate()
+        cache, key = token_cache(), token_cache_key(self.key)
+        stale = cache.get(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            # параллельный запрос ещё видит строку до COMMIT и кладёт снимок обратно
+            cache.set(key, stale)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_process_local_cache_is_not_used(self):
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                                       "auth": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.authenticate()
+            with self.assertNumQueries(1):
+                self.authenticate()
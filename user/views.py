@@ -1,7 +1,20 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 
+from main.models import RequestCounter
+from main.views import status_badges
+from osc_erp.db_router import read_from_replica
+
+
 @login_required
+@read_from_replica
 def profile_view(request):
     user = request.user
-    return render(request, "user/profile.html", {"user": user})
+    context = {
+        "user": user,
+        # бейджи навигации — из счётчиков, без COUNT(*) по заявкам
+        "my_badges": status_badges(RequestCounter.objects.for_creator(user)),
+    }
+    if user.role in ["ADMIN", "ACCOUNTANT"]:
+        context["all_badges"] = status_badges(RequestCounter.objects.totals())
+    return render(request, "user/profile.html", context)